@@ -1,88 +1,165 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import datetime
-from scipy.stats import poisson
+import logging
+import os
+import threading
+import time
+import requests
+from precificacao import (matriz_lote, odds_justas, estatisticas_cache, matrizes_tempos, intervalo_final,
+                          FRACAO_PRIMEIRO_TEMPO, RESULTADOS)
+from dados import carregar_ratings, obter_fracao_primeiro_tempo, obter_modelo_escanteios, versao_dados
+from escanteios import MERCADOS_ESCANTEIOS, precificar_lote
+from nomes_times import ResolvedorTimes
+from ratings import lambdas
 
 # =============================================
 # FUNÇÕES DE CÁLCULO ESTATÍSTICO
 # =============================================
 
-def poisson_prob(lamb: float, goals: int) -> float:
-    """Calcula a probabilidade de marcar 'goals' gols com média 'lamb' usando a distribuição de Poisson."""
-    return poisson.pmf(goals, lamb)
+# Mercados do 1º tempo: rótulo -> coluna da odd no CSV de jogos do dia
+MERCADOS_HT = {
+    'Casa HT': 'Odd_H_HT',
+    'Empate HT': 'Odd_D_HT',
+    'Fora HT': 'Odd_A_HT',
+    'Over 0.5 HT': 'Odd_Over05_HT',
+    'Under 0.5 HT': 'Odd_Under05_HT',
+    'Over 1.5 HT': 'Odd_Over15_HT',
+    'Under 1.5 HT': 'Odd_Under15_HT',
+    'Over 2.5 HT': 'Odd_Over25_HT',
+    'Under 2.5 HT': 'Odd_Under25_HT',
+}
+MERCADOS_HTFT = [f"{intervalo}/{final}" for intervalo in RESULTADOS for final in RESULTADOS]
+COLUNAS_HT = (
+    [coluna for rotulo in MERCADOS_HT for coluna in (f'Odd Mercado {rotulo}', f'Prob {rotulo} (%)', f'Odd Justa {rotulo}')]
+    + [f'Prob {rotulo} (%)' for rotulo in MERCADOS_HTFT]
+    + ['Valor HT']
+)
+
+def coluna_ou_nan(df: pd.DataFrame, coluna: str) -> np.ndarray:
+    """Valores da coluna como float, ou NaN se o CSV não a tiver."""
+    if coluna not in df:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[coluna], errors='coerce').to_numpy(dtype=float)
 
-def poisson_match_result(lambda_home: float, lambda_away: float, max_goals: int = 5) -> tuple:
+
+def gols_esperados(df: pd.DataFrame, tabela_ratings: pd.DataFrame = None) -> tuple:
     """
-    Calcula as probabilidades de vitória da casa, empate e vitória do visitante,
-    considerando uma distribuição de Poisson para os gols.
+    Gols esperados de cada jogo: pelos ratings de ataque e defesa quando os
+    dois times têm rating (nomes conciliados pelo ResolvedorTimes), senão
+    pelo PPG da planilha. Com a coluna League no CSV, cada time usa o
+    rating da liga do jogo, quando existir. Retorna (λ casa, λ fora, usa_ratings).
     """
-    prob_home, prob_draw, prob_away = 0, 0, 0
-    for i in range(max_goals + 1):
-        for j in range(max_goals + 1):
-            p = poisson_prob(lambda_home, i) * poisson_prob(lambda_away, j)
-            if i > j:
-                prob_home += p
-            elif i == j:
-                prob_draw += p
-            else:
-                prob_away += p
-    return prob_home, prob_draw, prob_away
-
-def calcular_probabilidades(df: pd.DataFrame) -> pd.DataFrame:
+    lambda_home = df['PPG_Home'].to_numpy(dtype=float)
+    lambda_away = df['PPG_Away'].to_numpy(dtype=float)
+    if tabela_ratings is None or tabela_ratings.empty:
+        return lambda_home, lambda_away, np.zeros(len(df), dtype=bool)
+
+    resolvedor = ResolvedorTimes(tabela_ratings['time'].unique())
+    mandantes = [resolvedor.canonico(nome) for nome in df['Home'].astype(str)]
+    visitantes = [resolvedor.canonico(nome) for nome in df['Away'].astype(str)]
+    ligas = df['League'].astype(str).tolist() if 'League' in df else None
+    rating_home, rating_away = lambdas(tabela_ratings, mandantes, visitantes, ligas)
+    usa_ratings = ~np.isnan(rating_home) & ~np.isnan(rating_away)
+    return (
+        np.where(usa_ratings, rating_home, lambda_home),
+        np.where(usa_ratings, rating_away, lambda_away),
+        usa_ratings
+    )
+
+def calcular_probabilidades(df: pd.DataFrame, tabela_ratings: pd.DataFrame = None,
+                            fracao_ht=FRACAO_PRIMEIRO_TEMPO) -> pd.DataFrame:
     """
-    Para cada jogo no DataFrame, calcula:
+    Para todos os jogos do DataFrame, calcula de uma vez (vetorizado):
       - Probabilidades do resultado (casa, empate, fora)
       - Odds justas (inverso das probabilidades)
       - Probabilidade de mais de 2.5 gols (over 2.5)
       - Probabilidade de ambos marcarem (BTTS)
+      - Mercados do 1º tempo (1X2 e Over/Under 0.5/1.5/2.5) e intervalo/final,
+        com 'fracao_ht' dos gols esperados no 1º tempo (colunas COLUNAS_HT)
     Retorna um DataFrame com os resultados formatados.
     """
-    resultados = []
-    for _, row in df.iterrows():
-        home_team = row['Home']
-        away_team = row['Away']
-        odd_home = row['Odd_H_FT']
-        odd_draw = row['Odd_D_FT']
-        odd_away = row['Odd_A_FT']
-        
-        lambda_home = row['PPG_Home']
-        lambda_away = row['PPG_Away']
-        
-        # Probabilidades do resultado do jogo
-        model_prob_home, model_prob_draw, model_prob_away = poisson_match_result(lambda_home, lambda_away)
-        
-        fair_odd_home = round(1 / model_prob_home, 2) if model_prob_home > 0 else None
-        fair_odd_draw = round(1 / model_prob_draw, 2) if model_prob_draw > 0 else None
-        fair_odd_away = round(1 / model_prob_away, 2) if model_prob_away > 0 else None
-        
-        # Probabilidade de Over 2.5 gols (exceto combinações com menos de 2 gols)
-        over_2_5 = 1 - sum(
-            poisson_prob(lambda_home, i) * poisson_prob(lambda_away, j)
-            for i in range(3)  # 0, 1, 2 gols do time da casa
-            for j in range(3 - i)  # Garante que i + j <= 2
-        )
-        
-        # Probabilidade de ambos marcarem (BTTS)
-        prob_home_no_goal = poisson_prob(lambda_home, 0)  # Probabilidade do time da casa não marcar
-        prob_away_no_goal = poisson_prob(lambda_away, 0)  # Probabilidade do time visitante não marcar
-        prob_either_no_goal = prob_home_no_goal + prob_away_no_goal - (prob_home_no_goal * prob_away_no_goal)
-        btts = 1 - prob_either_no_goal
-        
-        resultados.append({
-            'Jogo': f"{home_team} x {away_team}",
-            'Odd Mercado Casa': odd_home,
-            'Prob Casa (%)': round(model_prob_home * 100, 2),
-            'Odd Justa Casa': fair_odd_home,
-            'Odd Mercado Empate': odd_draw,
-            'Prob Empate (%)': round(model_prob_draw * 100, 2),
-            'Odd Justa Empate': fair_odd_draw,
-            'Odd Mercado Fora': odd_away,
-            'Prob Fora (%)': round(model_prob_away * 100, 2),
-            'Odd Justa Fora': fair_odd_away,
-            'Prob Over 2.5 (%)': round(over_2_5 * 100, 2),
-            'Prob BTTS (%)': round(btts * 100, 2)
-        })
-    return pd.DataFrame(resultados)
+    # Matriz truncada em 5 gols, sem acumular a cauda (mesmo critério usado até aqui).
+    # Pares de gols esperados repetidos reaproveitam as matrizes do cache de precificação.
+    lambda_home, lambda_away, usa_ratings = gols_esperados(df, tabela_ratings)
+    matriz = matriz_lote(lambda_home, lambda_away, max_gols=5, acumular_cauda=False)
+    prob_home, prob_draw, prob_away = matriz.resultado()
+    over_2_5 = matriz.over(2.5)
+    btts = matriz.ambas_marcam()
+
+    resultado = pd.DataFrame({
+        'Jogo': (df['Home'].astype(str) + " x " + df['Away'].astype(str)).to_numpy(),
+        'Odd Mercado Casa': df['Odd_H_FT'].to_numpy(),
+        'Prob Casa (%)': np.round(prob_home * 100, 2),
+        'Odd Justa Casa': odds_justas(prob_home),
+        'Odd Mercado Empate': df['Odd_D_FT'].to_numpy(),
+        'Prob Empate (%)': np.round(prob_draw * 100, 2),
+        'Odd Justa Empate': odds_justas(prob_draw),
+        'Odd Mercado Fora': df['Odd_A_FT'].to_numpy(),
+        'Prob Fora (%)': np.round(prob_away * 100, 2),
+        'Odd Justa Fora': odds_justas(prob_away),
+        'Prob Over 2.5 (%)': np.round(over_2_5 * 100, 2),
+        'Prob BTTS (%)': np.round(btts * 100, 2)
+    })
+
+    # 1º tempo e intervalo/final no mesmo lote de jogos
+    primeiro, segundo = matrizes_tempos(lambda_home, lambda_away, fracao_ht, max_gols=5, acumular_cauda=False)
+    ht_home, ht_draw, ht_away = primeiro.resultado()
+    probs_ht = {
+        'Casa HT': ht_home, 'Empate HT': ht_draw, 'Fora HT': ht_away,
+        'Over 0.5 HT': primeiro.over(0.5), 'Under 0.5 HT': primeiro.under(0.5),
+        'Over 1.5 HT': primeiro.over(1.5), 'Under 1.5 HT': primeiro.under(1.5),
+        'Over 2.5 HT': primeiro.over(2.5), 'Under 2.5 HT': primeiro.under(2.5),
+    }
+    valor_ht = pd.DataFrame(index=resultado.index)
+    for rotulo, coluna_odd in MERCADOS_HT.items():
+        odd_mercado = coluna_ou_nan(df, coluna_odd)
+        odd_justa = odds_justas(probs_ht[rotulo])
+        resultado[f'Odd Mercado {rotulo}'] = odd_mercado
+        resultado[f'Prob {rotulo} (%)'] = np.round(probs_ht[rotulo] * 100, 2)
+        resultado[f'Odd Justa {rotulo}'] = odd_justa
+        valor_ht[rotulo] = odd_mercado > odd_justa
+    htft = intervalo_final(primeiro, segundo).reshape(len(df), len(MERCADOS_HTFT))
+    for posicao, rotulo in enumerate(MERCADOS_HTFT):
+        resultado[f'Prob {rotulo} (%)'] = np.round(htft[:, posicao] * 100, 2)
+    # Mercados HT em que a odd da casa de apostas supera a odd justa
+    resultado['Valor HT'] = valor_ht.dot(valor_ht.columns + ', ').str.rstrip(', ')
+
+    resultado.attrs['jogos_com_ratings'] = int(usa_ratings.sum())
+    return resultado
+
+def calcular_escanteios(df: pd.DataFrame, modelo) -> pd.DataFrame:
+    """
+    Odds justas de todos os mercados de escanteios (mais escanteios e
+    linhas de 7.5 a 11.5) para todos os jogos de uma vez, ao lado das odds
+    de mercado do CSV. Times sem forças de escanteios ficam sem preço.
+    """
+    if len(modelo):
+        resolvedor = ResolvedorTimes(modelo.times.index)
+        mandantes = [resolvedor.canonico(nome) for nome in df['Home'].astype(str)]
+        visitantes = [resolvedor.canonico(nome) for nome in df['Away'].astype(str)]
+    else:
+        mandantes = visitantes = [None] * len(df)
+    precos = precificar_lote(modelo, mandantes, visitantes)
+
+    resultado = pd.DataFrame({
+        'Jogo': (df['Home'].astype(str) + " x " + df['Away'].astype(str)).to_numpy(),
+        'Esc. Esperados Casa': np.round(precos['Escanteios Esperados Casa'].to_numpy(), 2),
+        'Esc. Esperados Fora': np.round(precos['Escanteios Esperados Fora'].to_numpy(), 2),
+    })
+    valor = pd.DataFrame(index=resultado.index)
+    for mercado, coluna_odd in MERCADOS_ESCANTEIOS.items():
+        prob = precos[mercado].to_numpy()
+        odd_mercado = coluna_ou_nan(df, coluna_odd)
+        odd_justa = odds_justas(prob)
+        resultado[f'Odd Mercado Esc. {mercado}'] = odd_mercado
+        resultado[f'Prob Esc. {mercado} (%)'] = np.round(prob * 100, 2)
+        resultado[f'Odd Justa Esc. {mercado}'] = odd_justa
+        valor[mercado] = odd_mercado > odd_justa
+    # Mercados de escanteios em que a odd da casa de apostas supera a odd justa
+    resultado['Valor Escanteios'] = valor.dot(valor.columns + ', ').str.rstrip(', ')
+    return resultado
 
 def highlight_probs(row: pd.Series) -> pd.Series:
     """
@@ -111,6 +188,88 @@ def identificar_oportunidades(df: pd.DataFrame) -> pd.DataFrame:
     )
     return df[criterios].sort_values('Prob Casa (%)', ascending=False)
 
+# =============================================
+# CARREGAMENTO DOS JOGOS DO DIA
+# =============================================
+
+URL_JOGOS_DO_DIA = "https://raw.githubusercontent.com/futpythontrader/YouTube/main/Jogos_do_Dia/FootyStats/Jogos_do_Dia_FootyStats_{data}.csv"
+DIRETORIO_JOGOS = os.getenv("JOGOS_DIR", ".cache_jogos")
+TTL_JOGOS = 15 * 60  # segundos entre atualizações do arquivo do dia
+
+def caminho_jogos_local(data: str) -> str:
+    """Caminho da cópia local do CSV de jogos de uma data."""
+    return os.path.join(DIRETORIO_JOGOS, f"Jogos_do_Dia_FootyStats_{data}.csv")
+
+def baixar_jogos_do_dia(data: str):
+    """Baixa o CSV de jogos da data e substitui a cópia local de forma atômica."""
+    resposta = requests.get(URL_JOGOS_DO_DIA.format(data=data), timeout=30)
+    resposta.raise_for_status()
+    os.makedirs(DIRETORIO_JOGOS, exist_ok=True)
+    caminho = caminho_jogos_local(data)
+    with open(caminho + ".tmp", "wb") as arquivo:
+        arquivo.write(resposta.content)
+    os.replace(caminho + ".tmp", caminho)
+
+@st.cache_resource
+def estado_atualizacao() -> dict:
+    """Estado compartilhado entre sessões: atualizações em andamento e últimas tentativas."""
+    return {"lock": threading.Lock(), "em_andamento": set(), "ultima_tentativa": {}}
+
+def atualizar_em_segundo_plano(data: str):
+    """
+    Dispara o download da data em uma thread, no máximo uma por data e uma
+    tentativa a cada TTL_JOGOS (mesmo que a anterior tenha falhado).
+    """
+    estado = estado_atualizacao()
+    with estado["lock"]:
+        ultima = estado["ultima_tentativa"].get(data, 0)
+        if data in estado["em_andamento"] or time.time() - ultima < TTL_JOGOS:
+            return
+        estado["em_andamento"].add(data)
+        estado["ultima_tentativa"][data] = time.time()
+
+    def tarefa():
+        try:
+            baixar_jogos_do_dia(data)
+        except Exception as e:
+            # Mantém a cópia local; nova tentativa após o TTL
+            logging.warning("Falha ao atualizar os jogos de %s: %s", data, e)
+        finally:
+            with estado["lock"]:
+                estado["em_andamento"].discard(data)
+
+    threading.Thread(target=tarefa, daemon=True).start()
+
+def garantir_jogos_do_dia(data: str) -> str:
+    """
+    Retorna o caminho da cópia local dos jogos da data. Se ela não existir,
+    baixa agora (única espera do usuário); se estiver mais velha que o TTL,
+    devolve a cópia atual e atualiza em segundo plano.
+    """
+    caminho = caminho_jogos_local(data)
+    if not os.path.exists(caminho):
+        baixar_jogos_do_dia(data)
+    elif time.time() - os.path.getmtime(caminho) > TTL_JOGOS:
+        atualizar_em_segundo_plano(data)
+    return caminho
+
+@st.cache_data(ttl=24 * 60 * 60, max_entries=4, show_spinner="Carregando jogos do dia...")
+def jogos_precificados(caminho: str, versao: float, versao_ratings: str = None) -> tuple:
+    """
+    Lê a cópia local dos jogos e calcula as probabilidades (gols e
+    escanteios). O resultado fica em cache por arquivo e versão (data de
+    modificação) e pela versão dos dados do banco (ratings): as interações
+    com a página não repetem o download nem a precificação.
+    """
+    df_jogos = pd.read_csv(caminho)
+    # Fração dos gols no 1º tempo pelos placares do intervalo do histórico
+    fracao_ht = obter_fracao_primeiro_tempo(versao_ratings)
+    return (
+        df_jogos,
+        calcular_probabilidades(df_jogos, carregar_ratings(versao_ratings), fracao_ht),
+        calcular_escanteios(df_jogos, obter_modelo_escanteios(versao_ratings))
+    )
+
 # =============================================
 # CONFIGURAÇÃO DA PÁGINA E CSS
 # =============================================
@@ -226,11 +385,20 @@ st.markdown("""
 
 try:
     hoje = datetime.date.today().strftime("%Y-%m-%d")
-    csv_url = f"https://raw.githubusercontent.com/futpythontrader/YouTube/main/Jogos_do_Dia/FootyStats/Jogos_do_Dia_FootyStats_{hoje}.csv"
-    
-    df_jogos = pd.read_csv(csv_url)
-    df_final = calcular_probabilidades(df_jogos)
+    caminho_jogos = garantir_jogos_do_dia(hoje)
+    df_jogos, df_final, df_escanteios = jogos_precificados(caminho_jogos, os.path.getmtime(caminho_jogos), versao_dados())
     df_oportunidades = identificar_oportunidades(df_final)
+
+    with st.sidebar:
+        cache = estatisticas_cache()
+        st.caption(
+            f"Cache de precificação: {cache['acertos']} acertos, {cache['falhas']} falhas "
+            f"({cache['taxa_acerto']:.0%}), {cache['tamanho']}/{cache['tamanho_maximo']} matrizes"
+        )
+        st.caption(
+            f"Gols esperados pelos ratings em {df_final.attrs.get('jogos_com_ratings', 0)} "
+            f"de {len(df_final)} jogos (demais pelo PPG)"
+        )
     
     # Seção de métricas
     with st.container():
@@ -304,7 +472,7 @@ try:
     # Seção principal de probabilidades
     st.markdown("### 📊 Probabilidades Detalhadas")
     st.dataframe(
-        df_filtrado.style
+        df_filtrado.drop(columns=COLUNAS_HT).style
         .apply(highlight_probs, axis=1)
         .format({
             'Prob Casa (%)': '{:.1f}%',
@@ -325,6 +493,33 @@ try:
         use_container_width=True
     )
 
+    # Mercados do 1º tempo e intervalo/final
+    with st.expander("🕐 Mercados do 1º Tempo e Intervalo/Final"):
+        df_ht = df_filtrado[['Jogo'] + COLUNAS_HT]
+        st.dataframe(
+            df_ht.style.format(
+                {coluna: '{:.1f}%' for coluna in COLUNAS_HT if coluna.endswith('(%)')}
+                | {coluna: '{:.2f}' for coluna in COLUNAS_HT if coluna.startswith('Odd')}
+            ),
+            use_container_width=True
+        )
+        st.caption("Valor HT: mercados do 1º tempo em que a odd de mercado supera a odd justa.")
+
+    # Mercados de escanteios
+    with st.expander("🚩 Mercados de Escanteios"):
+        df_esc = df_escanteios[df_escanteios['Jogo'].str.contains(search_term, case=False)]
+        st.dataframe(
+            df_esc.style.format(
+                {coluna: '{:.1f}%' for coluna in df_esc.columns if coluna.endswith('(%)')}
+                | {coluna: '{:.2f}' for coluna in df_esc.columns if coluna.startswith(('Odd', 'Esc.'))}
+            ),
+            use_container_width=True
+        )
+        st.caption(
+            "Binomial negativa por time (forças de escanteios em casa e fora). "
+            "Valor Escanteios: mercados em que a odd de mercado supera a odd justa."
+        )
+
 except Exception as e:
     st.markdown(f"""
     <div class="metric-card" style="background: #fce8e6; color: #a50e0e;">
@@ -0,0 +1,321 @@
+import contextlib
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+import db
+from precificacao import MatrizPlacar, odds_justas
+from staging import ler_staging
+
+# =============================
+# BACKTEST DOS CRITÉRIOS DE VALOR
+# =============================
+# Reproduz, em ordem cronológica, os critérios de aposta sobre todo o
+# histórico da tabela_ligas usando só dados anteriores ao jogo (PPG e xG
+# "pre" e as odds). Cada jogo é precificado como na página principal e as
+# regras de seleção e de stake operam sobre arrays (jogos x mercados), sem
+# laços por linha. O resultado é uma tabela de apostas e um resumo com ROI,
+# taxa de acerto, drawdown e CLV por liga e mercado.
+
+# Colunas de gols esperados antes do jogo
+FONTES_LAMBDA = {
+    "ppg": ("ppg_home_pre", "ppg_away_pre"),
+    "xg": ("xg_home_pre", "xg_away_pre"),
+}
+
+# Mercado -> coluna da odd na tabela_ligas
+MERCADOS = {
+    "casa": "odd_h_ft",
+    "empate": "odd_d_ft",
+    "fora": "odd_a_ft",
+    "over25": "odd_over25_ft",
+    "under25": "odd_under25_ft",
+    "btts_sim": "odd_btts_yes",
+    "btts_nao": "odd_btts_no",
+}
+
+COLUNAS_HISTORICO = (
+    ["league", "season", "match_date", "home", "away", "goals_h_ft", "goals_a_ft"]
+    + [coluna for par in FONTES_LAMBDA.values() for coluna in par]
+    + list(MERCADOS.values())
+)
+
+# Mesmo critério da página principal: matriz truncada em 5 gols, sem acumular a cauda
+MAX_GOLS = 5
+
+
+class Historico:
+    """
+    Jogos encerrados em ordem de data, em arrays prontos para o backtest.
+
+    'prob', 'odds', 'fechamento' e 'acertou' têm forma (n_jogos, n_mercados),
+    com as colunas na ordem de 'mercados'. 'fechamento' guarda a cotação de
+    fechamento de cada mercado, usada no CLV (NaN quando não há).
+    """
+
+    def __init__(self, ligas, datas, mercados, prob, odds, acertou, fechamento=None):
+        self.ligas = np.asarray(ligas)
+        self.datas = np.asarray(datas, dtype="datetime64[D]")
+        self.mercados = list(mercados)
+        self.prob = np.asarray(prob, dtype=float)
+        self.odds = np.asarray(odds, dtype=float)
+        self.acertou = np.asarray(acertou, dtype=bool)
+        self.fechamento = (
+            np.full_like(self.odds, np.nan) if fechamento is None else np.asarray(fechamento, dtype=float)
+        )
+
+    def __len__(self) -> int:
+        return len(self.datas)
+
+    def coluna(self, mercado: str) -> int:
+        return self.mercados.index(mercado)
+
+    @property
+    def over25(self) -> np.ndarray:
+        """Probabilidade de Over 2.5 de cada jogo (usada como filtro pelas regras)."""
+        return self.prob[:, self.coluna("over25")]
+
+    @property
+    def btts(self) -> np.ndarray:
+        """Probabilidade de ambos marcarem em cada jogo."""
+        return self.prob[:, self.coluna("btts_sim")]
+
+    @property
+    def justas(self) -> np.ndarray:
+        """Odds justas do modelo, arredondadas como na página principal."""
+        return odds_justas(self.prob)
+
+    @classmethod
+    def de_partidas(cls, partidas: pd.DataFrame, fonte: str = "ppg", odds_fechamento: dict = None,
+                    max_gols: int = MAX_GOLS) -> "Historico":
+        """
+        Monta o histórico a partir das partidas (layout da tabela_ligas).
+
+        'fonte' escolhe os gols esperados ("ppg" como na página principal, ou
+        "xg"); 'odds_fechamento' mapeia mercado -> coluna com a cotação de
+        fechamento, quando a fonte de dados tiver uma.
+        """
+        partidas = partidas.dropna(subset=["match_date", "goals_h_ft", "goals_a_ft"])
+        partidas = partidas.sort_values("match_date", kind="stable")
+        coluna_home, coluna_away = FONTES_LAMBDA[fonte]
+        lambda_home = partidas[coluna_home].to_numpy(dtype=float, na_value=np.nan)
+        lambda_away = partidas[coluna_away].to_numpy(dtype=float, na_value=np.nan)
+
+        # Uma matriz por par distinto de médias, replicada para os jogos
+        validos = np.isfinite(lambda_home) & np.isfinite(lambda_away) & (lambda_home >= 0) & (lambda_away >= 0)
+        pares, inverso = np.unique(
+            np.round(np.column_stack([np.where(validos, lambda_home, 0), np.where(validos, lambda_away, 0)]), 2),
+            axis=0, return_inverse=True
+        )
+        matriz = MatrizPlacar(pares[:, 0], pares[:, 1], max_gols, acumular_cauda=False)
+        casa, empate, fora = matriz.resultado()
+        over25, under25, btts = matriz.over(2.5), matriz.under(2.5), matriz.ambas_marcam()
+        prob = np.column_stack([casa, empate, fora, over25, under25, btts, 1 - btts])[np.ravel(inverso)]
+        prob[~validos] = np.nan
+
+        gols_home = partidas["goals_h_ft"].to_numpy(dtype=float)
+        gols_away = partidas["goals_a_ft"].to_numpy(dtype=float)
+        total = gols_home + gols_away
+        ambos = (gols_home > 0) & (gols_away > 0)
+        acertou = np.column_stack([
+            gols_home > gols_away, gols_home == gols_away, gols_home < gols_away,
+            total > 2.5, total < 2.5, ambos, ~ambos
+        ])
+
+        odds = partidas[list(MERCADOS.values())].to_numpy(dtype=float, na_value=np.nan)
+        fechamento = None
+        if odds_fechamento:
+            fechamento = np.column_stack([
+                partidas[odds_fechamento[m]].to_numpy(dtype=float, na_value=np.nan)
+                if m in odds_fechamento else np.full(len(partidas), np.nan)
+                for m in MERCADOS
+            ])
+
+        return cls(
+            # Texto de largura fixa (dtype U): arrays de objetos não podem ser mapeados em memória
+            partidas["league"].astype(str).to_numpy(dtype=str),
+            pd.to_datetime(partidas["match_date"]).to_numpy(dtype="datetime64[D]"),
+            MERCADOS, prob, odds, acertou, fechamento
+        )
+
+
+# =============================
+# REGRAS DE SELEÇÃO
+# =============================
+# Uma regra recebe o Historico e devolve uma máscara booleana
+# (n_jogos, n_mercados) com as apostas feitas.
+
+def regra_valor(margem: float = 0.0, prob_minima: float = 0.0, mercados=None):
+    """Aposta quando odd x probabilidade do modelo > 1 + margem (valor esperado positivo)."""
+    def regra(historico: Historico) -> np.ndarray:
+        with np.errstate(invalid="ignore"):
+            mascara = (historico.odds * historico.prob > 1 + margem) & (historico.prob >= prob_minima)
+        if mercados is not None:
+            mascara &= np.isin(historico.mercados, list(mercados))[None, :]
+        return mascara
+    return regra
+
+
+def regra_oportunidades(over_minimo: float = 0.60, margem: float = 0.0, btts_minimo: float = 0.0,
+                        mercados=("casa", "fora")):
+    """
+    Critério de identificar_oportunidades (app.py): odd de mercado da casa
+    (ou do visitante) maior que a odd justa, com Over 2.5 acima de 'over_minimo'.
+    Aposta no lado que tem valor. Com os valores padrão é exatamente o
+    critério da página; 'margem' exige odd > odd justa x (1 + margem) e
+    'btts_minimo' acrescenta um corte na probabilidade de ambas marcarem.
+    """
+    def regra(historico: Historico) -> np.ndarray:
+        with np.errstate(invalid="ignore"):
+            valor = historico.odds > historico.justas * (1 + margem)
+            filtro = (historico.over25 > over_minimo) & (historico.btts >= btts_minimo)
+        mascara = np.zeros_like(valor)
+        for mercado in mercados:
+            coluna = historico.coluna(mercado)
+            mascara[:, coluna] = valor[:, coluna] & filtro
+        return mascara
+    return regra
+
+
+# =============================
+# STAKES
+# =============================
+# Um stake recebe as apostas selecionadas em ordem cronológica (arrays de
+# probabilidade, odd e retorno por unidade: odd - 1 no acerto, -1 no erro)
+# e devolve (valor apostado, lucro) de cada aposta.
+
+def aposta_fixa(unidade: float = 1.0):
+    """Mesmo valor em todas as apostas."""
+    def stake(prob: np.ndarray, odds: np.ndarray, retorno: np.ndarray) -> tuple:
+        apostado = np.full(len(retorno), unidade)
+        return apostado, apostado * retorno
+    return stake
+
+
+def aposta_kelly(fracao: float = 0.25, banca: float = 100.0, teto: float = 0.05):
+    """
+    Fração de Kelly da banca corrente (limitada a 'teto' da banca por aposta).
+    A banca é reinvestida: o saldo antes de cada aposta é o produto
+    acumulado dos retornos anteriores, calculado com cumprod.
+    """
+    def stake(prob: np.ndarray, odds: np.ndarray, retorno: np.ndarray) -> tuple:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            kelly = (prob * odds - 1) / (odds - 1)
+        f = np.clip(np.nan_to_num(fracao * kelly), 0, teto)
+        crescimento = 1 + f * retorno
+        saldo_antes = banca * np.concatenate([[1.0], np.cumprod(crescimento)[:-1]])
+        apostado = saldo_antes * f
+        return apostado, apostado * retorno
+    return stake
+
+
+# =============================
+# EXECUÇÃO E RESUMO
+# =============================
+
+def executar(historico: Historico, regra, stake=None) -> pd.DataFrame:
+    """
+    Aplica a regra e o stake a todo o histórico. Retorna uma linha por
+    aposta (ordem cronológica) com liga, data, mercado, odd, probabilidade,
+    acerto, valor apostado, lucro e CLV.
+    """
+    stake = aposta_fixa() if stake is None else stake
+    with np.errstate(invalid="ignore"):
+        mascara = regra(historico) & (historico.odds > 1) & np.isfinite(historico.prob)
+    # nonzero percorre as linhas em ordem: as apostas saem em ordem de data
+    jogos, colunas = np.nonzero(mascara)
+    odds = historico.odds[jogos, colunas]
+    prob = historico.prob[jogos, colunas]
+    acertou = historico.acertou[jogos, colunas]
+    retorno = np.where(acertou, odds - 1, -1.0)
+    apostado, lucro = stake(prob, odds, retorno)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        clv = odds / historico.fechamento[jogos, colunas] - 1
+
+    return pd.DataFrame({
+        "league": historico.ligas[jogos],
+        "match_date": historico.datas[jogos],
+        "mercado": np.asarray(historico.mercados)[colunas],
+        "odd": odds,
+        "prob": prob,
+        "acertou": acertou,
+        "apostado": apostado,
+        "lucro": lucro,
+        "clv": clv,
+    })
+
+
+def resumo(apostas: pd.DataFrame, por=("league", "mercado")) -> pd.DataFrame:
+    """
+    Apostas, acertos, taxa de acerto, valor apostado, lucro, ROI, drawdown
+    máximo (da curva de lucro acumulado do grupo) e CLV médio por grupo.
+    Com por=() resume todas as apostas em uma linha.
+    """
+    por = list(por)
+    if not por:
+        apostas = apostas.assign(grupo="Total")
+        por = ["grupo"]
+    grupos = apostas.groupby(por, observed=True, sort=True)
+    acumulado = grupos["lucro"].cumsum()
+    # O pico parte de zero: uma sequência que começa perdendo já é drawdown
+    pico = acumulado.groupby([apostas[c] for c in por], observed=True).cummax().clip(lower=0)
+    apostas = apostas.assign(queda=pico - acumulado)
+
+    tabela = apostas.groupby(por, observed=True, sort=True).agg(
+        apostas=("lucro", "size"),
+        acertos=("acertou", "sum"),
+        apostado=("apostado", "sum"),
+        lucro=("lucro", "sum"),
+        max_drawdown=("queda", "max"),
+        clv=("clv", "mean"),
+    )
+    tabela["taxa_acerto"] = tabela["acertos"] / tabela["apostas"]
+    tabela["roi"] = tabela["lucro"] / tabela["apostado"]
+    return tabela[["apostas", "acertos", "taxa_acerto", "apostado", "lucro", "roi", "max_drawdown", "clv"]]
+
+
+def ler_partidas() -> pd.DataFrame:
+    """Histórico do banco ou, se ele estiver indisponível, da cópia local em Parquet."""
+    try:
+        with contextlib.closing(db.conectar()) as conn, conn.cursor() as cur:
+            return carregar_historico(cur)
+    except Exception as e:
+        logging.warning("Banco indisponível (%s); usando a cópia local em Parquet.", e)
+        return ler_staging()[COLUNAS_HISTORICO]
+
+
+def carregar_historico(cur) -> pd.DataFrame:
+    """Jogos encerrados da vw_tabela_ligas com as colunas do backtest, em ordem de data."""
+    cur.execute(
+        f"""
+        SELECT {", ".join(COLUNAS_HISTORICO)}
+        FROM vw_tabela_ligas
+        WHERE goals_h_ft IS NOT NULL AND goals_a_ft IS NOT NULL
+        ORDER BY match_date;
+        """
+    )
+    return pd.DataFrame(cur.fetchall(), columns=COLUNAS_HISTORICO)
+
+
+# =============================
+# EXECUÇÃO PELA LINHA DE COMANDO
+# =============================
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    pd.set_option("display.width", 200)
+
+    partidas = ler_partidas()
+    inicio = time.perf_counter()
+    historico = Historico.de_partidas(partidas)
+    tempo_precificacao = time.perf_counter() - inicio
+    logging.info(f"{len(historico)} jogos precificados em {tempo_precificacao:.2f} s.")
+
+    for nome, stake in (("fixa", aposta_fixa()), ("kelly 1/4", aposta_kelly())):
+        inicio = time.perf_counter()
+        apostas = executar(historico, regra_oportunidades(), stake)
+        tabela = resumo(apostas)
+        logging.info(f"Stake {nome}: {len(apostas)} apostas em {time.perf_counter() - inicio:.2f} s.")
+        print(resumo(apostas, por=()).to_string())
+        print(tabela.sort_values("apostas", ascending=False).head(20).to_string())
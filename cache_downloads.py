@@ -0,0 +1,113 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import requests
+
+# Diretório padrão do cache (pode ser ajustado via ETL_CACHE_DIR)
+DIRETORIO_CACHE = os.getenv("ETL_CACHE_DIR", ".cache_etl")
+
+
+class CacheDownloads:
+    """
+    Cache em disco dos downloads das planilhas, indexado pela URL.
+
+    Para cada URL guarda ETag, Last-Modified e o SHA-256 do conteúdo da última
+    carga bem-sucedida. Os downloads seguintes usam requisições condicionais
+    (If-None-Match / If-Modified-Since); quando o servidor responde 304, ou o
+    conteúdo baixado tem o mesmo hash, a busca retorna None e a liga pode ser
+    ignorada.
+
+    As novas entradas só são gravadas no índice após 'confirmar(url)', chamado
+    depois que a liga foi carregada no banco. Assim, uma carga que falhou é
+    refeita por completo na próxima execução. O cache não sabe se o banco
+    ainda guarda os dados: quem carrega deve chamar 'esquecer(url)' para as
+    fontes cujas ligas ('ligas(url)') não estão mais no banco.
+    """
+
+    def __init__(self, diretorio: str = DIRETORIO_CACHE, sessao: requests.Session = None):
+        self.diretorio = diretorio
+        self.caminho_indice = os.path.join(diretorio, "indice.json")
+        self.sessao = sessao or requests.Session()
+        self._lock = threading.Lock()
+        self._pendentes = {}
+        self._indice = self._ler_indice()
+
+    def _ler_indice(self) -> dict:
+        try:
+            with open(self.caminho_indice, encoding="utf-8") as arquivo:
+                return json.load(arquivo)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning("Índice do cache de downloads ilegível, ignorando: %s", e)
+            return {}
+
+    def _gravar_indice(self):
+        os.makedirs(self.diretorio, exist_ok=True)
+        temporario = self.caminho_indice + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(self._indice, arquivo, indent=2, ensure_ascii=False)
+        os.replace(temporario, self.caminho_indice)
+
+    def buscar(self, url: str) -> bytes:
+        """
+        Baixa a URL com requisição condicional. Retorna o conteúdo quando a
+        fonte mudou desde a última carga confirmada, ou None caso contrário.
+        """
+        with self._lock:
+            entrada = self._indice.get(url, {})
+        cabecalhos = {}
+        if entrada.get("etag"):
+            cabecalhos["If-None-Match"] = entrada["etag"]
+        if entrada.get("last_modified"):
+            cabecalhos["If-Modified-Since"] = entrada["last_modified"]
+
+        resposta = self.sessao.get(url, headers=cabecalhos, timeout=60)
+        if resposta.status_code == 304:
+            return None
+        resposta.raise_for_status()
+
+        conteudo = resposta.content
+        sha256 = hashlib.sha256(conteudo).hexdigest()
+        nova_entrada = {
+            "etag": resposta.headers.get("ETag"),
+            "last_modified": resposta.headers.get("Last-Modified"),
+            "sha256": sha256
+        }
+        with self._lock:
+            if entrada.get("sha256") == sha256:
+                # Mesmo conteúdo: só atualiza os cabeçalhos de validação
+                self._indice[url] = {**nova_entrada, "ligas": entrada.get("ligas", [])}
+                self._gravar_indice()
+                return None
+            self._pendentes[url] = nova_entrada
+        return conteudo
+
+    __call__ = buscar
+
+    def confirmar(self, url: str, ligas: list = None):
+        """
+        Registra no índice o download de 'url' após a carga bem-sucedida,
+        com as ligas gravadas a partir dele.
+        """
+        with self._lock:
+            entrada = self._pendentes.pop(url, None)
+            if entrada is not None:
+                self._indice[url] = {**entrada, "ligas": sorted(map(str, ligas or []))}
+                self._gravar_indice()
+
+    def ligas(self, url: str) -> list:
+        """Ligas gravadas na última carga confirmada de 'url' (vazio se desconhecidas)."""
+        with self._lock:
+            return list(self._indice.get(url, {}).get("ligas", []))
+
+    def esquecer(self, url: str):
+        """
+        Descarta a entrada de 'url': o próximo download é incondicional e
+        sempre retorna o conteúdo (a entrada volta com a próxima confirmação).
+        """
+        with self._lock:
+            self._indice.pop(url, None)
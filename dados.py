@@ -0,0 +1,541 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+from psycopg2 import sql
+import streamlit as st
+
+import db
+import dixon_coles
+from ao_vivo import ModeloAoVivo, carregar_minutos, filtrar_completos
+import escanteios
+from esquema import COLUNAS_INTEIRAS, COLUNAS_NUMERICAS
+from indice_times import IndiceTimes
+from minutos_gols import codificar_minutos, listas_minutos
+from nomes_times import ResolvedorTimes
+from precificacao import FRACAO_PRIMEIRO_TEMPO
+from staging import ler_staging
+
+# =============================
+# ACESSO AOS DADOS DAS LIGAS
+# =============================
+# Camada de acesso usada pelas páginas do Streamlit. Os filtros de time,
+# período e liga e a lista de colunas são enviados ao PostgreSQL em
+# consultas parametrizadas (apoiadas pelos índices criados pelo ETL), em
+# vez de carregar a tabela inteira e filtrar em memória. Os filtros usam as
+# chaves inteiras de times e ligas; os nomes vêm da visão vw_tabela_ligas. Se o banco estiver
+# indisponível, os mesmos filtros são aplicados à cópia local em Parquet.
+
+
+@st.cache_resource(show_spinner=False)
+def obter_pool():
+    """Pool de conexões único para todas as sessões do Streamlit neste processo."""
+    return db.criar_pool()
+
+
+# Chaves dos times a partir dos nomes informados
+IDS_TIMES = "(SELECT id FROM teams WHERE nome = ANY(%s))"
+
+
+def montar_consulta(colunas=None, times=None, data_inicio=None, data_fim=None,
+                    ligas=None, mando: str = None) -> tuple:
+    """
+    Monta o SELECT na vw_tabela_ligas com os filtros informados.
+
+    'times' filtra jogos em que algum dos times é mandante ou visitante;
+    com mando='casa' ou mando='fora', apenas como mandante ou visitante.
+    Retorna (consulta, parâmetros).
+    """
+    campos = sql.SQL(", ").join(map(sql.Identifier, colunas)) if colunas else sql.SQL("*")
+    condicoes, parametros = [], []
+    if times:
+        if mando == "casa":
+            condicoes.append(sql.SQL("home_id IN " + IDS_TIMES))
+            parametros.append(list(times))
+        elif mando == "fora":
+            condicoes.append(sql.SQL("away_id IN " + IDS_TIMES))
+            parametros.append(list(times))
+        else:
+            condicoes.append(sql.SQL(f"(home_id IN {IDS_TIMES} OR away_id IN {IDS_TIMES})"))
+            parametros += [list(times), list(times)]
+    if data_inicio is not None:
+        condicoes.append(sql.SQL("match_date >= %s"))
+        parametros.append(data_inicio)
+    if data_fim is not None:
+        condicoes.append(sql.SQL("match_date <= %s"))
+        parametros.append(data_fim)
+    if ligas:
+        condicoes.append(sql.SQL("league_id IN (SELECT id FROM leagues WHERE nome = ANY(%s))"))
+        parametros.append(list(ligas))
+
+    consulta = sql.SQL("SELECT {} FROM vw_tabela_ligas").format(campos)
+    if condicoes:
+        consulta += sql.SQL(" WHERE ") + sql.SQL(" AND ").join(condicoes)
+    consulta += sql.SQL(" ORDER BY match_date;")
+    return consulta, parametros
+
+
+def filtrar_local(dados: pd.DataFrame, colunas=None, times=None, data_inicio=None,
+                  data_fim=None, ligas=None, mando: str = None) -> pd.DataFrame:
+    """Aplica em memória os mesmos filtros de montar_consulta (usado com a cópia local)."""
+    mascara = pd.Series(True, index=dados.index)
+    if times:
+        if mando == "casa":
+            mascara &= dados["home"].isin(times)
+        elif mando == "fora":
+            mascara &= dados["away"].isin(times)
+        else:
+            mascara &= dados["home"].isin(times) | dados["away"].isin(times)
+    datas = pd.to_datetime(dados["match_date"])
+    if data_inicio is not None:
+        mascara &= datas >= pd.Timestamp(data_inicio)
+    if data_fim is not None:
+        mascara &= datas <= pd.Timestamp(data_fim)
+    if ligas:
+        mascara &= dados["league"].isin(ligas)
+    resultado = dados[mascara].sort_values("match_date")
+    return resultado[list(colunas)] if colunas else resultado
+
+
+def consultar(consulta, parametros=None) -> pd.DataFrame:
+    """Executa uma consulta com uma conexão do pool e retorna um DataFrame."""
+    with db.conexao(obter_pool()) as conn, conn.cursor() as cur:
+        cur.execute(consulta, parametros)
+        return pd.DataFrame.from_records(
+            cur.fetchall(), columns=[c.name for c in cur.description], coerce_float=True
+        )
+
+
+# =============================
+# REPRESENTAÇÃO COMPACTA
+# =============================
+# Nomes repetidos viram categorias, odds viram float32, contagens viram
+# inteiros pequenos (anuláveis) e os minutos dos gols viram listas uint8.
+
+COLUNAS_CATEGORICAS = ["league", "season", "home", "away"]
+COLUNAS_MINUTOS = ["goals_h_minutes", "goals_a_minutes"]
+
+
+def _menor_inteiro(valores: pd.Series) -> str:
+    """Menor tipo inteiro anulável que comporta os valores."""
+    minimo, maximo = valores.min(), valores.max()
+    if pd.isna(minimo):
+        return "Int8"
+    for tipo in (np.int8, np.int16, np.int32):
+        limites = np.iinfo(tipo)
+        if limites.min <= minimo and maximo <= limites.max:
+            return tipo.__name__.capitalize()
+    return "Int64"
+
+
+def compactar_partidas(partidas: pd.DataFrame) -> pd.DataFrame:
+    """Converte as colunas da tabela_ligas presentes em 'partidas' para tipos compactos."""
+    partidas = partidas.copy()
+    for coluna in partidas.columns:
+        if coluna in COLUNAS_CATEGORICAS:
+            partidas[coluna] = partidas[coluna].astype("string").astype("category")
+        elif coluna in COLUNAS_INTEIRAS:
+            valores = pd.to_numeric(partidas[coluna], errors="coerce").astype("Int64")
+            partidas[coluna] = valores.astype(_menor_inteiro(valores))
+        elif coluna in COLUNAS_NUMERICAS:
+            partidas[coluna] = pd.to_numeric(partidas[coluna], errors="coerce").astype("float32")
+        elif coluna in COLUNAS_MINUTOS:
+            partidas[coluna] = codificar_minutos(partidas[coluna])
+        elif coluna == "match_date":
+            partidas[coluna] = pd.to_datetime(partidas[coluna], errors="coerce")
+    return partidas
+
+
+def relatorio_memoria(antes: pd.DataFrame, depois: pd.DataFrame) -> pd.DataFrame:
+    """Bytes por coluna e por linha antes e depois da compactação."""
+    linhas = max(len(antes), 1)
+    relatorio = pd.DataFrame({
+        "antes": antes.memory_usage(deep=True, index=False),
+        "depois": depois.memory_usage(deep=True, index=False)
+    })
+    relatorio.loc["total"] = relatorio.sum()
+    relatorio["antes_por_linha"] = relatorio["antes"] / linhas
+    relatorio["depois_por_linha"] = relatorio["depois"] / linhas
+    relatorio["reducao"] = 1 - relatorio["depois"] / relatorio["antes"]
+    return relatorio
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def versao_dados() -> str:
+    """
+    Identifica a versão atual dos dados (quantidade de jogos e última
+    alteração). Passada às funções em cache, faz com que uma nova carga do
+    ETL invalide os resultados antigos.
+    """
+    try:
+        versao = consultar("SELECT count(*), max(atualizado_em) FROM tabela_ligas;")
+        return f"{versao.iat[0, 0]}|{versao.iat[0, 1]}"
+    except Exception:
+        return "local"
+
+
+@st.cache_data(show_spinner="Carregando dados das ligas...")
+def carregar_partidas(colunas: tuple = None, times: tuple = None, data_inicio=None, data_fim=None,
+                      ligas: tuple = None, mando: str = None, versao: str = None) -> pd.DataFrame:
+    """
+    Carrega da tabela_ligas apenas as colunas e os jogos pedidos, ordenados
+    por data, em representação compacta (o relatório de memória fica em
+    attrs["memoria"]). Se o banco estiver indisponível, usa a cópia local em
+    Parquet gerada pelo ETL (área de staging).
+    """
+    try:
+        consulta, parametros = montar_consulta(colunas, times, data_inicio, data_fim, ligas, mando)
+        partidas = consultar(consulta, parametros)
+    except Exception as e:
+        dados_locais = ler_staging()
+        if dados_locais.empty:
+            st.error(f"Erro ao conectar com o banco de dados: {e}")
+            return pd.DataFrame(columns=list(colunas) if colunas else None)
+        st.warning(f"Banco de dados indisponível ({e}). Usando a cópia local dos dados.")
+        partidas = filtrar_local(dados_locais, colunas, times, data_inicio, data_fim, ligas, mando)
+
+    compactas = compactar_partidas(partidas)
+    compactas.attrs["memoria"] = relatorio_memoria(partidas, compactas)
+    return compactas
+
+
+# Categorias das colunas derivadas usadas pelo painel
+RESULTADOS = ["Vitória Casa", "Empate", "Vitória Fora"]
+AMBAS_MARCAM = ["Sim", "Não"]
+
+
+def reduzir_tipos(partidas: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte as colunas numéricas para o menor tipo que as representa:
+    inteiros sem nulos para int8/int16/..., as demais para float32.
+    """
+    for coluna in partidas.columns:
+        if coluna == "match_date" or not pd.api.types.is_numeric_dtype(partidas[coluna]):
+            continue
+        valores = pd.to_numeric(partidas[coluna], errors="coerce")
+        inteiro = valores.notna().all() and (valores % 1 == 0).all()
+        partidas[coluna] = pd.to_numeric(
+            valores.astype("int64") if inteiro else valores,
+            downcast="integer" if inteiro else "float"
+        )
+    return partidas
+
+
+def derivar_colunas(partidas: pd.DataFrame) -> pd.DataFrame:
+    """
+    Acrescenta as colunas derivadas do painel de forma vetorizada:
+    Resultado e AmbasMarcam (categóricas), match_date como datetime64,
+    totalgoals_ft sem nulos e tipos numéricos reduzidos.
+    """
+    partidas = partidas.copy()
+    partidas["match_date"] = pd.to_datetime(partidas["match_date"], errors="coerce")
+    gols_casa = pd.to_numeric(partidas["goals_h_ft"], errors="coerce").astype("float32")
+    gols_fora = pd.to_numeric(partidas["goals_a_ft"], errors="coerce").astype("float32")
+
+    # Sem placar (comparações falsas) o jogo conta como empate, como antes
+    partidas["Resultado"] = pd.Categorical(
+        np.select([gols_casa > gols_fora, gols_casa < gols_fora], RESULTADOS[::2], RESULTADOS[1]),
+        categories=RESULTADOS
+    )
+    partidas["totalgoals_ft"] = pd.to_numeric(partidas["totalgoals_ft"], errors="coerce").fillna(0)
+    partidas["AmbasMarcam"] = pd.Categorical(
+        np.where((gols_casa > 0) & (gols_fora > 0), "Sim", "Não"),
+        categories=AMBAS_MARCAM
+    )
+    return reduzir_tipos(partidas)
+
+
+@st.cache_data(show_spinner="Preparando dados do painel...")
+def carregar_partidas_derivadas(colunas: tuple = None, times: tuple = None, data_inicio=None,
+                                data_fim=None, ligas: tuple = None, mando: str = None,
+                                versao: str = None) -> pd.DataFrame:
+    """
+    Jogos de carregar_partidas já com as colunas derivadas. Fica em cache por
+    filtro e versão dos dados, compartilhado entre as sessões.
+    """
+    partidas = carregar_partidas(colunas, times, data_inicio, data_fim, ligas, mando, versao)
+    if partidas.empty:
+        return partidas
+    return derivar_colunas(partidas)
+
+
+@st.cache_resource(show_spinner="Indexando jogos por time...", max_entries=2)
+def obter_indice_times(colunas: tuple = None, versao: str = None) -> IndiceTimes:
+    """
+    Índice de jogos por time sobre todo o histórico, construído uma vez por
+    versão dos dados e compartilhado (sem cópia) entre as sessões.
+    """
+    return IndiceTimes(carregar_partidas(colunas, versao=versao))
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def obter_resolvedor_times(colunas: tuple = None, versao: str = None) -> ResolvedorTimes:
+    """Resolvedor de nomes dos times do índice, construído uma vez por versão dos dados."""
+    return ResolvedorTimes(obter_indice_times(colunas, versao).times)
+
+
+@st.cache_data(show_spinner=False)
+def carregar_ratings(versao: str = None) -> pd.DataFrame:
+    """
+    Forças de ataque e defesa mantidas pelo ETL, uma linha por liga e time
+    (colunas league e time), com as médias de gols da liga. A escolha da
+    liga de cada time fica com ratings.lambdas. Vazio se o banco estiver
+    indisponível.
+    """
+    try:
+        return consultar("""
+            SELECT t.nome AS time, l.nome AS league,
+                   r.ataque_casa, r.defesa_casa, r.ataque_fora, r.defesa_fora,
+                   r.peso_casa, r.peso_fora, r.ultimo_jogo,
+                   rl.gols_casa / NULLIF(rl.peso, 0) AS media_casa,
+                   rl.gols_fora / NULLIF(rl.peso, 0) AS media_fora
+            FROM ratings_times r
+            JOIN teams t ON t.id = r.team_id
+            JOIN leagues l ON l.id = r.league_id
+            JOIN ratings_ligas rl ON rl.league_id = r.league_id
+            ORDER BY t.nome, l.nome;
+        """)
+    except Exception:
+        return pd.DataFrame()
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def obter_modelos_dixon_coles(versao: str = None) -> dict:
+    """Modelos Dixon-Coles ajustados pelo ETL (liga -> ModeloDixonColes); vazio sem banco."""
+    try:
+        with db.conexao(obter_pool()) as conn, conn.cursor() as cur:
+            return dixon_coles.carregar_modelos(cur)
+    except Exception:
+        return {}
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def obter_modelo_ao_vivo(versao: str = None) -> ModeloAoVivo:
+    """
+    Curvas de gols por minuto do modelo ao vivo, montadas uma vez por versão
+    dos dados: do banco, da cópia local ou, sem minutos disponíveis, uniformes.
+    """
+    try:
+        with db.conexao(obter_pool()) as conn, conn.cursor() as cur:
+            minutos_casa, minutos_fora = carregar_minutos(cur)
+    except Exception:
+        partidas = ler_staging().dropna(subset=["goals_h_ft", "goals_a_ft"])
+        casa = listas_minutos(partidas["goals_h_minutes"])
+        fora = listas_minutos(partidas["goals_a_minutes"])
+        # Mesmo critério do banco: só jogos com todos os minutos informados
+        completos = [
+            len(c) == gols_casa and len(f) == gols_fora
+            for c, f, gols_casa, gols_fora in zip(casa, fora, partidas["goals_h_ft"], partidas["goals_a_ft"])
+        ]
+        minutos_casa, minutos_fora = filtrar_completos(casa, fora, completos)
+    if not minutos_casa:
+        return ModeloAoVivo.uniforme()
+    return ModeloAoVivo.ajustar(minutos_casa, minutos_fora)
+
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def obter_fracao_primeiro_tempo(versao: str = None) -> tuple:
+    """
+    Fração dos gols de mandantes e de visitantes que sai no 1º tempo, pelos
+    placares do intervalo: soma de goals_*_ht / soma de goals_*_ft nos jogos
+    com os dois placares (do banco ou da cópia local). Sem jogos, usa
+    FRACAO_PRIMEIRO_TEMPO.
+    """
+    colunas = ["goals_h_ht", "goals_h_ft", "goals_a_ht", "goals_a_ft"]
+    try:
+        somas = consultar(
+            "SELECT sum(goals_h_ht) AS goals_h_ht, sum(goals_h_ft) AS goals_h_ft, "
+            "sum(goals_a_ht) AS goals_a_ht, sum(goals_a_ft) AS goals_a_ft "
+            "FROM tabela_ligas WHERE " + " AND ".join(f"{c} IS NOT NULL" for c in colunas) + ";"
+        ).iloc[0]
+    except Exception:
+        somas = ler_staging()[colunas].dropna().astype(float).sum()
+    somas = pd.to_numeric(somas, errors="coerce").fillna(0)
+    return tuple(
+        float(somas[ht] / somas[ft]) if somas[ft] > 0 else FRACAO_PRIMEIRO_TEMPO
+        for ht, ft in (("goals_h_ht", "goals_h_ft"), ("goals_a_ht", "goals_a_ft"))
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def obter_modelo_escanteios(versao: str = None) -> escanteios.ModeloEscanteios:
+    """
+    Modelo de escanteios ajustado com os jogos da janela recente
+    (escanteios.JANELA_DIAS), uma vez por versão dos dados.
+    """
+    data_inicio = datetime.date.today() - datetime.timedelta(days=escanteios.JANELA_DIAS)
+    try:
+        consulta, parametros = montar_consulta(escanteios.COLUNAS_JOGOS, data_inicio=data_inicio)
+        jogos = consultar(consulta, parametros)
+    except Exception:
+        jogos = filtrar_local(ler_staging(), escanteios.COLUNAS_JOGOS, data_inicio=data_inicio)
+    return escanteios.ModeloEscanteios.ajustar(jogos)
+
+
+@st.cache_data(show_spinner=False)
+def listar_times(versao: str = None) -> list:
+    """Lista ordenada de todos os times (mandantes e visitantes)."""
+    try:
+        times = consultar("SELECT nome AS time FROM teams ORDER BY 1;")["time"]
+    except Exception:
+        dados_locais = ler_staging()
+        times = pd.concat([dados_locais["home"], dados_locais["away"]]).dropna().drop_duplicates()
+    return sorted(times.tolist())
+
+
+@st.cache_data(show_spinner=False)
+def intervalo_datas(versao: str = None) -> tuple:
+    """Primeira e última data de jogo disponíveis."""
+    try:
+        intervalo = consultar("SELECT min(match_date), max(match_date) FROM tabela_ligas;")
+        return intervalo.iat[0, 0], intervalo.iat[0, 1]
+    except Exception:
+        datas = pd.to_datetime(ler_staging()["match_date"]).dropna()
+        if datas.empty:
+            return None, None
+        return datas.min().date(), datas.max().date()
+
+
+# =============================
+# AGREGADOS POR TIME
+# =============================
+# Médias de gols, chutes e escanteios por time, lidas da tabela
+# agregados_times mantida pelo ETL. Meses inteiros do período vêm dos
+# agregados; apenas os dias dos meses das pontas são somados a partir dos
+# jogos.
+
+# Colunas de chutes e escanteios de cada mando
+COLUNAS_MANDO = {
+    "casa": ("home", "shots_h", "corners_h_ft"),
+    "fora": ("away", "shots_a", "corners_a_ft"),
+}
+
+
+def _inicio_mes_seguinte(data: datetime.date) -> datetime.date:
+    return (data.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+
+
+def dividir_periodo(data_inicio=None, data_fim=None) -> tuple:
+    """
+    Divide o período em meses completos [mes_inicio, mes_fim) e nos trechos
+    das pontas que não cobrem um mês inteiro. Retorna
+    (mes_inicio, mes_fim, trechos), com None para pontas abertas.
+    """
+    mes_inicio = mes_fim = None
+    if data_inicio is not None:
+        data_inicio = pd.Timestamp(data_inicio).date()
+        mes_inicio = data_inicio if data_inicio.day == 1 else _inicio_mes_seguinte(data_inicio)
+    if data_fim is not None:
+        data_fim = pd.Timestamp(data_fim).date()
+        mes_fim = _inicio_mes_seguinte(data_fim)
+        if data_fim + datetime.timedelta(days=1) != mes_fim:
+            mes_fim = data_fim.replace(day=1)
+
+    if mes_inicio is not None and mes_fim is not None and mes_inicio >= mes_fim:
+        # Período dentro de um único mês: nenhum mês completo
+        return mes_inicio, mes_inicio, [(data_inicio, data_fim)]
+    trechos = []
+    if data_inicio is not None and data_inicio < mes_inicio:
+        trechos.append((data_inicio, mes_inicio - datetime.timedelta(days=1)))
+    if data_fim is not None and mes_fim <= data_fim:
+        trechos.append((mes_fim, data_fim))
+    return mes_inicio, mes_fim, trechos
+
+
+def montar_consulta_agregados(mando: str, times=None, data_inicio=None, data_fim=None) -> tuple:
+    """
+    Monta a consulta que soma os agregados dos meses completos com os jogos
+    das pontas do período, por time. Retorna (consulta, parâmetros).
+    """
+    coluna_time, coluna_chutes, coluna_escanteios = COLUNAS_MANDO[mando]
+    mes_inicio, mes_fim, trechos = dividir_periodo(data_inicio, data_fim)
+
+    condicoes, parametros = [sql.SQL("mando = %s")], [mando]
+    if mes_inicio is not None:
+        condicoes.append(sql.SQL("mes >= %s"))
+        parametros.append(mes_inicio)
+    if mes_fim is not None:
+        condicoes.append(sql.SQL("mes < %s"))
+        parametros.append(mes_fim)
+    if times:
+        condicoes.append(sql.SQL("team_id IN " + IDS_TIMES))
+        parametros.append(list(times))
+    partes = [
+        sql.SQL(
+            "SELECT team_id, jogos, soma_gols, soma_chutes, n_chutes, soma_escanteios, n_escanteios "
+            "FROM agregados_times WHERE "
+        ) + sql.SQL(" AND ").join(condicoes)
+    ]
+
+    if trechos:
+        condicoes = [
+            sql.SQL("(") + sql.SQL(" OR ").join(
+                [sql.SQL("match_date BETWEEN %s AND %s")] * len(trechos)
+            ) + sql.SQL(")")
+        ]
+        trecho_parametros = [data for trecho in trechos for data in trecho]
+        if times:
+            condicoes.append(sql.SQL("{}_id IN " + IDS_TIMES).format(sql.SQL(coluna_time)))
+            trecho_parametros.append(list(times))
+        partes.append(
+            sql.SQL(
+                "SELECT {time}, count(*), sum(COALESCE(totalgoals_ft, 0)), "
+                "sum({chutes}), count({chutes}), sum({escanteios}), count({escanteios}) "
+                "FROM tabela_ligas WHERE {time} IS NOT NULL AND "
+            ).format(
+                time=sql.Identifier(coluna_time + "_id"),
+                chutes=sql.Identifier(coluna_chutes),
+                escanteios=sql.Identifier(coluna_escanteios)
+            )
+            + sql.SQL(" AND ").join(condicoes)
+            + sql.SQL(" GROUP BY 1")
+        )
+        parametros += trecho_parametros
+
+    # Soma pelas chaves dos times; o nome só entra para exibição
+    consulta = sql.SQL("""
+        SELECT teams.nome AS time,
+               sum(jogos) AS jogos,
+               sum(soma_gols) / NULLIF(sum(jogos), 0) AS media_gols,
+               sum(soma_chutes) / NULLIF(sum(n_chutes), 0) AS media_chutes,
+               sum(soma_escanteios) / NULLIF(sum(n_escanteios), 0) AS media_escanteios
+        FROM ({}) AS partes (team_id, jogos, soma_gols, soma_chutes, n_chutes, soma_escanteios, n_escanteios)
+        JOIN teams ON teams.id = partes.team_id
+        GROUP BY partes.team_id, teams.nome
+        ORDER BY teams.nome;
+    """).format(sql.SQL(" UNION ALL ").join(partes))
+    return consulta, parametros
+
+
+def agregar_local(dados: pd.DataFrame, mando: str, times=None, data_inicio=None,
+                  data_fim=None) -> pd.DataFrame:
+    """Calcula em memória as mesmas médias de montar_consulta_agregados (cópia local)."""
+    coluna_time, coluna_chutes, coluna_escanteios = COLUNAS_MANDO[mando]
+    jogos = filtrar_local(dados, None, times, data_inicio, data_fim, mando=mando)
+    jogos = jogos.assign(totalgoals_ft=pd.to_numeric(jogos["totalgoals_ft"], errors="coerce").fillna(0))
+    return (
+        jogos.groupby(coluna_time)
+        .agg(
+            jogos=("totalgoals_ft", "size"),
+            media_gols=("totalgoals_ft", "mean"),
+            media_chutes=(coluna_chutes, "mean"),
+            media_escanteios=(coluna_escanteios, "mean")
+        )
+        .rename_axis("time")
+        .reset_index()
+    )
+
+
+@st.cache_data(show_spinner=False)
+def estatisticas_times(mando: str, times: tuple = None, data_inicio=None, data_fim=None,
+                       versao: str = None) -> pd.DataFrame:
+    """
+    Médias por jogo de gols, chutes e escanteios de cada time como mandante
+    (mando='casa') ou visitante (mando='fora') no período, indexadas pelo time.
+    """
+    try:
+        consulta, parametros = montar_consulta_agregados(mando, times, data_inicio, data_fim)
+        estatisticas = consultar(consulta, parametros)
+    except Exception:
+        estatisticas = agregar_local(ler_staging(), mando, times, data_inicio, data_fim)
+    return estatisticas.set_index("time").astype(float)
@@ -0,0 +1,90 @@
+import contextlib
+import logging
+import os
+
+import psycopg2
+from psycopg2 import pool
+from dotenv import load_dotenv
+
+# =============================
+# CONEXÕES COM O POSTGRESQL
+# =============================
+# Configuração lida do ambiente (ou do arquivo .env) e pool de conexões
+# compartilhado pelo processo, usado pelo ETL e pelas páginas do Streamlit.
+
+load_dotenv()
+
+# Tempo máximo de cada instrução, em milissegundos
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+# Tempo máximo para abrir uma conexão, em segundos
+CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+
+# Colunas NUMERIC chegam como float em vez de decimal.Decimal: os valores
+# já são arredondados para 2 casas e Decimal é lento e ocupa muito mais memória
+NUMERIC_COMO_FLOAT = psycopg2.extensions.new_type(
+    psycopg2.extensions.DECIMAL.values, "NUMERIC_COMO_FLOAT",
+    lambda valor, cur: float(valor) if valor is not None else None
+)
+psycopg2.extensions.register_type(NUMERIC_COMO_FLOAT)
+
+
+def configuracao(statement_timeout_ms: int = STATEMENT_TIMEOUT_MS) -> dict:
+    """Parâmetros de conexão a partir das variáveis DB_HOST, DB_NAME, DB_USER, DB_PASSWORD e DB_PORT."""
+    return {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "database": os.getenv("DB_NAME", "matches"),
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASSWORD", ""),
+        "port": os.getenv("DB_PORT", "5432"),
+        "connect_timeout": CONNECT_TIMEOUT,
+        "options": f"-c statement_timeout={statement_timeout_ms}",
+        "application_name": "futanalytics"
+    }
+
+
+def conectar(statement_timeout_ms: int = STATEMENT_TIMEOUT_MS):
+    """Abre uma conexão avulsa (fora do pool)."""
+    return psycopg2.connect(**configuracao(statement_timeout_ms))
+
+
+def criar_pool(minimo: int = POOL_MIN, maximo: int = POOL_MAX,
+               statement_timeout_ms: int = STATEMENT_TIMEOUT_MS) -> pool.ThreadedConnectionPool:
+    """Cria um pool de conexões seguro para uso por várias threads."""
+    return pool.ThreadedConnectionPool(minimo, maximo, **configuracao(statement_timeout_ms))
+
+
+def conexao_saudavel(conn) -> bool:
+    """Verifica se a conexão continua utilizável (equivalente a um 'pre-ping')."""
+    if conn.closed:
+        return False
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1;")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+@contextlib.contextmanager
+def conexao(pool_conexoes: pool.ThreadedConnectionPool):
+    """
+    Empresta uma conexão do pool, trocando-a por uma nova caso a conexão
+    guardada tenha caído (reinício do banco, timeout de rede etc.).
+    A conexão volta ao pool ao final; em caso de erro a transação é desfeita.
+    """
+    conn = pool_conexoes.getconn()
+    if not conexao_saudavel(conn):
+        logging.warning("Conexão inválida encontrada no pool; abrindo uma nova.")
+        pool_conexoes.putconn(conn, close=True)
+        conn = pool_conexoes.getconn()
+    try:
+        yield conn
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        pool_conexoes.putconn(conn, close=bool(conn.closed))
@@ -0,0 +1,363 @@
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+from scipy.special import gammaln
+
+from precificacao import MatrizPlacar, MAX_GOLS_PADRAO
+
+# =============================
+# MODELO DIXON-COLES POR LIGA
+# =============================
+# Ajuste por máxima verossimilhança, por liga, do modelo de Dixon e Coles
+# (1997): gols de Poisson com
+#   log λ casa = intercepto + vantagem_casa + ataque[mandante] - defesa[visitante]
+#   log λ fora = intercepto + ataque[visitante] - defesa[mandante]
+# e a correção τ(ρ) dos placares 0x0, 1x0, 0x1 e 1x1. Cada jogo pesa
+# exp(-ξ × dias até a data de referência). A verossimilhança e o gradiente
+# são calculados de forma vetorizada sobre os arrays de jogos da liga, e o
+# L-BFGS-B parte dos parâmetros do ajuste anterior quando existe um.
+
+MEIA_VIDA_DIAS = float(os.getenv("DIXON_COLES_MEIA_VIDA_DIAS", "180"))
+# Apenas os jogos desta janela entram no ajuste (os mais antigos pesam quase nada)
+JANELA_DIAS = int(os.getenv("DIXON_COLES_JANELA_DIAS", "1095"))
+# Penalidade L2 em ataque e defesa: torna o modelo identificável e estabiliza
+# times com poucos jogos
+PENALIDADE = float(os.getenv("DIXON_COLES_PENALIDADE", "0.1"))
+WORKERS = int(os.getenv("DIXON_COLES_WORKERS", str(os.cpu_count() or 1)))
+# Ligas com menos jogos na janela não são ajustadas
+MIN_JOGOS = int(os.getenv("DIXON_COLES_MIN_JOGOS", "30"))
+
+LIMITE_RHO = 0.3
+
+
+def _tau(gols_casa, gols_fora, lambda_casa, lambda_fora, rho) -> tuple:
+    """
+    Correção τ de cada jogo e suas derivadas em relação a log λ casa,
+    log λ fora e ρ. Retorna (τ, dτ/dη_casa, dτ/dη_fora, dτ/dρ).
+    """
+    tau = np.ones_like(lambda_casa)
+    d_casa = np.zeros_like(lambda_casa)
+    d_fora = np.zeros_like(lambda_casa)
+    d_rho = np.zeros_like(lambda_casa)
+
+    zero_zero = (gols_casa == 0) & (gols_fora == 0)
+    zero_um = (gols_casa == 0) & (gols_fora == 1)
+    um_zero = (gols_casa == 1) & (gols_fora == 0)
+    um_um = (gols_casa == 1) & (gols_fora == 1)
+
+    produto = lambda_casa * lambda_fora
+    tau[zero_zero] = 1 - produto[zero_zero] * rho
+    d_casa[zero_zero] = d_fora[zero_zero] = -produto[zero_zero] * rho
+    d_rho[zero_zero] = -produto[zero_zero]
+
+    tau[zero_um] = 1 + lambda_casa[zero_um] * rho
+    d_casa[zero_um] = lambda_casa[zero_um] * rho
+    d_rho[zero_um] = lambda_casa[zero_um]
+
+    tau[um_zero] = 1 + lambda_fora[um_zero] * rho
+    d_fora[um_zero] = lambda_fora[um_zero] * rho
+    d_rho[um_zero] = lambda_fora[um_zero]
+
+    tau[um_um] = 1 - rho
+    d_rho[um_um] = -1.0
+    return tau, d_casa, d_fora, d_rho
+
+
+def _objetivo(parametros, casa, fora, gols_casa, gols_fora, pesos, n_times, penalidade):
+    """Menos a log-verossimilhança ponderada (com penalidade) e seu gradiente."""
+    ataque = parametros[:n_times]
+    defesa = parametros[n_times:2 * n_times]
+    vantagem_casa, intercepto, rho = parametros[2 * n_times:]
+
+    eta_casa = intercepto + vantagem_casa + ataque[casa] - defesa[fora]
+    eta_fora = intercepto + ataque[fora] - defesa[casa]
+    lambda_casa, lambda_fora = np.exp(eta_casa), np.exp(eta_fora)
+
+    tau, d_casa, d_fora, d_rho = _tau(gols_casa, gols_fora, lambda_casa, lambda_fora, rho)
+    tau = np.maximum(tau, 1e-10)
+    log_vero = pesos * (
+        np.log(tau) + gols_casa * eta_casa - lambda_casa + gols_fora * eta_fora - lambda_fora
+        - gammaln(gols_casa + 1) - gammaln(gols_fora + 1)
+    )
+    valor = -log_vero.sum() + 0.5 * penalidade * (ataque @ ataque + defesa @ defesa)
+
+    # Derivadas em relação a log λ de cada jogo, espalhadas pelos parâmetros
+    g_casa = pesos * (gols_casa - lambda_casa + d_casa / tau)
+    g_fora = pesos * (gols_fora - lambda_fora + d_fora / tau)
+    g_ataque = np.bincount(casa, g_casa, n_times) + np.bincount(fora, g_fora, n_times)
+    g_defesa = -np.bincount(fora, g_casa, n_times) - np.bincount(casa, g_fora, n_times)
+    gradiente = -np.concatenate([
+        g_ataque, g_defesa,
+        [g_casa.sum(), g_casa.sum() + g_fora.sum(), (pesos * d_rho / tau).sum()]
+    ])
+    gradiente[:n_times] += penalidade * ataque
+    gradiente[n_times:2 * n_times] += penalidade * defesa
+    return valor, gradiente
+
+
+class ModeloDixonColes:
+    """
+    Parâmetros ajustados de uma liga: ataque e defesa de cada time (em
+    'times'), vantagem de jogar em casa, intercepto e ρ.
+    """
+
+    def __init__(self, times, ataque, defesa, vantagem_casa: float, intercepto: float, rho: float,
+                 referencia=None, n_jogos: int = 0, log_verossimilhanca: float = float("nan"),
+                 iteracoes: int = 0):
+        self.times = list(times)
+        self.ataque = np.asarray(ataque, dtype=float)
+        self.defesa = np.asarray(defesa, dtype=float)
+        self.vantagem_casa = float(vantagem_casa)
+        self.intercepto = float(intercepto)
+        self.rho = float(rho)
+        self.referencia = referencia
+        self.n_jogos = int(n_jogos)
+        self.log_verossimilhanca = float(log_verossimilhanca)
+        self.iteracoes = int(iteracoes)
+        self._posicao = {time: i for i, time in enumerate(self.times)}
+
+    def __contains__(self, time) -> bool:
+        return time in self._posicao
+
+    # -----------------------------
+    # Ajuste
+    # -----------------------------
+    @classmethod
+    def ajustar(cls, jogos: pd.DataFrame, inicial: "ModeloDixonColes" = None, referencia=None,
+                meia_vida_dias: float = MEIA_VIDA_DIAS, penalidade: float = PENALIDADE) -> "ModeloDixonColes":
+        """
+        Ajusta o modelo aos 'jogos' (colunas home, away, match_date,
+        goals_h_ft e goals_a_ft). Com 'inicial', parte dos parâmetros do
+        ajuste anterior (times novos começam em zero).
+        """
+        jogos = jogos.dropna(subset=["home", "away", "match_date", "goals_h_ft", "goals_a_ft"])
+        datas = pd.to_datetime(jogos["match_date"])
+        referencia = pd.Timestamp(referencia) if referencia is not None else datas.max()
+        codigos, times = pd.factorize(pd.concat([jogos["home"], jogos["away"]], ignore_index=True), sort=True)
+        n_times, n_jogos = len(times), len(jogos)
+        casa, fora = codigos[:n_jogos], codigos[n_jogos:]
+        gols_casa = jogos["goals_h_ft"].to_numpy(dtype=float)
+        gols_fora = jogos["goals_a_ft"].to_numpy(dtype=float)
+        pesos = np.exp(-np.log(2) / meia_vida_dias * (referencia - datas).dt.days.to_numpy(dtype=float))
+
+        x0 = np.zeros(2 * n_times + 3)
+        x0[2 * n_times + 1] = np.log(max(np.average(gols_casa + gols_fora, weights=pesos) / 2, 0.1))
+        if inicial is not None:
+            for posicao, time in enumerate(times):
+                if time in inicial:
+                    x0[posicao] = inicial.ataque[inicial._posicao[time]]
+                    x0[n_times + posicao] = inicial.defesa[inicial._posicao[time]]
+            x0[2 * n_times:] = [inicial.vantagem_casa, inicial.intercepto, inicial.rho]
+
+        limites = [(None, None)] * (2 * n_times + 2) + [(-LIMITE_RHO, LIMITE_RHO)]
+        resultado = minimize(
+            _objetivo, x0, jac=True, method="L-BFGS-B", bounds=limites,
+            args=(casa, fora, gols_casa, gols_fora, pesos, n_times, penalidade)
+        )
+        parametros = resultado.x
+        return cls(
+            times, parametros[:n_times], parametros[n_times:2 * n_times], *parametros[2 * n_times:],
+            referencia=referencia.date(), n_jogos=n_jogos, log_verossimilhanca=-resultado.fun,
+            iteracoes=resultado.nit
+        )
+
+    # -----------------------------
+    # Previsão
+    # -----------------------------
+    def lambdas(self, mandantes, visitantes) -> tuple:
+        """Gols esperados (λ casa, λ fora) por par; NaN para times fora do modelo."""
+        casa = np.array([self._posicao.get(t, -1) for t in np.atleast_1d(mandantes)])
+        fora = np.array([self._posicao.get(t, -1) for t in np.atleast_1d(visitantes)])
+        conhecidos = (casa >= 0) & (fora >= 0)
+        ataque = np.append(self.ataque, np.nan)
+        defesa = np.append(self.defesa, np.nan)
+        lambda_casa = np.exp(self.intercepto + self.vantagem_casa + ataque[casa] - defesa[fora])
+        lambda_fora = np.exp(self.intercepto + ataque[fora] - defesa[casa])
+        return np.where(conhecidos, lambda_casa, np.nan), np.where(conhecidos, lambda_fora, np.nan)
+
+    def matriz(self, mandantes, visitantes, max_gols: int = MAX_GOLS_PADRAO) -> "MatrizDixonColes":
+        """Matriz de placares com a correção de Dixon-Coles para os pares informados."""
+        lambda_casa, lambda_fora = self.lambdas(mandantes, visitantes)
+        if np.ndim(mandantes) == 0 and np.ndim(visitantes) == 0:
+            lambda_casa, lambda_fora = lambda_casa[0], lambda_fora[0]
+        return MatrizDixonColes(lambda_casa, lambda_fora, self.rho, max_gols)
+
+    # -----------------------------
+    # Serialização (coluna JSONB)
+    # -----------------------------
+    def para_dict(self) -> dict:
+        return {
+            "times": self.times,
+            "ataque": self.ataque.tolist(),
+            "defesa": self.defesa.tolist(),
+            "vantagem_casa": self.vantagem_casa,
+            "intercepto": self.intercepto,
+            "rho": self.rho,
+            "referencia": str(self.referencia) if self.referencia is not None else None,
+            "n_jogos": self.n_jogos,
+            "log_verossimilhanca": self.log_verossimilhanca,
+            "iteracoes": self.iteracoes,
+        }
+
+    @classmethod
+    def de_dict(cls, dados: dict) -> "ModeloDixonColes":
+        dados = dict(dados)
+        return cls(dados.pop("times"), dados.pop("ataque"), dados.pop("defesa"), **dados)
+
+
+class MatrizDixonColes(MatrizPlacar):
+    """MatrizPlacar com as probabilidades de 0x0, 1x0, 0x1 e 1x1 corrigidas por τ(ρ)."""
+
+    def __init__(self, lambda_home, lambda_away, rho: float, max_gols: int = MAX_GOLS_PADRAO,
+                 acumular_cauda: bool = True):
+        super().__init__(lambda_home, lambda_away, max_gols, acumular_cauda)
+        self.rho = rho
+        p = self.p.copy()
+        p[:, 0, 0] *= 1 - self.lambda_home * self.lambda_away * rho
+        p[:, 0, 1] *= 1 + self.lambda_home * rho
+        p[:, 1, 0] *= 1 + self.lambda_away * rho
+        p[:, 1, 1] *= 1 - rho
+        p.flags.writeable = False
+        self.p = p
+
+    def ambas_marcam(self):
+        """Probabilidade de os dois times marcarem (da matriz corrigida)."""
+        return self._saida(self.p[:, 1:, 1:].sum(axis=(1, 2)))
+
+
+# =============================
+# AJUSTE DAS LIGAS NO BANCO
+# =============================
+def criar_tabela_modelos(cur):
+    """Tabela com o último ajuste de cada liga."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS modelos_dixon_coles (
+            league_id           INTEGER PRIMARY KEY REFERENCES leagues (id),
+            ajustado_em         TIMESTAMPTZ NOT NULL DEFAULT now(),
+            referencia          DATE,
+            n_jogos             INTEGER NOT NULL,
+            log_verossimilhanca DOUBLE PRECISION,
+            parametros          JSONB NOT NULL
+        );
+    """)
+
+
+def carregar_modelos(cur, ligas=None) -> dict:
+    """Modelos gravados (liga -> ModeloDixonColes), de todas ou das ligas informadas."""
+    consulta = """
+        SELECT l.nome, m.parametros FROM modelos_dixon_coles m
+        JOIN leagues l ON l.id = m.league_id
+    """
+    if ligas is None:
+        cur.execute(consulta + ";")
+    else:
+        cur.execute(consulta + " WHERE l.nome = ANY(%s);", (list(ligas),))
+    return {
+        liga: ModeloDixonColes.de_dict(parametros if isinstance(parametros, dict) else json.loads(parametros))
+        for liga, parametros in cur.fetchall()
+    }
+
+
+def ligas_sem_modelo(cur) -> list:
+    """Ligas cadastradas que ainda não têm modelo gravado."""
+    criar_tabela_modelos(cur)
+    cur.execute("SELECT nome FROM leagues WHERE id NOT IN (SELECT league_id FROM modelos_dixon_coles);")
+    return [linha[0] for linha in cur.fetchall()]
+
+
+def carregar_jogos(cur, ligas) -> dict:
+    """
+    Jogos com placar de cada liga dentro da JANELA_DIAS (liga -> DataFrame),
+    contada a partir do último jogo com placar da própria liga.
+    """
+    cur.execute(
+        """
+        SELECT league, home, away, match_date, goals_h_ft, goals_a_ft
+        FROM (
+            SELECT league, home, away, match_date, goals_h_ft, goals_a_ft,
+                   max(match_date) OVER (PARTITION BY league_id) AS ultimo_jogo
+            FROM vw_tabela_ligas
+            WHERE league = ANY(%s)
+              AND goals_h_ft IS NOT NULL AND goals_a_ft IS NOT NULL
+        ) AS jogados
+        WHERE match_date >= ultimo_jogo - %s;
+        """,
+        (list(ligas), JANELA_DIAS)
+    )
+    jogos = pd.DataFrame(cur.fetchall(), columns=["league", "home", "away", "match_date", "goals_h_ft", "goals_a_ft"])
+    return {
+        liga: grupo.drop(columns="league")
+        for liga, grupo in jogos.groupby("league") if len(grupo) >= MIN_JOGOS
+    }
+
+
+def _ajustar_liga(jogos: pd.DataFrame, inicial: ModeloDixonColes = None) -> ModeloDixonColes:
+    """Ajuste de uma liga (executado no pool de processos)."""
+    return ModeloDixonColes.ajustar(jogos, inicial)
+
+
+def ajustar_ligas(jogos_por_liga: dict, iniciais: dict = None, workers: int = WORKERS) -> dict:
+    """
+    Ajusta as ligas em paralelo, cada uma partindo do seu modelo anterior.
+    Falhas de uma liga são registradas e as demais são retornadas.
+    """
+    iniciais = iniciais or {}
+    modelos = {}
+    if workers <= 1 or len(jogos_por_liga) <= 1:
+        for liga, jogos in jogos_por_liga.items():
+            try:
+                modelos[liga] = _ajustar_liga(jogos, iniciais.get(liga))
+            except Exception as e:
+                logging.error("Erro ao ajustar o modelo Dixon-Coles da liga %s: %s", liga, e)
+        return modelos
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futuros = {
+            liga: executor.submit(_ajustar_liga, jogos, iniciais.get(liga))
+            for liga, jogos in jogos_por_liga.items()
+        }
+        for liga, futuro in futuros.items():
+            try:
+                modelos[liga] = futuro.result()
+            except Exception as e:
+                logging.error("Erro ao ajustar o modelo Dixon-Coles da liga %s: %s", liga, e)
+        return modelos
+
+
+def atualizar_modelos(conn, ligas, workers: int = WORKERS) -> dict:
+    """
+    Reajusta e grava os modelos das ligas informadas (nomes), com warm start
+    a partir dos modelos gravados. Retorna os modelos ajustados.
+    """
+    ligas = list(ligas)
+    if not ligas:
+        return {}
+    with conn, conn.cursor() as cur:
+        criar_tabela_modelos(cur)
+        jogos_por_liga = carregar_jogos(cur, ligas)
+        iniciais = carregar_modelos(cur, ligas)
+
+    modelos = ajustar_ligas(jogos_por_liga, iniciais, workers)
+
+    with conn, conn.cursor() as cur:
+        for liga, modelo in modelos.items():
+            cur.execute(
+                """
+                INSERT INTO modelos_dixon_coles (league_id, referencia, n_jogos, log_verossimilhanca, parametros)
+                SELECT id, %s, %s, %s, %s FROM leagues WHERE nome = %s
+                ON CONFLICT (league_id) DO UPDATE SET
+                    ajustado_em = now(), referencia = EXCLUDED.referencia, n_jogos = EXCLUDED.n_jogos,
+                    log_verossimilhanca = EXCLUDED.log_verossimilhanca, parametros = EXCLUDED.parametros;
+                """,
+                (modelo.referencia, modelo.n_jogos, modelo.log_verossimilhanca,
+                 json.dumps(modelo.para_dict()), liga)
+            )
+            logging.info(
+                f"Dixon-Coles {liga}: {modelo.n_jogos} jogos, {modelo.iteracoes} iterações, "
+                f"ρ={modelo.rho:.3f}, vantagem casa={modelo.vantagem_casa:.3f}."
+            )
+    return modelos
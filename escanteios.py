@@ -0,0 +1,173 @@
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.stats import nbinom
+
+from precificacao import MatrizPlacar
+from ratings import COLUNAS_FORCAS, calcular_forcas, contribuicoes
+
+# =============================
+# MODELO DE ESCANTEIOS
+# =============================
+# Escanteios de cada time com distribuição binomial negativa (variância
+# μ + α μ², maior que a da Poisson, como se observa nos escanteios). As
+# médias seguem o mesmo esquema dos ratings de gols, aplicado aos
+# escanteios: forças de "ataque" (escanteios a favor) e "defesa"
+# (escanteios cedidos), em casa e fora, relativas à média da liga e com
+# decaimento no tempo:
+#   μ casa = média da liga em casa × ataque_casa(mandante) × defesa_fora(visitante)
+#   μ fora = média da liga fora × ataque_fora(visitante) × defesa_casa(mandante)
+# A dispersão α é estimada por liga pelos momentos dos resíduos. A matriz de
+# escanteios (casa x fora) reaproveita a MatrizPlacar, então linhas de
+# total e "mais escanteios" (1X2) saem das mesmas reduções dos gols.
+
+# Maior contagem de escanteios por time na grade (a última acumula a cauda)
+MAX_ESCANTEIOS = 25
+LINHAS = (7.5, 8.5, 9.5, 10.5, 11.5)
+# Jogos considerados no ajuste (os mais antigos já pesam pouco)
+JANELA_DIAS = int(os.getenv("ESCANTEIOS_JANELA_DIAS", "730"))
+DISPERSAO_MINIMA = 1e-3
+
+COLUNAS_JOGOS = ["league", "home", "away", "match_date", "corners_h_ft", "corners_a_ft"]
+
+# Mercado -> coluna da odd no CSV dos jogos do dia
+MERCADOS_ESCANTEIOS = {
+    "Casa": "Odd_Corners_H",
+    "Empate": "Odd_Corners_D",
+    "Fora": "Odd_Corners_A",
+    **{
+        f"{lado} {linha}": f"Odd_Corners_{lado}{int(linha * 10)}"
+        for linha in LINHAS for lado in ("Over", "Under")
+    },
+}
+
+
+def _marginais(medias: np.ndarray, dispersao: np.ndarray, max_escanteios: int) -> tuple:
+    """Probabilidades de 0..max_escanteios por jogo e a massa acima da grade."""
+    n = 1 / dispersao
+    p = n / (n + medias)
+    contagens = np.arange(max_escanteios + 1)
+    marginal = nbinom.pmf(contagens[None, :], n[:, None], p[:, None])
+    return marginal, nbinom.sf(max_escanteios, n, p)
+
+
+class MatrizEscanteios(MatrizPlacar):
+    """
+    MatrizPlacar com marginais binomiais negativas: 'over'/'under' são as
+    linhas de total de escanteios e 'resultado' dá casa com mais escanteios,
+    empate e visitante com mais escanteios.
+    """
+
+    def __init__(self, media_home, media_away, dispersao, max_escanteios: int = MAX_ESCANTEIOS):
+        media_home = np.asarray(media_home, dtype=float)
+        media_away = np.asarray(media_away, dtype=float)
+        escalar = media_home.ndim == 0 and media_away.ndim == 0
+        media_home, media_away, dispersao = np.broadcast_arrays(
+            np.atleast_1d(media_home), np.atleast_1d(media_away), np.atleast_1d(np.asarray(dispersao, dtype=float))
+        )
+        marginal_home, cauda_home = _marginais(media_home, dispersao, max_escanteios)
+        marginal_away, cauda_away = _marginais(media_away, dispersao, max_escanteios)
+        massa_cauda = 1 - marginal_home.sum(axis=1) * marginal_away.sum(axis=1)
+        marginal_home[:, -1] += cauda_home
+        marginal_away[:, -1] += cauda_away
+        self._inicializar(media_home, media_away, marginal_home, marginal_away,
+                          massa_cauda, max_escanteios, True, escalar)
+        self.dispersao = dispersao
+
+
+class ModeloEscanteios:
+    """
+    Forças de escanteios por time (índice = nome, na liga em que jogou por
+    último) com as médias e a dispersão da liga.
+    """
+
+    def __init__(self, times: pd.DataFrame):
+        self.times = times
+
+    def __contains__(self, time) -> bool:
+        return time in self.times.index
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @classmethod
+    def ajustar(cls, jogos: pd.DataFrame) -> "ModeloEscanteios":
+        """Ajusta as forças e a dispersão de cada liga a partir dos jogos (COLUNAS_JOGOS)."""
+        jogos = jogos.dropna(subset=COLUNAS_JOGOS).astype({"league": str, "home": str, "away": str})
+        # Mesmo layout usado pelos ratings de gols (escanteios no lugar dos gols)
+        jogos = jogos.rename(columns={
+            "home": "home_id", "away": "away_id", "corners_h_ft": "goals_h", "corners_a_ft": "goals_a"
+        })
+        tabelas = []
+        for liga, grupo in jogos.groupby("league", sort=False):
+            datas = pd.to_datetime(grupo["match_date"])
+            por_time, somas = contribuicoes(grupo, datas.max())
+            forcas = calcular_forcas(por_time, somas)
+            media_casa = somas["gols_casa"] / max(somas["peso"], 1e-12)
+            media_fora = somas["gols_fora"] / max(somas["peso"], 1e-12)
+
+            # Dispersão pelos momentos: E[(x - μ)² - μ] = α μ²
+            mandantes, visitantes = forcas.loc[grupo["home_id"]], forcas.loc[grupo["away_id"]]
+            medias = np.concatenate([
+                media_casa * mandantes["ataque_casa"].to_numpy() * visitantes["defesa_fora"].to_numpy(),
+                media_fora * visitantes["ataque_fora"].to_numpy() * mandantes["defesa_casa"].to_numpy(),
+            ])
+            observados = np.concatenate([grupo["goals_h"].to_numpy(dtype=float), grupo["goals_a"].to_numpy(dtype=float)])
+            dispersao = max(((observados - medias) ** 2 - medias).sum() / (medias ** 2).sum(), DISPERSAO_MINIMA)
+
+            ultimo_jogo = pd.concat([
+                pd.Series(datas.to_numpy(), index=grupo["home_id"].to_numpy()),
+                pd.Series(datas.to_numpy(), index=grupo["away_id"].to_numpy()),
+            ]).groupby(level=0).max()
+            tabelas.append(forcas[COLUNAS_FORCAS].assign(
+                league=liga, media_casa=media_casa, media_fora=media_fora,
+                dispersao=dispersao, ultimo_jogo=ultimo_jogo
+            ))
+
+        if not tabelas:
+            return cls(pd.DataFrame(columns=COLUNAS_FORCAS + ["league", "media_casa", "media_fora",
+                                                              "dispersao", "ultimo_jogo"]))
+        times = (
+            pd.concat(tabelas).rename_axis("time").reset_index()
+            .sort_values("ultimo_jogo").drop_duplicates("time", keep="last")
+            .set_index("time")
+        )
+        return cls(times)
+
+    def medias(self, mandantes, visitantes) -> tuple:
+        """
+        Escanteios esperados (casa, fora) e dispersão de cada par; NaN para
+        times sem forças. A liga do mandante define as médias e a dispersão.
+        """
+        casa = self.times.reindex(pd.Index(mandantes))
+        fora = self.times.reindex(pd.Index(visitantes))
+        media_home = casa["media_casa"].to_numpy() * casa["ataque_casa"].to_numpy() * fora["defesa_fora"].to_numpy()
+        media_away = casa["media_fora"].to_numpy() * fora["ataque_fora"].to_numpy() * casa["defesa_casa"].to_numpy()
+        return media_home, media_away, casa["dispersao"].to_numpy(dtype=float)
+
+    def matriz(self, mandantes, visitantes, max_escanteios: int = MAX_ESCANTEIOS) -> MatrizEscanteios:
+        """Matriz de escanteios dos pares informados (em lote)."""
+        media_home, media_away, dispersao = self.medias(np.atleast_1d(mandantes), np.atleast_1d(visitantes))
+        dispersao = np.where(np.isfinite(dispersao), dispersao, DISPERSAO_MINIMA)
+        return MatrizEscanteios(media_home, media_away, dispersao, max_escanteios)
+
+
+def precificar_lote(modelo: ModeloEscanteios, mandantes, visitantes, linhas=LINHAS) -> pd.DataFrame:
+    """
+    Probabilidades de todos os mercados de escanteios (mais escanteios
+    casa/empate/fora e Over/Under de cada linha) para todos os pares de uma
+    vez, uma linha por jogo, com as colunas de MERCADOS_ESCANTEIOS e os
+    escanteios esperados de cada time.
+    """
+    matriz = modelo.matriz(mandantes, visitantes)
+    casa, empate, fora = matriz.resultado()
+    probabilidades = {"Casa": casa, "Empate": empate, "Fora": fora}
+    for linha in linhas:
+        probabilidades[f"Over {linha}"] = matriz.over(linha)
+        probabilidades[f"Under {linha}"] = matriz.under(linha)
+    return pd.DataFrame({
+        "Escanteios Esperados Casa": matriz.lambda_home,
+        "Escanteios Esperados Fora": matriz.lambda_away,
+        **probabilidades,
+    })
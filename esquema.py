@@ -0,0 +1,109 @@
+# =============================
+# ESQUEMA DA TABELA_LIGAS
+# =============================
+# Definições de colunas compartilhadas pelo ETL, pela área de staging
+# e pelas páginas do Streamlit.
+
+# Mapeamento das colunas da planilha para as colunas da tabela_ligas,
+# na mesma ordem usada pelo COPY
+MAPEAMENTO_COLUNAS = {
+    "Id_Jogo":              "id_jogo",
+    "League":               "league",
+    "Season":               "season",
+    "match_date":           "match_date",
+    "Rodada":               "rodada",
+    "Home":                 "home",
+    "Away":                 "away",
+    "Goals_H_HT":           "goals_h_ht",
+    "Goals_A_HT":           "goals_a_ht",
+    "TotalGoals_HT":        "totalgoals_ht",
+    "Goals_H_FT":           "goals_h_ft",
+    "Goals_A_FT":           "goals_a_ft",
+    "TotalGoals_FT":        "totalgoals_ft",
+    "Goals_H_Minutes":      "goals_h_minutes",
+    "Goals_A_Minutes":      "goals_a_minutes",
+    "Odd_H_HT":             "odd_h_ht",
+    "Odd_D_HT":             "odd_d_ht",
+    "Odd_A_HT":             "odd_a_ht",
+    "Odd_Over05_HT":        "odd_over05_ht",
+    "Odd_Under05_HT":       "odd_under05_ht",
+    "Odd_Over15_HT":        "odd_over15_ht",
+    "Odd_Under15_HT":       "odd_under15_ht",
+    "Odd_Over25_HT":        "odd_over25_ht",
+    "Odd_Under25_HT":       "odd_under25_ht",
+    "Odd_H_FT":             "odd_h_ft",
+    "Odd_D_FT":             "odd_d_ft",
+    "Odd_A_FT":             "odd_a_ft",
+    "Odd_Over05_FT":        "odd_over05_ft",
+    "Odd_Under05_FT":       "odd_under05_ft",
+    "Odd_Over15_FT":        "odd_over15_ft",
+    "Odd_Under15_FT":       "odd_under15_ft",
+    "Odd_Over25_FT":        "odd_over25_ft",
+    "Odd_Under25_FT":       "odd_under25_ft",
+    "Odd_BTTS_Yes":         "odd_btts_yes",
+    "Odd_BTTS_No":          "odd_btts_no",
+    "Odd_DC_1X":            "odd_dc_1x",
+    "Odd_DC_12":            "odd_dc_12",
+    "Odd_DC_X2":            "odd_dc_x2",
+    "PPG_Home_Pre":         "ppg_home_pre",
+    "PPG_Away_Pre":         "ppg_away_pre",
+    "PPG_Home":             "ppg_home",
+    "PPG_Away":             "ppg_away",
+    "XG_Home_Pre":          "xg_home_pre",
+    "XG_Away_Pre":          "xg_away_pre",
+    "XG_Total_Pre":         "xg_total_pre",
+    "ShotsOnTarget_H":      "shotsontarget_h",
+    "ShotsOnTarget_A":      "shotsontarget_a",
+    "ShotsOffTarget_H":     "shotsofftarget_h",
+    "ShotsOffTarget_A":     "shotsofftarget_a",
+    "Shots_H":              "shots_h",
+    "Shots_A":              "shots_a",
+    "Corners_H_FT":         "corners_h_ft",
+    "Corners_A_FT":         "corners_a_ft",
+    "TotalCorners_FT":      "totalcorners_ft",
+    "Odd_Corners_H":        "odd_corners_h",
+    "Odd_Corners_D":        "odd_corners_d",
+    "Odd_Corners_A":        "odd_corners_a",
+    "Odd_Corners_Over75":   "odd_corners_over75",
+    "Odd_Corners_Under75":  "odd_corners_under75",
+    "Odd_Corners_Over85":   "odd_corners_over85",
+    "Odd_Corners_Under85":  "odd_corners_under85",
+    "Odd_Corners_Over95":   "odd_corners_over95",
+    "Odd_Corners_Under95":  "odd_corners_under95",
+    "Odd_Corners_Over105":  "odd_corners_over105",
+    "Odd_Corners_Under105": "odd_corners_under105",
+    "Odd_Corners_Over115":  "odd_corners_over115",
+    "Odd_Corners_Under115": "odd_corners_under115"
+}
+
+# Identidade de um jogo na tabela_ligas (índice único usado pelo upsert)
+COLUNAS_CHAVE = ["league", "season", "chave_jogo"]
+
+# Colunas INTEGER e NUMERIC da tabela, convertidas antes do COPY
+# (o COPY não aceita "2.0" em coluna INTEGER, como o INSERT aceitava)
+COLUNAS_INTEIRAS = [
+    "rodada", "goals_h_ht", "goals_a_ht", "totalgoals_ht", "goals_h_ft", "goals_a_ft",
+    "totalgoals_ft", "shotsontarget_h", "shotsontarget_a", "shotsofftarget_h",
+    "shotsofftarget_a", "shots_h", "shots_a", "corners_h_ft", "corners_a_ft",
+    "totalcorners_ft"
+]
+
+COLUNAS_NUMERICAS = [
+    "odd_h_ht", "odd_d_ht", "odd_a_ht", "odd_over05_ht", "odd_under05_ht",
+    "odd_over15_ht", "odd_under15_ht", "odd_over25_ht", "odd_under25_ht", "odd_h_ft",
+    "odd_d_ft", "odd_a_ft", "odd_over05_ft", "odd_under05_ft", "odd_over15_ft",
+    "odd_under15_ft", "odd_over25_ft", "odd_under25_ft", "odd_btts_yes", "odd_btts_no",
+    "odd_dc_1x", "odd_dc_12", "odd_dc_x2", "ppg_home_pre", "ppg_away_pre", "ppg_home",
+    "ppg_away", "xg_home_pre", "xg_away_pre", "xg_total_pre", "odd_corners_h",
+    "odd_corners_d", "odd_corners_a", "odd_corners_over75", "odd_corners_under75",
+    "odd_corners_over85", "odd_corners_under85", "odd_corners_over95",
+    "odd_corners_under95", "odd_corners_over105", "odd_corners_under105",
+    "odd_corners_over115", "odd_corners_under115"
+]
+
+# Colunas DATE e TEXT (as demais colunas mapeadas)
+COLUNAS_DATA = ["match_date"]
+COLUNAS_TEXTO = [
+    coluna for coluna in MAPEAMENTO_COLUNAS.values()
+    if coluna not in COLUNAS_INTEIRAS + COLUNAS_NUMERICAS + COLUNAS_DATA
+]
@@ -1,9 +1,21 @@
 import pandas as pd
-import psycopg2
 from psycopg2 import sql
+from psycopg2.extras import execute_values
+import io
+import os
+import requests
 import schedule
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from cache_downloads import CacheDownloads
+import db
+from esquema import MAPEAMENTO_COLUNAS, COLUNAS_CHAVE, COLUNAS_INTEIRAS, COLUNAS_NUMERICAS
+from minutos_gols import listas_minutos
+import dixon_coles
+import ratings
+import staging
+from nomes_times import ResolvedorTimes
 
 # Configurar logging para acompanhar a execução
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -38,267 +50,774 @@ data_sources = {
     "USA MLS": "https://github.com/futpythontrader/YouTube/raw/refs/heads/main/Bases_de_Dados/FootyStats/Bases_de_Dados_(2022-2025)/USA%20MLS_2025.xlsx"
 }
 
-def atualizar_banco():
-    # 1. Conexão com o PostgreSQL
-    conn = psycopg2.connect(
-        host="localhost",
-        database="matches",
-        user="postgres",
-        password="1408",
-        port="5432"
+# Número de downloads e de leituras de planilha em paralelo
+ETL_WORKERS = int(os.getenv("ETL_WORKERS", "4"))
+# Tempo máximo de cada instrução da carga, em milissegundos
+ETL_STATEMENT_TIMEOUT_MS = int(os.getenv("ETL_STATEMENT_TIMEOUT_MS", "600000"))
+
+def preparar_dataframe(df: pd.DataFrame, liga: str = None, resolvedores: dict = None) -> pd.DataFrame:
+    """
+    Converte o DataFrame lido da planilha para o layout da tabela_ligas:
+    seleciona e renomeia as colunas de uma vez só (colunas ausentes viram nulas),
+    ajusta os tipos para o COPY e calcula a chave e o hash de cada jogo.
+    Com 'resolvedores' (liga -> ResolvedorTimes), os nomes dos times são
+    conciliados com as grafias já gravadas antes do cálculo da chave.
+    """
+    df = df.rename(columns={"Date": "match_date"})
+    # Remover linhas com valores ausentes em 'Home' ou 'Away'
+    df = df.dropna(subset=["Home", "Away"])
+
+    tabela = df.reindex(columns=list(MAPEAMENTO_COLUNAS)).rename(columns=MAPEAMENTO_COLUNAS)
+    tabela["match_date"] = pd.to_datetime(tabela["match_date"], errors="coerce").dt.normalize()
+    for coluna in COLUNAS_INTEIRAS:
+        tabela[coluna] = pd.to_numeric(tabela[coluna], errors="coerce").round().astype("Int64")
+    for coluna in COLUNAS_NUMERICAS:
+        tabela[coluna] = pd.to_numeric(tabela[coluna], errors="coerce").round(2)
+
+    # Ids numéricos lidos como float ("123.0") são normalizados para "123"
+    tabela["id_jogo"] = tabela["id_jogo"].astype("string").str.strip().str.replace(r"\.0$", "", regex=True)
+    if liga is not None:
+        tabela["league"] = tabela["league"].fillna(liga)
+    if resolvedores:
+        tabela = reconciliar_times(tabela, resolvedores)
+
+    tabela["chave_jogo"] = chave_jogo(tabela)
+    tabela = tabela.drop_duplicates(subset=COLUNAS_CHAVE, keep="last")
+    tabela["hash_linha"] = hash_linhas(tabela)
+    return tabela
+
+def reconciliar_times(tabela: pd.DataFrame, resolvedores: dict) -> pd.DataFrame:
+    """
+    Troca grafias alternativas (acentos, sufixos como FC/EC, apelidos) pela
+    grafia já gravada para o mesmo time na mesma liga. Nomes novos parecidos
+    com algum existente são apenas registrados no log, para revisão.
+    """
+    for league, grupo in tabela.groupby("league", sort=False):
+        resolvedor = resolvedores.get(league)
+        if resolvedor is None:
+            continue
+        trocas = {}
+        for nome in pd.unique(grupo[["home", "away"]].values.ravel()):
+            canonico = resolvedor.canonico(nome)
+            if canonico is None:
+                parecidos = resolvedor.candidatos(nome, n=1, corte=0.8)
+                if parecidos:
+                    logging.warning(f"Liga {league}: time novo '{nome}' parecido com '{parecidos[0][0]}'.")
+            elif canonico != nome:
+                trocas[nome] = canonico
+        if trocas:
+            logging.info(f"Liga {league}: nomes conciliados {trocas}.")
+            tabela.loc[grupo.index, ["home", "away"]] = grupo[["home", "away"]].replace(trocas)
+    return tabela
+
+def chave_jogo(tabela: pd.DataFrame) -> pd.Series:
+    """
+    Identidade do jogo dentro de (league, season): o id_jogo da fonte ou,
+    quando ausente, 'home|away|data'. Deve coincidir com a expressão SQL
+    usada em migrar_tabela para as linhas antigas.
+    """
+    alternativa = (
+        tabela["home"].astype("string") + "|" +
+        tabela["away"].astype("string") + "|" +
+        tabela["match_date"].dt.strftime("%Y-%m-%d").fillna("")
+    )
+    return tabela["id_jogo"].replace("", pd.NA).fillna(alternativa)
+
+def hash_linhas(tabela: pd.DataFrame) -> pd.Series:
+    """
+    Hash de 64 bits do conteúdo de cada jogo, calculado de forma vetorizada.
+    Jogos com o mesmo hash já gravado no banco não precisam ser reenviados.
+    """
+    hashes = pd.util.hash_pandas_object(tabela[list(MAPEAMENTO_COLUNAS.values())], index=False)
+    # BIGINT do PostgreSQL é com sinal: reinterpreta os bits do uint64
+    return pd.Series(hashes.to_numpy().view("int64"), index=tabela.index)
+
+def copiar_para_tabela(cur, tabela: pd.DataFrame, nome_tabela: str = "tabela_ligas"):
+    """
+    Envia o DataFrame para o PostgreSQL com COPY FROM STDIN em formato CSV,
+    em uma única ida ao servidor. Valores nulos são enviados como campos vazios.
+    """
+    buffer = io.StringIO()
+    tabela.to_csv(buffer, index=False, header=False, date_format="%Y-%m-%d")
+    buffer.seek(0)
+    copy_query = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+        sql.Identifier(nome_tabela),
+        sql.SQL(", ").join(map(sql.Identifier, tabela.columns))
+    )
+    cur.copy_expert(copy_query, buffer)
+
+def migrar_tabela(cur):
+    """
+    Adiciona as colunas de controle do upsert e, em tabelas no formato antigo
+    (nomes em TEXT), remove duplicatas deixadas pelas cargas antigas (mantendo
+    a linha mais recente) e troca os nomes pelas chaves das dimensões.
+    Por fim cria o índice único. Todas as etapas são idempotentes.
+    """
+    cur.execute("""
+        ALTER TABLE tabela_ligas ADD COLUMN IF NOT EXISTS chave_jogo TEXT;
+        ALTER TABLE tabela_ligas ADD COLUMN IF NOT EXISTS hash_linha BIGINT;
+        ALTER TABLE tabela_ligas ADD COLUMN IF NOT EXISTS atualizado_em TIMESTAMPTZ NOT NULL DEFAULT now();
+    """)
+    cur.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'tabela_ligas';
+    """)
+    if "home" in {linha[0] for linha in cur.fetchall()}:
+        migrar_formato_antigo(cur)
+    normalizar_temporadas(cur)
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_tabela_ligas_jogo
+        ON tabela_ligas (league_id, season, chave_jogo);
+    """)
+
+def normalizar_temporadas(cur):
+    """
+    Troca temporadas nulas por '' (nulos nunca conflitam no índice único, e
+    cada nova versão de um jogo sem temporada viraria uma linha a mais),
+    removendo antes as duplicatas já gravadas (mantendo a linha mais recente).
+    """
+    cur.execute("""
+        DELETE FROM tabela_ligas t
+        USING tabela_ligas d
+        WHERE (t.season IS NULL OR d.season IS NULL)
+          AND t.league_id = d.league_id
+          AND COALESCE(t.season, '') = COALESCE(d.season, '')
+          AND t.chave_jogo = d.chave_jogo
+          AND t.numero < d.numero;
+        UPDATE tabela_ligas SET season = '' WHERE season IS NULL;
+        ALTER TABLE tabela_ligas ALTER COLUMN season SET DEFAULT '';
+        ALTER TABLE tabela_ligas ALTER COLUMN season SET NOT NULL;
+    """)
+
+def migrar_formato_antigo(cur):
+    """Migra a tabela_ligas com league/home/away em TEXT para as dimensões."""
+    cur.execute("""
+        UPDATE tabela_ligas
+        SET chave_jogo = COALESCE(
+            NULLIF(regexp_replace(btrim(id_jogo), '\\.0$', ''), ''),
+            home || '|' || away || '|' || COALESCE(to_char(match_date, 'YYYY-MM-DD'), '')
+        )
+        WHERE chave_jogo IS NULL;
+    """)
+    cur.execute("""
+        DELETE FROM tabela_ligas t
+        USING tabela_ligas d
+        WHERE t.league = d.league
+          AND t.season = d.season
+          AND t.chave_jogo = d.chave_jogo
+          AND t.numero < d.numero;
+    """)
+    cur.execute("""
+        INSERT INTO leagues (nome)
+        SELECT DISTINCT league FROM tabela_ligas WHERE league IS NOT NULL
+        ON CONFLICT (nome) DO NOTHING;
+        INSERT INTO teams (nome)
+        SELECT home FROM tabela_ligas WHERE home IS NOT NULL
+        UNION
+        SELECT away FROM tabela_ligas WHERE away IS NOT NULL
+        ON CONFLICT (nome) DO NOTHING;
+
+        ALTER TABLE tabela_ligas ADD COLUMN IF NOT EXISTS league_id INTEGER REFERENCES leagues (id);
+        ALTER TABLE tabela_ligas ADD COLUMN IF NOT EXISTS home_id INTEGER REFERENCES teams (id);
+        ALTER TABLE tabela_ligas ADD COLUMN IF NOT EXISTS away_id INTEGER REFERENCES teams (id);
+        UPDATE tabela_ligas t
+        SET league_id = (SELECT id FROM leagues WHERE nome = t.league),
+            home_id = (SELECT id FROM teams WHERE nome = t.home),
+            away_id = (SELECT id FROM teams WHERE nome = t.away);
+
+        -- Os índices sobre as colunas antigas são removidos junto com elas
+        DROP VIEW IF EXISTS vw_tabela_ligas;
+        ALTER TABLE tabela_ligas DROP COLUMN league, DROP COLUMN home, DROP COLUMN away;
+    """)
+
+def criar_indices(cur):
+    """Índices usados pelos filtros das páginas (time, data e liga)."""
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS ix_tabela_ligas_home_id ON tabela_ligas (home_id);
+        CREATE INDEX IF NOT EXISTS ix_tabela_ligas_away_id ON tabela_ligas (away_id);
+        CREATE INDEX IF NOT EXISTS ix_tabela_ligas_match_date ON tabela_ligas (match_date);
+        CREATE INDEX IF NOT EXISTS ix_tabela_ligas_league_id ON tabela_ligas (league_id);
+    """)
+
+# =============================
+# DIMENSÕES DE LIGAS E TIMES
+# =============================
+# A tabela_ligas guarda apenas chaves inteiras de ligas e times; os nomes
+# ficam nas tabelas leagues e teams. A visão vw_tabela_ligas devolve o
+# layout original (com os nomes) para o ETL e para as páginas.
+#
+# A dimensão de times é global pelo nome, de propósito: o mesmo clube
+# aparece em mais de uma entrada de liga (ex.: "Brasil Serie A - 2024" e
+# "Brasil Serie A") e deve manter um único team_id. O custo é que clubes
+# homônimos de países diferentes (ex.: "Nacional") também compartilham o
+# team_id. Por isso as tabelas por time (ratings_times, agregados_times)
+# têm a chave (league_id, team_id), e quem conhece a liga do jogo escolhe
+# o rating por liga e time (ratings.lambdas com 'ligas'). Filtros só por
+# team_id, como os do painel, somam os homônimos.
+
+# Coluna de nome do DataFrame -> (coluna de chave na tabela_ligas, dimensão)
+COLUNAS_DIMENSAO = {
+    "league": ("league_id", "leagues"),
+    "home": ("home_id", "teams"),
+    "away": ("away_id", "teams"),
+}
+
+def criar_dimensoes(cur):
+    """Cria as tabelas de ligas e times."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS leagues (
+            id      SERIAL PRIMARY KEY,
+            nome    TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS teams (
+            id      SERIAL PRIMARY KEY,
+            nome    TEXT NOT NULL UNIQUE
+        );
+    """)
+
+def criar_visao(cur):
+    """Cria a vw_tabela_ligas: a tabela_ligas com os nomes de ligas e times."""
+    campos = []
+    for coluna in MAPEAMENTO_COLUNAS.values():
+        if coluna in COLUNAS_DIMENSAO:
+            campos.append(sql.SQL("{}.nome AS {}").format(sql.Identifier(coluna), sql.Identifier(coluna)))
+        else:
+            campos.append(sql.SQL("t.{}").format(sql.Identifier(coluna)))
+    campos += [
+        sql.SQL("t.{}").format(sql.Identifier(coluna))
+        for coluna in ["numero", "chave_jogo", "hash_linha", "atualizado_em", "league_id", "home_id", "away_id"]
+    ]
+    cur.execute(sql.SQL("""
+        CREATE OR REPLACE VIEW vw_tabela_ligas AS
+        SELECT {}
+        FROM tabela_ligas t
+        LEFT JOIN leagues league ON league.id = t.league_id
+        LEFT JOIN teams home ON home.id = t.home_id
+        LEFT JOIN teams away ON away.id = t.away_id;
+    """).format(sql.SQL(", ").join(campos)))
+
+def registrar_dimensoes(cur, tabela: pd.DataFrame):
+    """Inclui nas dimensões as ligas e os times de 'tabela' ainda não cadastrados."""
+    ligas = tabela["league"].dropna().unique().tolist()
+    times = pd.unique(tabela[["home", "away"]].values.ravel()).tolist()
+    for dimensao, nomes in (("leagues", ligas), ("teams", [t for t in times if pd.notna(t)])):
+        if nomes:
+            execute_values(
+                cur,
+                sql.SQL("INSERT INTO {} (nome) VALUES %s ON CONFLICT (nome) DO NOTHING;")
+                .format(sql.Identifier(dimensao)).as_string(cur),
+                [(str(nome),) for nome in nomes]
+            )
+
+# =============================
+# AGREGADOS POR TIME
+# =============================
+# Somas e contagens por liga, temporada, mês, time e mando. Como guardam
+# somas (e não médias), meses diferentes podem ser combinados para qualquer
+# período sem reler os jogos. Após cada carga só as temporadas alteradas
+# são recalculadas. Ligas e times são as chaves inteiras das dimensões.
+
+def criar_agregados(cur):
+    """Cria a tabela agregados_times e a preenche na primeira execução."""
+    cur.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'agregados_times' AND column_name = 'time';
+    """)
+    if cur.fetchone():
+        # Formato antigo (nomes em TEXT): a tabela é derivada, então é recriada
+        cur.execute("DROP TABLE agregados_times;")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS agregados_times (
+            league_id INTEGER NOT NULL REFERENCES leagues (id),
+            season TEXT NOT NULL,
+            mes DATE NOT NULL,
+            team_id INTEGER NOT NULL REFERENCES teams (id),
+            mando TEXT NOT NULL,
+            jogos INTEGER NOT NULL,
+            soma_gols NUMERIC NOT NULL,
+            soma_chutes NUMERIC,
+            n_chutes INTEGER NOT NULL,
+            soma_escanteios NUMERIC,
+            n_escanteios INTEGER NOT NULL,
+            PRIMARY KEY (league_id, season, mes, team_id, mando)
+        );
+        CREATE INDEX IF NOT EXISTS ix_agregados_times_mando_mes ON agregados_times (mando, mes);
+    """)
+    cur.execute("SELECT NOT EXISTS (SELECT 1 FROM agregados_times);")
+    if cur.fetchone()[0]:
+        atualizar_agregados(cur)
+
+def atualizar_agregados(cur, pares: pd.DataFrame = None):
+    """
+    Recalcula os agregados das combinações liga/temporada em 'pares'
+    (colunas league e season, com os nomes das ligas); sem 'pares',
+    recalcula tudo. Deve rodar na mesma transação da carga dos jogos.
+    """
+    if pares is None:
+        filtro, parametros = "league_id IS NOT NULL", []
+    else:
+        pares = pares[["league", "season"]].astype("string").fillna("").drop_duplicates()
+        if pares.empty:
+            return
+        filtro = """(league_id, season) IN (
+            SELECT l.id, p.season
+            FROM unnest(%s::text[], %s::text[]) AS p (league, season)
+            JOIN leagues l ON l.nome = p.league
+        )"""
+        parametros = [pares["league"].tolist(), pares["season"].tolist()]
+
+    cur.execute("DELETE FROM agregados_times WHERE " + filtro + ";", parametros)
+    # Os gols seguem o painel: jogos sem placar contam como 0 gols
+    selecao = """
+        SELECT league_id, season, date_trunc('month', match_date)::date, {time}, '{mando}',
+               count(*), sum(COALESCE(totalgoals_ft, 0)),
+               sum({chutes}), count({chutes}), sum({escanteios}), count({escanteios})
+        FROM tabela_ligas
+        WHERE {filtro} AND match_date IS NOT NULL AND {time} IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+    """
+    cur.execute(
+        "INSERT INTO agregados_times "
+        + selecao.format(time="home_id", mando="casa", chutes="shots_h", escanteios="corners_h_ft", filtro=filtro)
+        + " UNION ALL "
+        + selecao.format(time="away_id", mando="fora", chutes="shots_a", escanteios="corners_a_ft", filtro=filtro)
+        + ";",
+        parametros * 2
+    )
+
+# =============================
+# MINUTOS DOS GOLS
+# =============================
+# Os textos goals_h_minutes/goals_a_minutes são interpretados uma vez, na
+# carga, e gravados como arrays SMALLINT em minutos_gols (uma linha por
+# jogo). É a base das curvas de gols por minuto do modelo ao vivo.
+
+def criar_minutos_gols(cur):
+    """
+    Cria a tabela minutos_gols, a preenche na primeira execução e
+    reinterpreta os jogos cujos minutos gravados não batem com o placar.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS minutos_gols (
+            league_id INTEGER NOT NULL REFERENCES leagues (id),
+            season TEXT NOT NULL,
+            chave_jogo TEXT NOT NULL,
+            minutos_casa SMALLINT[] NOT NULL,
+            minutos_fora SMALLINT[] NOT NULL,
+            PRIMARY KEY (league_id, season, chave_jogo)
+        );
+    """)
+    cur.execute("SELECT NOT EXISTS (SELECT 1 FROM minutos_gols);")
+    vazia = cur.fetchone()[0]
+    # Na primeira execução, todos os jogos; nas seguintes, os jogos com placar
+    # cujo número de minutos gravados não bate com ele, reinterpretados com o
+    # interpretador atual (corrige gravações feitas antes de ajustes nele)
+    filtro = "" if vazia else """
+        AND v.goals_h_ft IS NOT NULL AND v.goals_a_ft IS NOT NULL
+        AND EXISTS (
+            SELECT 1 FROM minutos_gols m
+            WHERE m.league_id = v.league_id AND m.season = v.season AND m.chave_jogo = v.chave_jogo
+              AND (cardinality(m.minutos_casa) <> v.goals_h_ft OR cardinality(m.minutos_fora) <> v.goals_a_ft)
+        )
+    """
+    cur.execute(f"""
+        SELECT v.league, v.season, v.chave_jogo, v.goals_h_minutes, v.goals_a_minutes
+        FROM vw_tabela_ligas v
+        WHERE (v.goals_h_minutes IS NOT NULL OR v.goals_a_minutes IS NOT NULL) {filtro};
+    """)
+    gravar_minutos_gols(cur, pd.DataFrame(
+        cur.fetchall(), columns=["league", "season", "chave_jogo", "goals_h_minutes", "goals_a_minutes"]
+    ))
+
+def gravar_minutos_gols(cur, tabela: pd.DataFrame):
+    """Interpreta e grava (upsert) os minutos dos gols dos jogos da tabela."""
+    tabela = tabela.dropna(subset=["league", "chave_jogo"])
+    if tabela.empty:
+        return
+    linhas = list(zip(
+        tabela["league"],
+        tabela["season"].astype("string").fillna(""),
+        tabela["chave_jogo"],
+        listas_minutos(tabela["goals_h_minutes"]),
+        listas_minutos(tabela["goals_a_minutes"])
+    ))
+    execute_values(cur, """
+        INSERT INTO minutos_gols (league_id, season, chave_jogo, minutos_casa, minutos_fora)
+        SELECT l.id, v.season, v.chave_jogo, v.casa::smallint[], v.fora::smallint[]
+        FROM (VALUES %s) AS v (league, season, chave_jogo, casa, fora)
+        JOIN leagues l ON l.nome = v.league
+        ON CONFLICT (league_id, season, chave_jogo) DO UPDATE
+        SET minutos_casa = EXCLUDED.minutos_casa, minutos_fora = EXCLUDED.minutos_fora;
+    """, linhas, page_size=1000)
+
+def filtrar_alterados(cur, tabela: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compara o hash de cada jogo com o já gravado e retorna apenas os jogos
+    novos ou alterados.
+    """
+    cur.execute(
+        """
+        SELECT l.nome, t.season, t.chave_jogo, COALESCE(t.hash_linha, 0)
+        FROM tabela_ligas t JOIN leagues l ON l.id = t.league_id
+        WHERE l.nome = ANY(%s);
+        """,
+        (tabela["league"].dropna().unique().tolist(),)
+    )
+    existentes = pd.DataFrame(cur.fetchall(), columns=COLUNAS_CHAVE + ["hash_gravado"])
+    if existentes.empty:
+        return tabela
+    # Int64 (anulável) evita a conversão para float, que perderia bits do hash
+    existentes["hash_gravado"] = existentes["hash_gravado"].astype("Int64")
+    # Temporada ausente é gravada como '' (ver normalizar_temporadas)
+    chaves = tabela[COLUNAS_CHAVE + ["hash_linha"]].astype({"season": "string"})
+    comparacao = chaves.assign(season=chaves["season"].fillna("")).merge(
+        existentes.astype({"season": "string"}), on=COLUNAS_CHAVE, how="left"
+    )
+    alterados = (comparacao["hash_gravado"] != comparacao["hash_linha"]).fillna(True).to_numpy(dtype=bool)
+    return tabela[alterados]
+
+def upsert_liga(cur, tabela: pd.DataFrame) -> tuple:
+    """
+    Grava os jogos com INSERT ... ON CONFLICT DO UPDATE a partir de uma tabela
+    temporária carregada via COPY, trocando os nomes de liga e times pelas
+    chaves das dimensões. Linhas cujo hash não mudou não são tocadas.
+    Retorna (inseridos, atualizados).
+    """
+    registrar_dimensoes(cur, tabela)
+    colunas = list(tabela.columns)
+    cur.execute(sql.SQL(
+        "CREATE TEMP TABLE tmp_ligas ON COMMIT DROP AS SELECT {} FROM vw_tabela_ligas WITH NO DATA;"
+    ).format(sql.SQL(", ").join(map(sql.Identifier, colunas))))
+    copiar_para_tabela(cur, tabela, "tmp_ligas")
+
+    destino, origem = [], []
+    for coluna in colunas:
+        if coluna in COLUNAS_DIMENSAO:
+            destino.append(COLUNAS_DIMENSAO[coluna][0])
+            origem.append(sql.SQL("{}.id").format(sql.Identifier(coluna)))
+        elif coluna == "season":
+            # No COPY em CSV a string vazia chega como nulo
+            destino.append(coluna)
+            origem.append(sql.SQL("COALESCE(tmp.season, '')"))
+        else:
+            destino.append(coluna)
+            origem.append(sql.SQL("tmp.{}").format(sql.Identifier(coluna)))
+    chaves = [COLUNAS_DIMENSAO.get(c, (c,))[0] for c in COLUNAS_CHAVE]
+    atualizacoes = [
+        sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(c))
+        for c in destino if c not in chaves
+    ]
+    upsert_query = sql.SQL("""
+        INSERT INTO tabela_ligas ({destino})
+        SELECT {origem}
+        FROM tmp_ligas tmp
+        LEFT JOIN leagues league ON league.nome = tmp.league
+        LEFT JOIN teams home ON home.nome = tmp.home
+        LEFT JOIN teams away ON away.nome = tmp.away
+        ON CONFLICT ({chaves}) DO UPDATE
+        SET {atualizacoes}, atualizado_em = now()
+        WHERE tabela_ligas.hash_linha IS DISTINCT FROM EXCLUDED.hash_linha
+        RETURNING (xmax = 0) AS inserido;
+    """).format(
+        destino=sql.SQL(", ").join(map(sql.Identifier, destino)),
+        origem=sql.SQL(", ").join(origem),
+        chaves=sql.SQL(", ").join(map(sql.Identifier, chaves)),
+        atualizacoes=sql.SQL(", ").join(atualizacoes)
+    )
+    cur.execute(upsert_query)
+    resultado = [linha[0] for linha in cur.fetchall()]
+    inseridos = sum(resultado)
+    return inseridos, len(resultado) - inseridos
+
+# =============================
+# DOWNLOAD E LEITURA EM PARALELO
+# =============================
+def baixar_url(url: str) -> bytes:
+    """Baixa o conteúdo de uma planilha."""
+    resposta = requests.get(url, timeout=60)
+    resposta.raise_for_status()
+    return resposta.content
+
+def buscar_em_diretorio(diretorio: str):
+    """
+    Retorna uma função de busca que lê as planilhas de um diretório local
+    (pelo nome do arquivo na URL), no lugar do download. Útil para testes
+    e para recargas a partir de arquivos já baixados.
+    """
+    def buscar(url: str) -> bytes:
+        nome_arquivo = requests.utils.unquote(url.rsplit("/", 1)[-1])
+        with open(os.path.join(diretorio, nome_arquivo), "rb") as arquivo:
+            return arquivo.read()
+    return buscar
+
+def converter_planilha(liga: str, conteudo: bytes, resolvedores: dict = None) -> list:
+    """
+    Lê e prepara uma planilha e a grava na área de staging em Parquet.
+    Executada no pool de processos; retorna os arquivos gravados.
+    """
+    return staging.gravar_staging(
+        preparar_dataframe(pd.read_excel(io.BytesIO(conteudo)), liga, resolvedores)
     )
-    conn.autocommit = True  # para confirmar cada inserção automaticamente
 
+def processar_fontes(fontes: dict, buscar=baixar_url, workers: int = ETL_WORKERS,
+                     resolvedores: dict = None):
+    """
+    Baixa as planilhas em um pool de threads e as converte para Parquet em um
+    pool de processos, entregando (liga, tabela) à medida que cada liga fica
+    pronta, com a tabela lida da área de staging. Ligas para as quais
+    'buscar' retorna None (fonte sem alterações) são ignoradas. Falhas de
+    uma liga são registradas e não interrompem as demais. 'resolvedores'
+    é repassado a preparar_dataframe.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as downloads, \
+            ProcessPoolExecutor(max_workers=workers) as leituras:
+        futuros_download = {downloads.submit(buscar, url): liga for liga, url in fontes.items()}
+        futuros_leitura = {}
+        for futuro in as_completed(futuros_download):
+            liga = futuros_download[futuro]
+            try:
+                conteudo = futuro.result()
+            except Exception as e:
+                logging.error("Erro ao baixar a liga %s: %s", liga, e)
+                continue
+            if conteudo is None:
+                logging.info(f"Liga {liga} sem alterações na fonte.")
+                continue
+            futuros_leitura[leituras.submit(converter_planilha, liga, conteudo, resolvedores)] = liga
+
+        for futuro in as_completed(futuros_leitura):
+            liga = futuros_leitura[futuro]
+            try:
+                tabela = staging.ler_staging(caminhos=futuro.result())
+            except Exception as e:
+                logging.error("Erro ao ler a planilha da liga %s: %s", liga, e)
+                continue
+            yield liga, tabela
+
+# =============================
+# CARGA NO BANCO
+# =============================
+_pool = None
+
+def obter_pool():
+    """
+    Pool de conexões do ETL, criado na primeira carga e reaproveitado pelas
+    execuções agendadas. A carga é longa, então o limite por instrução é maior.
+    """
+    global _pool
+    if _pool is None:
+        _pool = db.criar_pool(minimo=1, maximo=2, statement_timeout_ms=ETL_STATEMENT_TIMEOUT_MS)
+    return _pool
+
+def preparar_banco(conn):
+    """
+    Cria as tabelas de ligas e times e a tabela_ligas, se não existirem,
+    aplica as migrações e (re)cria a visão com os nomes.
+    """
+    with conn, conn.cursor() as cur:
+        create_table_query = """
+        CREATE TABLE IF NOT EXISTS tabela_ligas (
+            numero              SERIAL PRIMARY KEY,
+            id_jogo             TEXT,
+            league_id           INTEGER REFERENCES leagues (id),
+            season              TEXT NOT NULL DEFAULT '',
+            match_date          DATE,
+            rodada              INTEGER,
+            home_id             INTEGER REFERENCES teams (id),
+            away_id             INTEGER REFERENCES teams (id),
+            goals_h_ht          INTEGER,
+            goals_a_ht          INTEGER,
+            totalgoals_ht       INTEGER,
+            goals_h_ft          INTEGER,
+            goals_a_ft          INTEGER,
+            totalgoals_ft       INTEGER,
+            goals_h_minutes     TEXT,
+            goals_a_minutes     TEXT,
+            odd_h_ht            NUMERIC(10,2),
+            odd_d_ht            NUMERIC(10,2),
+            odd_a_ht            NUMERIC(10,2),
+            odd_over05_ht       NUMERIC(10,2),
+            odd_under05_ht      NUMERIC(10,2),
+            odd_over15_ht       NUMERIC(10,2),
+            odd_under15_ht      NUMERIC(10,2),
+            odd_over25_ht       NUMERIC(10,2),
+            odd_under25_ht      NUMERIC(10,2),
+            odd_h_ft            NUMERIC(10,2),
+            odd_d_ft            NUMERIC(10,2),
+            odd_a_ft            NUMERIC(10,2),
+            odd_over05_ft       NUMERIC(10,2),
+            odd_under05_ft      NUMERIC(10,2),
+            odd_over15_ft       NUMERIC(10,2),
+            odd_under15_ft      NUMERIC(10,2),
+            odd_over25_ft       NUMERIC(10,2),
+            odd_under25_ft      NUMERIC(10,2),
+            odd_btts_yes        NUMERIC(10,2),
+            odd_btts_no         NUMERIC(10,2),
+            odd_dc_1x           NUMERIC(10,2),
+            odd_dc_12           NUMERIC(10,2),
+            odd_dc_x2           NUMERIC(10,2),
+            ppg_home_pre        NUMERIC(10,2),
+            ppg_away_pre        NUMERIC(10,2),
+            ppg_home            NUMERIC(10,2),
+            ppg_away            NUMERIC(10,2),
+            xg_home_pre         NUMERIC(10,2),
+            xg_away_pre         NUMERIC(10,2),
+            xg_total_pre        NUMERIC(10,2),
+            shotsontarget_h     INTEGER,
+            shotsontarget_a     INTEGER,
+            shotsofftarget_h    INTEGER,
+            shotsofftarget_a    INTEGER,
+            shots_h             INTEGER,
+            shots_a             INTEGER,
+            corners_h_ft        INTEGER,
+            corners_a_ft        INTEGER,
+            totalcorners_ft     INTEGER,
+            odd_corners_h       NUMERIC(10,2),
+            odd_corners_d       NUMERIC(10,2),
+            odd_corners_a       NUMERIC(10,2),
+            odd_corners_over75  NUMERIC(10,2),
+            odd_corners_under75 NUMERIC(10,2),
+            odd_corners_over85  NUMERIC(10,2),
+            odd_corners_under85 NUMERIC(10,2),
+            odd_corners_over95  NUMERIC(10,2),
+            odd_corners_under95 NUMERIC(10,2),
+            odd_corners_over105 NUMERIC(10,2),
+            odd_corners_under105 NUMERIC(10,2),
+            odd_corners_over115 NUMERIC(10,2),
+            odd_corners_under115 NUMERIC(10,2)
+        );
+        """
+        criar_dimensoes(cur)
+        cur.execute(create_table_query)
+        migrar_tabela(cur)
+        criar_indices(cur)
+        criar_visao(cur)
+        criar_agregados(cur)
+        criar_minutos_gols(cur)
+        ratings.criar_tabelas_ratings(cur)
+        # Incremental: só considera jogos gravados desde a última execução
+        ratings.atualizar_ratings(cur)
+
+def carregar_resolvedores(conn) -> dict:
+    """Um ResolvedorTimes por liga, com os nomes de times já gravados."""
+    with conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT league, home FROM vw_tabela_ligas WHERE home IS NOT NULL
+            UNION
+            SELECT league, away FROM vw_tabela_ligas WHERE away IS NOT NULL;
+        """)
+        nomes = pd.DataFrame(cur.fetchall(), columns=["league", "time"])
+    return {league: ResolvedorTimes(grupo["time"]) for league, grupo in nomes.groupby("league")}
+
+def ligas_no_banco(conn) -> set:
+    """Nomes das ligas que têm jogos gravados na tabela_ligas."""
+    with conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT l.nome FROM leagues l
+            WHERE EXISTS (SELECT 1 FROM tabela_ligas t WHERE t.league_id = l.id);
+        """)
+        return {linha[0] for linha in cur.fetchall()}
+
+def descartar_ausentes(cache, fontes: dict, presentes: set):
+    """
+    Faz o cache baixar de novo as fontes cujas ligas não estão no banco
+    (banco recriado ou esvaziado, ou outro DB_*), que de outra forma seriam
+    ignoradas por não terem mudado na origem.
+    """
+    for liga, url in fontes.items():
+        gravadas = set(cache.ligas(url)) or {liga}
+        if not gravadas <= presentes:
+            logging.info(f"Liga {liga} ausente do banco; a fonte será baixada novamente.")
+            cache.esquecer(url)
+
+def carregar_liga(conn, tabela: pd.DataFrame) -> tuple:
+    """
+    Grava os jogos novos ou alterados de uma liga em uma única transação.
+    Retorna (inseridos, atualizados).
+    """
+    with conn, conn.cursor() as cur:
+        alterados = filtrar_alterados(cur, tabela)
+        if alterados.empty:
+            return 0, 0
+        inseridos, atualizados = upsert_liga(cur, alterados)
+        atualizar_agregados(cur, alterados)
+        gravar_minutos_gols(cur, alterados)
+        ratings.atualizar_ratings(cur, alterados["league"].dropna().unique().tolist())
+        return inseridos, atualizados
+
+def ajustar_dixon_coles(conn, ligas_alteradas, workers: int = ETL_WORKERS):
+    """
+    Ajusta os modelos Dixon-Coles das ligas alteradas e das que ainda não
+    têm modelo (ligas gravadas antes dos modelos ou que não mudam mais).
+    Falhas são registradas e não interrompem a carga.
+    """
+    try:
+        with conn, conn.cursor() as cur:
+            ligas = set(ligas_alteradas) | set(dixon_coles.ligas_sem_modelo(cur))
+        dixon_coles.atualizar_modelos(conn, sorted(ligas), workers)
+    except Exception as e:
+        logging.error("Erro ao ajustar os modelos Dixon-Coles: %s", e)
+
+def atualizar_banco(fontes: dict = None, buscar=None, workers: int = ETL_WORKERS):
+    """
+    Atualiza a tabela_ligas com as planilhas de 'fontes' (por padrão,
+    data_sources). O download e a conversão para Parquet rodam em paralelo;
+    a gravação é feita por esta função, a partir da área de staging, uma
+    transação por liga. Por padrão os downloads passam pelo CacheDownloads,
+    e fontes inalteradas nem são lidas.
+    """
+    fontes = data_sources if fontes is None else fontes
+    buscar = CacheDownloads() if buscar is None else buscar
+    confirmar = getattr(buscar, "confirmar", None)
     try:
-        with conn.cursor() as cur:
+        # 1. Conexão com o PostgreSQL
+        with db.conexao(obter_pool()) as conn:
             # 2. Criar a tabela se ela não existir
-            create_table_query = """
-            CREATE TABLE IF NOT EXISTS tabela_ligas (
-                numero              SERIAL PRIMARY KEY,
-                id_jogo             TEXT,
-                league              TEXT,
-                season              TEXT,
-                match_date          DATE,
-                rodada              INTEGER,
-                home                TEXT,
-                away                TEXT,
-                goals_h_ht          INTEGER,
-                goals_a_ht          INTEGER,
-                totalgoals_ht       INTEGER,
-                goals_h_ft          INTEGER,
-                goals_a_ft          INTEGER,
-                totalgoals_ft       INTEGER,
-                goals_h_minutes     TEXT,
-                goals_a_minutes     TEXT,
-                odd_h_ht            NUMERIC(10,2),
-                odd_d_ht            NUMERIC(10,2),
-                odd_a_ht            NUMERIC(10,2),
-                odd_over05_ht       NUMERIC(10,2),
-                odd_under05_ht      NUMERIC(10,2),
-                odd_over15_ht       NUMERIC(10,2),
-                odd_under15_ht      NUMERIC(10,2),
-                odd_over25_ht       NUMERIC(10,2),
-                odd_under25_ht      NUMERIC(10,2),
-                odd_h_ft            NUMERIC(10,2),
-                odd_d_ft            NUMERIC(10,2),
-                odd_a_ft            NUMERIC(10,2),
-                odd_over05_ft       NUMERIC(10,2),
-                odd_under05_ft      NUMERIC(10,2),
-                odd_over15_ft       NUMERIC(10,2),
-                odd_under15_ft      NUMERIC(10,2),
-                odd_over25_ft       NUMERIC(10,2),
-                odd_under25_ft      NUMERIC(10,2),
-                odd_btts_yes        NUMERIC(10,2),
-                odd_btts_no         NUMERIC(10,2),
-                odd_dc_1x           NUMERIC(10,2),
-                odd_dc_12           NUMERIC(10,2),
-                odd_dc_x2           NUMERIC(10,2),
-                ppg_home_pre        NUMERIC(10,2),
-                ppg_away_pre        NUMERIC(10,2),
-                ppg_home            NUMERIC(10,2),
-                ppg_away            NUMERIC(10,2),
-                xg_home_pre         NUMERIC(10,2),
-                xg_away_pre         NUMERIC(10,2),
-                xg_total_pre        NUMERIC(10,2),
-                shotsontarget_h     INTEGER,
-                shotsontarget_a     INTEGER,
-                shotsofftarget_h    INTEGER,
-                shotsofftarget_a    INTEGER,
-                shots_h             INTEGER,
-                shots_a             INTEGER,
-                corners_h_ft        INTEGER,
-                corners_a_ft        INTEGER,
-                totalcorners_ft     INTEGER,
-                odd_corners_h       NUMERIC(10,2),
-                odd_corners_d       NUMERIC(10,2),
-                odd_corners_a       NUMERIC(10,2),
-                odd_corners_over75  NUMERIC(10,2),
-                odd_corners_under75 NUMERIC(10,2),
-                odd_corners_over85  NUMERIC(10,2),
-                odd_corners_under85 NUMERIC(10,2),
-                odd_corners_over95  NUMERIC(10,2),
-                odd_corners_under95 NUMERIC(10,2),
-                odd_corners_over105 NUMERIC(10,2),
-                odd_corners_under105 NUMERIC(10,2),
-                odd_corners_over115 NUMERIC(10,2),
-                odd_corners_under115 NUMERIC(10,2)
-            );
-            """
-            cur.execute(create_table_query)
-
-        # 3. Processar cada liga e inserir os dados
-        for liga, url_excel in data_sources.items():
-            logging.info(f"Processando liga: {liga}")
-            df = pd.read_excel(url_excel)
-            # Renomear colunas, se necessário
-            mapeamento_colunas = {
-                "Nº": "numero",
-                "Date": "match_date"
-            }
-            df.rename(columns=mapeamento_colunas, inplace=True)
-            # Remover linhas com valores ausentes em 'Home' ou 'Away'
-            df = df.dropna(subset=["Home", "Away"])
-
-            with conn.cursor() as cur:
-                # Caso queira limpar os dados anteriores, descomente a linha abaixo:
-                # cur.execute("TRUNCATE TABLE tabela_ligas;")
-                for index, row in df.iterrows():
-                    insert_query = sql.SQL("""
-                        INSERT INTO tabela_ligas (
-                            id_jogo,
-                            league,
-                            season,
-                            match_date,
-                            rodada,
-                            home,
-                            away,
-                            goals_h_ht,
-                            goals_a_ht,
-                            totalgoals_ht,
-                            goals_h_ft,
-                            goals_a_ft,
-                            totalgoals_ft,
-                            goals_h_minutes,
-                            goals_a_minutes,
-                            odd_h_ht,
-                            odd_d_ht,
-                            odd_a_ht,
-                            odd_over05_ht,
-                            odd_under05_ht,
-                            odd_over15_ht,
-                            odd_under15_ht,
-                            odd_over25_ht,
-                            odd_under25_ht,
-                            odd_h_ft,
-                            odd_d_ft,
-                            odd_a_ft,
-                            odd_over05_ft,
-                            odd_under05_ft,
-                            odd_over15_ft,
-                            odd_under15_ft,
-                            odd_over25_ft,
-                            odd_under25_ft,
-                            odd_btts_yes,
-                            odd_btts_no,
-                            odd_dc_1x,
-                            odd_dc_12,
-                            odd_dc_x2,
-                            ppg_home_pre,
-                            ppg_away_pre,
-                            ppg_home,
-                            ppg_away,
-                            xg_home_pre,
-                            xg_away_pre,
-                            xg_total_pre,
-                            shotsontarget_h,
-                            shotsontarget_a,
-                            shotsofftarget_h,
-                            shotsofftarget_a,
-                            shots_h,
-                            shots_a,
-                            corners_h_ft,
-                            corners_a_ft,
-                            totalcorners_ft,
-                            odd_corners_h,
-                            odd_corners_d,
-                            odd_corners_a,
-                            odd_corners_over75,
-                            odd_corners_under75,
-                            odd_corners_over85,
-                            odd_corners_under85,
-                            odd_corners_over95,
-                            odd_corners_under95,
-                            odd_corners_over105,
-                            odd_corners_under105,
-                            odd_corners_over115,
-                            odd_corners_under115
-                        )
-                        VALUES (
-                            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                            %s, %s, %s, %s, %s, %s, %s
-                        )
-                    """)
-                    data_tuple = (
-                        row.get("Id_Jogo", None),
-                        row.get("League", None),
-                        row.get("Season", None),
-                        row.get("match_date", None),
-                        row.get("Rodada", None),
-                        row.get("Home", None),
-                        row.get("Away", None),
-                        row.get("Goals_H_HT", None),
-                        row.get("Goals_A_HT", None),
-                        row.get("TotalGoals_HT", None),
-                        row.get("Goals_H_FT", None),
-                        row.get("Goals_A_FT", None),
-                        row.get("TotalGoals_FT", None),
-                        row.get("Goals_H_Minutes", None),
-                        row.get("Goals_A_Minutes", None),
-                        row.get("Odd_H_HT", None),
-                        row.get("Odd_D_HT", None),
-                        row.get("Odd_A_HT", None),
-                        row.get("Odd_Over05_HT", None),
-                        row.get("Odd_Under05_HT", None),
-                        row.get("Odd_Over15_HT", None),
-                        row.get("Odd_Under15_HT", None),
-                        row.get("Odd_Over25_HT", None),
-                        row.get("Odd_Under25_HT", None),
-                        row.get("Odd_H_FT", None),
-                        row.get("Odd_D_FT", None),
-                        row.get("Odd_A_FT", None),
-                        row.get("Odd_Over05_FT", None),
-                        row.get("Odd_Under05_FT", None),
-                        row.get("Odd_Over15_FT", None),
-                        row.get("Odd_Under15_FT", None),
-                        row.get("Odd_Over25_FT", None),
-                        row.get("Odd_Under25_FT", None),
-                        row.get("Odd_BTTS_Yes", None),
-                        row.get("Odd_BTTS_No", None),
-                        row.get("Odd_DC_1X", None),
-                        row.get("Odd_DC_12", None),
-                        row.get("Odd_DC_X2", None),
-                        row.get("PPG_Home_Pre", None),
-                        row.get("PPG_Away_Pre", None),
-                        row.get("PPG_Home", None),
-                        row.get("PPG_Away", None),
-                        row.get("XG_Home_Pre", None),
-                        row.get("XG_Away_Pre", None),
-                        row.get("XG_Total_Pre", None),
-                        row.get("ShotsOnTarget_H", None),
-                        row.get("ShotsOnTarget_A", None),
-                        row.get("ShotsOffTarget_H", None),
-                        row.get("ShotsOffTarget_A", None),
-                        row.get("Shots_H", None),
-                        row.get("Shots_A", None),
-                        row.get("Corners_H_FT", None),
-                        row.get("Corners_A_FT", None),
-                        row.get("TotalCorners_FT", None),
-                        row.get("Odd_Corners_H", None),
-                        row.get("Odd_Corners_D", None),
-                        row.get("Odd_Corners_A", None),
-                        row.get("Odd_Corners_Over75", None),
-                        row.get("Odd_Corners_Under75", None),
-                        row.get("Odd_Corners_Over85", None),
-                        row.get("Odd_Corners_Under85", None),
-                        row.get("Odd_Corners_Over95", None),
-                        row.get("Odd_Corners_Under95", None),
-                        row.get("Odd_Corners_Over105", None),
-                        row.get("Odd_Corners_Under105", None),
-                        row.get("Odd_Corners_Over115", None),
-                        row.get("Odd_Corners_Under115", None)
-                    )
-                    cur.execute(insert_query, data_tuple)
-            logging.info(f"Liga {liga} inserida com sucesso.")
+            preparar_banco(conn)
+            if hasattr(buscar, "esquecer"):
+                descartar_ausentes(buscar, fontes, ligas_no_banco(conn))
+            resolvedores = carregar_resolvedores(conn)
+            ligas_alteradas = set()
+
+            # 3. Carregar cada liga assim que estiver pronta (uma transação por liga)
+            for liga, tabela in processar_fontes(fontes, buscar, workers, resolvedores):
+                logging.info(f"Processando liga: {liga}")
+                try:
+                    inseridos, atualizados = carregar_liga(conn, tabela)
+                    if inseridos or atualizados:
+                        ligas_alteradas.update(tabela["league"].dropna().unique())
+                    if confirmar:
+                        confirmar(fontes[liga], tabela["league"].dropna().unique().tolist())
+                    logging.info(f"Liga {liga} atualizada: {inseridos} jogos inseridos, {atualizados} atualizados.")
+                except Exception as e:
+                    logging.error("Erro ao processar a liga %s: %s", liga, e)
+
+            # 4. Reajustar (em paralelo, a partir do ajuste anterior) os modelos das ligas alteradas
+            ajustar_dixon_coles(conn, ligas_alteradas, workers)
         logging.info("Processo concluído!")
     except Exception as e:
         logging.error("Ocorreu um erro: %s", e)
-    finally:
-        conn.close()
+
+def recarregar_do_staging(ligas: list = None):
+    """
+    Recarrega o banco a partir dos arquivos Parquet já convertidos, sem baixar
+    nem ler nenhuma planilha (útil para backfill ou para recriar o banco).
+    """
+    with db.conexao(obter_pool()) as conn:
+        preparar_banco(conn)
+        ligas_alteradas = set()
+        for caminho in staging.listar_particoes(ligas=ligas):
+            try:
+                tabela = staging.ler_staging(caminhos=[caminho])
+                inseridos, atualizados = carregar_liga(conn, tabela)
+            except Exception as e:
+                logging.error("Erro ao recarregar %s: %s", caminho, e)
+                continue
+            if inseridos or atualizados:
+                ligas_alteradas.update(tabela["league"].dropna().unique())
+            logging.info(f"{caminho}: {inseridos} jogos inseridos, {atualizados} atualizados.")
+        ajustar_dixon_coles(conn, ligas_alteradas)
+    logging.info("Recarga a partir do staging concluída!")
 
 # =============================
 # AGENDAMENTO DA TAREFA
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+# =============================
+# ÍNDICE DE JOGOS POR TIME
+# =============================
+# Guarda, para cada time, as posições dos seus jogos como mandante e como
+# visitante (em ordem de data). A busca pelos jogos de um time e os cortes
+# "últimos N jogos" passam a custar o número de jogos do time, e não uma
+# varredura de todo o histórico.
+
+
+class IndiceTimes:
+    """
+    Índice de jogos por time sobre uma tabela de partidas.
+
+    A tabela é ordenada por data uma única vez; 'partidas' não deve ser
+    alterada depois de criado o índice (ele é compartilhado entre sessões).
+    """
+
+    def __init__(self, partidas: pd.DataFrame):
+        self.partidas = partidas.sort_values("match_date", kind="stable").reset_index(drop=True)
+        # Posições crescentes = ordem de data, pois a tabela já está ordenada
+        self._posicoes = {
+            mando: {
+                time: posicoes
+                for time, posicoes in self.partidas.groupby(coluna, observed=True, sort=False).indices.items()
+            }
+            for mando, coluna in (("casa", "home"), ("fora", "away"))
+        }
+        self.times = sorted(set(self._posicoes["casa"]) | set(self._posicoes["fora"]))
+        self.por_minusculo = {time.lower(): time for time in self.times if isinstance(time, str)}
+
+    def __contains__(self, time) -> bool:
+        return time in self._posicoes["casa"] or time in self._posicoes["fora"]
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def posicoes(self, time: str, mando: str = None) -> np.ndarray:
+        """
+        Posições (em 'partidas') dos jogos do time em ordem de data; com
+        mando='casa' ou mando='fora', apenas como mandante ou visitante.
+        """
+        vazio = np.empty(0, dtype=np.intp)
+        if mando is not None:
+            return self._posicoes[mando].get(time, vazio)
+        return np.union1d(self._posicoes["casa"].get(time, vazio), self._posicoes["fora"].get(time, vazio))
+
+    def jogos(self, time: str, mando: str = None, ultimos: int = None) -> pd.DataFrame:
+        """Jogos do time em ordem de data, opcionalmente só os 'ultimos' N."""
+        posicoes = self.posicoes(time, mando)
+        if ultimos is not None:
+            posicoes = posicoes[-ultimos:] if ultimos > 0 else posicoes[:0]
+        return self.partidas.iloc[posicoes]
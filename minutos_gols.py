@@ -0,0 +1,67 @@
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# =============================
+# MINUTOS DOS GOLS
+# =============================
+# As colunas goals_h_minutes e goals_a_minutes chegam como texto livre
+# (ex.: "12,45+2,78" ou "['12', \"45'2\", \"90'3\"]"), com os acréscimos
+# escritos como "45+2", "45'2" ou "45'+2". Aqui elas são convertidas em
+# listas de minutos (uint8) no formato de listas do Arrow: um único buffer
+# de minutos e um de deslocamentos para toda a coluna, em vez de uma string
+# Python por jogo.
+
+# Um gol por item separado por vírgula: minuto com acréscimo opcional
+# ("45+2", "45'2", "45'+2", "90 + 3"), aplicado ao item inteiro
+PADRAO_MINUTO = re.compile(r"(\d+)\s*(?:'?\s*\+?\s*(\d+))?")
+# Caracteres de lista e aspas em volta de cada item
+DELIMITADORES = " []'\""
+
+TIPO_MINUTOS = pa.list_(pa.uint8())
+
+
+def interpretar_minutos(texto) -> list:
+    """
+    Lista ordenada dos minutos dos gols em 'texto', um por item separado por
+    vírgula. Acréscimos são somados ao minuto base (45+2 e 45'2 viram 47).
+    Itens que não são um minuto são ignorados. Texto vazio ou nulo retorna
+    lista vazia.
+    """
+    if texto is None or (isinstance(texto, float) and np.isnan(texto)):
+        return []
+    minutos = []
+    for item in str(texto).split(","):
+        encontrado = PADRAO_MINUTO.fullmatch(item.strip(DELIMITADORES))
+        if encontrado:
+            base, acrescimo = encontrado.groups()
+            minutos.append(min(int(base) + int(acrescimo or 0), 255))
+    return sorted(minutos)
+
+
+def listas_minutos(serie: pd.Series) -> list:
+    """
+    Lista de minutos de cada linha de uma coluna de texto (vazia para nulos).
+    Cada texto distinto é interpretado uma única vez.
+    """
+    codigos, unicos = pd.factorize(serie)
+    listas = [interpretar_minutos(texto) for texto in unicos] + [[]]
+    return [listas[codigo] for codigo in codigos]
+
+
+def codificar_minutos(serie: pd.Series) -> pd.Series:
+    """
+    Converte uma coluna de texto de minutos em uma coluna de listas uint8 do
+    Arrow. Cada texto distinto é interpretado uma única vez.
+    """
+    codigos, unicos = pd.factorize(serie)
+    listas = pa.array([interpretar_minutos(texto) for texto in unicos] + [None], type=TIPO_MINUTOS)
+    # Valores nulos (código -1) apontam para o último item, que é nulo
+    codigos = np.where(codigos < 0, len(unicos), codigos)
+    return pd.Series(
+        pd.arrays.ArrowExtensionArray(listas.take(pa.array(codigos))),
+        index=serie.index,
+        name=serie.name
+    )
@@ -0,0 +1,181 @@
+import re
+import unicodedata
+from collections import defaultdict
+
+# =============================
+# RESOLUÇÃO DE NOMES DE TIMES
+# =============================
+# Normaliza nomes (acentos, pontuação e sufixos como FC, EC, SC), resolve
+# apelidos conhecidos e ordena candidatos por semelhança de trigramas usando
+# um índice invertido montado uma única vez. Usado na busca de times da
+# página Mercados e pelo ETL para conciliar grafias diferentes do mesmo time
+# entre planilhas.
+
+# Siglas e palavras que não identificam o time
+SUFIXOS = {
+    "fc", "ec", "sc", "ac", "afc", "cf", "cd", "ca", "cr", "se", "aa", "ad", "sa",
+    "fk", "sk", "bk", "if", "ik", "ff", "nk", "sv", "vfb", "vfl", "tsg", "club", "clube",
+    "de", "do", "da", "dos", "das", "del", "la", "el", "the"
+}
+
+# Apelidos e grafias alternativas -> nome usado nas planilhas
+ALIASES = {
+    "man utd": "Manchester United",
+    "man united": "Manchester United",
+    "man city": "Manchester City",
+    "spurs": "Tottenham",
+    "wolves": "Wolverhampton Wanderers",
+    "psg": "PSG",
+    "paris saint germain": "PSG",
+    "inter milan": "Inter",
+    "internazionale": "Inter",
+    "bayern munich": "Bayern München",
+    "atletico mg": "Atlético Mineiro",
+    "galo": "Atlético Mineiro",
+    "atletico pr": "Athletico-PR",
+    "athletico paranaense": "Athletico-PR",
+    "spfc": "São Paulo",
+    "timao": "Corinthians",
+    "verdao": "Palmeiras",
+    "mengao": "Flamengo",
+    "fogao": "Botafogo",
+}
+
+
+def normalizar(nome: str) -> str:
+    """
+    Forma canônica de comparação: sem acentos, minúscula, sem pontuação e
+    sem sufixos como FC/EC/SC (desde que sobre alguma palavra).
+    """
+    texto = unicodedata.normalize("NFKD", str(nome))
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).lower()
+    palavras = re.sub(r"[^a-z0-9]+", " ", texto).split()
+    principais = [p for p in palavras if p not in SUFIXOS]
+    return " ".join(principais or palavras)
+
+
+def trigramas(texto: str) -> set:
+    """Trigramas do texto com bordas marcadas (ex.: '  a', ' ab', 'abc')."""
+    texto = f"  {texto} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class ResolvedorTimes:
+    """
+    Resolve nomes digitados ou vindos de outras fontes para os nomes de
+    'nomes'. Consultas exatas (após normalização) e apelidos custam uma busca
+    em dicionário; as demais percorrem só as listas do índice de trigramas
+    que a consulta contém.
+    """
+
+    def __init__(self, nomes, aliases: dict = ALIASES):
+        self.nomes = sorted({n for n in nomes if isinstance(n, str) and n.strip()})
+        self._normalizados = [normalizar(n) for n in self.nomes]
+        self._tamanhos = []
+        self._exatos = {}
+        self._indice = defaultdict(list)
+        for posicao, normalizado in enumerate(self._normalizados):
+            self._exatos.setdefault(normalizado, self.nomes[posicao])
+            grams = trigramas(normalizado)
+            self._tamanhos.append(len(grams))
+            for gram in grams:
+                self._indice[gram].append(posicao)
+        # Apelidos só valem para times presentes na lista
+        for apelido, nome in aliases.items():
+            destino = self._exatos.get(normalizar(nome))
+            if destino is not None:
+                self._exatos.setdefault(normalizar(apelido), destino)
+
+    def __len__(self) -> int:
+        return len(self.nomes)
+
+    def canonico(self, nome: str) -> str:
+        """Nome conhecido com a mesma forma normalizada (ou apelido), ou None."""
+        return self._exatos.get(normalizar(nome))
+
+    def candidatos(self, nome: str, n: int = 5, corte: float = 0.4) -> list:
+        """
+        Até 'n' pares (nome, semelhança) em ordem decrescente de semelhança
+        (coeficiente de Dice dos trigramas, 1.0 para correspondência exata).
+        """
+        exato = self.canonico(nome)
+        if exato is not None:
+            return [(exato, 1.0)]
+        grams = trigramas(normalizar(nome))
+        if not grams:
+            return []
+        comuns = defaultdict(int)
+        for gram in grams:
+            for posicao in self._indice.get(gram, ()):
+                comuns[posicao] += 1
+        pontuados = []
+        for posicao, quantidade in comuns.items():
+            semelhanca = 2 * quantidade / (len(grams) + self._tamanhos[posicao])
+            if semelhanca >= corte:
+                pontuados.append((self.nomes[posicao], semelhanca))
+        pontuados.sort(key=lambda par: (-par[1], par[0]))
+        return pontuados[:n]
+
+    def resolver(self, nome: str, corte: float = 0.4) -> str:
+        """Melhor candidato para 'nome', ou None se nenhum passar do corte."""
+        melhores = self.candidatos(nome, n=1, corte=corte)
+        return melhores[0][0] if melhores else None
+
+
+# =============================
+# COMPARAÇÃO COM O DIFFLIB
+# =============================
+if __name__ == "__main__":
+    import difflib
+    import random
+    import time
+
+    from staging import ler_staging
+
+    dados = ler_staging()
+    nomes = sorted(set(dados["home"].dropna()) | set(dados["away"].dropna()))
+    if not nomes:
+        # Sem staging local: nomes sintéticos, só para medir o tempo
+        aleatorio = random.Random(0)
+        nomes = [
+            "".join(aleatorio.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(aleatorio.randint(5, 14))).title()
+            + aleatorio.choice(["", " FC", " City", " United", " EC"])
+            for _ in range(1500)
+        ]
+
+    def com_erro(nome: str, aleatorio: random.Random) -> str:
+        """Simula um nome digitado: sem acento, minúsculo e com uma letra a menos."""
+        nome = "".join(c for c in unicodedata.normalize("NFKD", nome) if not unicodedata.combining(c)).lower()
+        if len(nome) > 4:
+            i = aleatorio.randrange(len(nome))
+            nome = nome[:i] + nome[i + 1:]
+        return nome
+
+    aleatorio = random.Random(42)
+    amostra = aleatorio.sample(nomes, min(300, len(nomes)))
+    consultas = [com_erro(nome, aleatorio) for nome in amostra]
+
+    inicio = time.perf_counter()
+    resolvedor = ResolvedorTimes(nomes)
+    tempo_indice = time.perf_counter() - inicio
+
+    nomes_minusculos = [n.lower() for n in nomes]
+    mapa = {n.lower(): n for n in nomes}
+    inicio = time.perf_counter()
+    acertos_difflib = 0
+    for consulta, esperado in zip(consultas, amostra):
+        achados = difflib.get_close_matches(consulta, nomes_minusculos, n=5, cutoff=0.4)
+        acertos_difflib += bool(achados) and mapa[achados[0]] == esperado
+    tempo_difflib = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    acertos_indice = 0
+    for consulta, esperado in zip(consultas, amostra):
+        achados = resolvedor.candidatos(consulta)
+        acertos_indice += bool(achados) and achados[0][0] == esperado
+    tempo_resolvedor = time.perf_counter() - inicio
+
+    total = len(consultas)
+    print(f"{len(nomes)} times, {total} consultas (índice montado em {tempo_indice * 1000:.1f} ms)")
+    print(f"difflib:    {tempo_difflib / total * 1e6:9.1f} µs/consulta, acerto top-1 {acertos_difflib / total:.1%}")
+    print(f"trigramas:  {tempo_resolvedor / total * 1e6:9.1f} µs/consulta, acerto top-1 {acertos_indice / total:.1%}")
@@ -1,9 +1,8 @@
 import streamlit as st
 import pandas as pd
-import psycopg2
+from dados import carregar_partidas_derivadas, listar_times, intervalo_datas, versao_dados, estatisticas_times
 import plotly.express as px
 from datetime import datetime
-import numpy as np
 
 # =============================
 # 1) CONFIGURAÇÃO DA PÁGINA
@@ -15,69 +14,28 @@ st.set_page_config(
 )
 
 # =============================
-# 2) FUNÇÃO DE CARREGAMENTO
+# 2) DADOS DISPONÍVEIS
 # =============================
-@st.cache_data(show_spinner="Carregando dados das ligas...")
-def load_all_data():
-    """
-    Conecta ao PostgreSQL, carrega os dados da tabela 'tabela_ligas'
-    e retorna um DataFrame pandas.
-    """
-    try:
-        conn = psycopg2.connect(
-            host="localhost",
-            database="matches",
-            user="postgres",
-            password="1408",
-            port="5432"
-        )
-        query = "SELECT * FROM tabela_ligas;"
-        data = pd.read_sql(query, conn)
-        conn.close()
-        return data
-    except Exception as e:
-        st.error(f"Erro ao conectar com o banco de dados: {e}")
-        return pd.DataFrame()
-
-# =============================
-# 3) CARREGAR E PRÉ-PROCESSAR
-# =============================
-data = load_all_data()
-
-if not data.empty:
-    # Ajusta tipo de data
-    data['match_date'] = pd.to_datetime(data['match_date']).dt.date
-    
-    # Cria coluna de Resultado (Vitória Casa, Empate ou Vitória Fora)
-    data['Resultado'] = data.apply(
-        lambda x: 'Vitória Casa' if x['goals_h_ft'] > x['goals_a_ft']
-        else 'Vitória Fora' if x['goals_h_ft'] < x['goals_a_ft']
-        else 'Empate', 
-        axis=1
-    )
-    
-    # Garante que a coluna de gols totais seja numérica
-    data['totalgoals_ft'] = pd.to_numeric(data['totalgoals_ft'], errors='coerce').fillna(0)
-    
-    # Cria coluna para indicar se ambas as equipes marcaram (BTTS)
-    data['AmbasMarcam'] = np.where(
-    (data['goals_h_ft'] > 0) & (data['goals_a_ft'] > 0), 'Sim', 'Não'
+# Colunas usadas pelo painel; o restante da tabela_ligas não é carregado
+COLUNAS_DASHBOARD = (
+    'match_date', 'home', 'away', 'goals_h_ft', 'goals_a_ft', 'totalgoals_ft',
+    'shots_h', 'shots_a', 'corners_h_ft', 'corners_a_ft', 'totalcorners_ft'
 )
-else:
-    st.warning("Não foram encontrados dados no banco de dados.")
+
+versao = versao_dados()
+times = listar_times(versao)
+min_date, max_date = intervalo_datas(versao)
 
 # =============================
-# 4) INTERFACE PRINCIPAL
+# 3) INTERFACE PRINCIPAL
 # =============================
 st.title("⚽ Painel de Análise Futebolística")
 st.markdown("---")
 
-# 4.1) SIDEBAR COM FILTROS
+# 3.1) SIDEBAR COM FILTROS
 with st.sidebar:
     st.header("⚙ Filtros")
-    if not data.empty:
-        # Listar todos os times removendo valores nulos
-        times = sorted([x for x in set(data['home'].unique()).union(set(data['away'].unique())) if pd.notnull(x)])
+    if times:
         selecionados = st.multiselect(
             'Selecione times para análise:',
             options=times,
@@ -85,8 +43,6 @@ with st.sidebar:
         )
         
         # Filtro de data
-        min_date = data['match_date'].min()
-        max_date = data['match_date'].max()
         date_range = st.date_input(
             "Período de análise:",
             [min_date, max_date],
@@ -97,20 +53,23 @@ with st.sidebar:
         selecionados = []
         date_range = []
 
-# 4.2) FILTRO PRINCIPAL NOS DADOS
-if selecionados:
-    df_filtrado = data[
-        (data['home'].isin(selecionados)) | 
-        (data['away'].isin(selecionados))
-    ]
+# =============================
+# 4) CARREGAR E PRÉ-PROCESSAR
+# =============================
+# Os filtros de time e período são aplicados pelo banco de dados
+if times:
+    data_inicio, data_fim = (date_range[0], date_range[1]) if len(date_range) == 2 else (None, None)
+    # Resultado, Ambas Marcam e tipos reduzidos já vêm calculados (em cache por versão)
+    df_filtrado = carregar_partidas_derivadas(
+        COLUNAS_DASHBOARD,
+        times=tuple(selecionados) or None,
+        data_inicio=data_inicio,
+        data_fim=data_fim,
+        versao=versao
+    )
 else:
-    df_filtrado = data.copy()
-
-if len(date_range) == 2 and not df_filtrado.empty:
-    df_filtrado = df_filtrado[
-        (df_filtrado['match_date'] >= date_range[0]) &
-        (df_filtrado['match_date'] <= date_range[1])
-    ]
+    st.warning("Não foram encontrados dados no banco de dados.")
+    df_filtrado = pd.DataFrame(columns=COLUNAS_DASHBOARD)
 
 # =============================
 # 5) EXIBIÇÃO DE RESULTADOS
@@ -122,10 +81,10 @@ if not df_filtrado.empty:
 
     # Cálculos rápidos
     total_partidas = len(df_filtrado)
-    media_gols = df_filtrado['totalgoals_ft'].mean().round(2)
+    media_gols = round(float(df_filtrado['totalgoals_ft'].mean()), 2)
     jogos_over_2_5 = df_filtrado[df_filtrado['totalgoals_ft'] > 2.5]
     perc_over_2_5 = len(jogos_over_2_5) / total_partidas * 100 if total_partidas else 0
-    media_escanteios = df_filtrado['totalcorners_ft'].mean().round(1)
+    media_escanteios = round(float(df_filtrado['totalcorners_ft'].mean()), 1)
     
     # Ambas Marcam
     jogos_btts_sim = df_filtrado[df_filtrado['AmbasMarcam'] == 'Sim']
@@ -207,24 +166,20 @@ if not df_filtrado.empty:
     with tab2:
         st.subheader("🔍 Comparativo Detalhado")
         st.write("Compare métricas específicas dos times selecionados, tanto como mandantes quanto como visitantes.")
+        # As médias vêm dos agregados por time mantidos pelo ETL
         
         col_left, col_right = st.columns(2)
         
         # --- Desempenho como Mandante ---
         with col_left:
             st.markdown("**🏠 Desempenho como Mandante**")
-            home_stats = df_filtrado.groupby('home').agg({
-                'totalgoals_ft': 'mean',
-                'shots_h': 'mean',
-                'corners_h_ft': 'mean'
-            }).rename(columns={
-                'totalgoals_ft': 'Média Gols',
-                'shots_h': 'Chutes/Jogo',
-                'corners_h_ft': 'Escanteios/Jogo'
-            }).round(2)
-            
-            if selecionados:
-                home_stats = home_stats.loc[home_stats.index.intersection(selecionados)]
+            home_stats = estatisticas_times(
+                'casa', tuple(selecionados) or None, data_inicio, data_fim, versao
+            )[['media_gols', 'media_chutes', 'media_escanteios']].rename(columns={
+                'media_gols': 'Média Gols',
+                'media_chutes': 'Chutes/Jogo',
+                'media_escanteios': 'Escanteios/Jogo'
+            }).rename_axis('home').round(2)
             
             st.dataframe(
                 home_stats.style
@@ -238,18 +193,13 @@ if not df_filtrado.empty:
         # --- Desempenho como Visitante ---
         with col_right:
             st.markdown("**✈️ Desempenho como Visitante**")
-            away_stats = df_filtrado.groupby('away').agg({
-                'totalgoals_ft': 'mean',
-                'shots_a': 'mean',
-                'corners_a_ft': 'mean'
-            }).rename(columns={
-                'totalgoals_ft': 'Média Gols',
-                'shots_a': 'Chutes/Jogo',
-                'corners_a_ft': 'Escanteios/Jogo'
-            }).round(2)
-            
-            if selecionados:
-                away_stats = away_stats.loc[away_stats.index.intersection(selecionados)]
+            away_stats = estatisticas_times(
+                'fora', tuple(selecionados) or None, data_inicio, data_fim, versao
+            )[['media_gols', 'media_chutes', 'media_escanteios']].rename(columns={
+                'media_gols': 'Média Gols',
+                'media_chutes': 'Chutes/Jogo',
+                'media_escanteios': 'Escanteios/Jogo'
+            }).rename_axis('away').round(2)
             
             st.dataframe(
                 away_stats.style
@@ -270,37 +220,29 @@ if not df_filtrado.empty:
                 
                 # Estatísticas como mandante
                 home_comp = (
-                    df_filtrado[df_filtrado['home'].isin(times_selecionados)]
-                    .groupby('home')
-                    .agg({
-                        'totalgoals_ft': 'mean',
-                        'shots_h': 'mean',
-                        'corners_h_ft': 'mean'
-                    })
+                    estatisticas_times('casa', tuple(times_selecionados), data_inicio, data_fim, versao)
+                    [['media_gols', 'media_chutes', 'media_escanteios']]
                     .rename(columns={
-                        'totalgoals_ft': 'TotalGoals_Home',
-                        'shots_h': 'Shots_Home',
-                        'corners_h_ft': 'Corners_Home'
+                        'media_gols': 'TotalGoals_Home',
+                        'media_chutes': 'Shots_Home',
+                        'media_escanteios': 'Corners_Home'
                     })
                     .reindex(times_selecionados)
+                    .rename_axis(None)
                     .fillna(0)
                 )
                 
                 # Estatísticas como visitante
                 away_comp = (
-                    df_filtrado[df_filtrado['away'].isin(times_selecionados)]
-                    .groupby('away')
-                    .agg({
-                        'totalgoals_ft': 'mean',
-                        'shots_a': 'mean',
-                        'corners_a_ft': 'mean'
-                    })
+                    estatisticas_times('fora', tuple(times_selecionados), data_inicio, data_fim, versao)
+                    [['media_gols', 'media_chutes', 'media_escanteios']]
                     .rename(columns={
-                        'totalgoals_ft': 'TotalGoals_Away',
-                        'shots_a': 'Shots_Away',
-                        'corners_a_ft': 'Corners_Away'
+                        'media_gols': 'TotalGoals_Away',
+                        'media_chutes': 'Shots_Away',
+                        'media_escanteios': 'Corners_Away'
                     })
                     .reindex(times_selecionados)
+                    .rename_axis(None)
                     .fillna(0)
                 )
                 
@@ -455,7 +397,7 @@ if not df_filtrado.empty:
         # Evolução temporal de BTTS
         df_btts_timeline = (
             df_filtrado
-            .groupby(['match_date', 'AmbasMarcam'])
+            .groupby(['match_date', 'AmbasMarcam'], observed=True)
             .size()
             .reset_index(name='count')
             .sort_values('match_date')
@@ -481,6 +423,27 @@ if not df_filtrado.empty:
 else:
     st.warning("⚠️ Nenhum dado encontrado para os critérios selecionados ou o banco de dados está vazio.")
 
+# =============================
+# USO DE MEMÓRIA
+# =============================
+# Tamanho dos dados carregados antes e depois da representação compacta,
+# útil para dimensionar a memória do servidor
+memoria = df_filtrado.attrs.get("memoria")
+if memoria is not None:
+    with st.expander("💾 Uso de memória dos dados carregados"):
+        total = memoria.loc["total"]
+        col_antes, col_depois, col_reducao = st.columns(3)
+        col_antes.metric("Bytes/linha (original)", f"{total['antes_por_linha']:.0f}")
+        col_depois.metric("Bytes/linha (compacto)", f"{total['depois_por_linha']:.0f}")
+        col_reducao.metric("Redução", f"{total['reducao']:.0%}")
+        st.dataframe(
+            memoria.style.format({
+                'antes': '{:,.0f}', 'depois': '{:,.0f}',
+                'antes_por_linha': '{:.1f}', 'depois_por_linha': '{:.1f}',
+                'reducao': '{:.0%}'
+            })
+        )
+
 # =============================
 # RODAPÉ
 # =============================
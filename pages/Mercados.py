@@ -1,8 +1,9 @@
 import streamlit as st
 import pandas as pd
-import psycopg2
-import math
-import difflib
+from dados import (obter_indice_times, obter_resolvedor_times, carregar_ratings,
+                   obter_modelos_dixon_coles, obter_modelo_ao_vivo, obter_fracao_primeiro_tempo, versao_dados)
+from precificacao import matriz_placar, matrizes_tempos, intervalo_final, RESULTADOS
+from ratings import lambdas
 
 # =============================
 # 1) CSS Personalizado
@@ -31,29 +32,13 @@ st.markdown(css, unsafe_allow_html=True)
 # =============================
 # 2) Carregamento dos Dados
 # =============================
-@st.cache_data(show_spinner=True)
-def load_all_data():
-    """
-    Conecta ao PostgreSQL, carrega os dados da tabela 'tabela_ligas'
-    e retorna um DataFrame pandas.
-    """
-    try:
-        conn = psycopg2.connect(
-            host="localhost",
-            database="matches",
-            user="postgres",
-            password="1408",
-            port="5432"
-        )
-        query = "SELECT * FROM tabela_ligas;"
-        data = pd.read_sql(query, conn)
-        conn.close()
-        return data
-    except Exception as e:
-        st.error(f"Erro ao conectar com o banco de dados: {e}")
-        return pd.DataFrame()
+# Colunas usadas na análise; o restante da tabela_ligas não é carregado
+COLUNAS_MERCADOS = ('match_date', 'league', 'home', 'away', 'goals_h_ft', 'goals_a_ft')
 
-data = load_all_data()
+versao = versao_dados()
+# Jogos indexados por time (em cache por versão dos dados)
+indice = obter_indice_times(COLUNAS_MERCADOS, versao)
+data = indice.partidas
 
 # =============================
 # 3) Ajuste e Mapeamento de Times
@@ -62,9 +47,9 @@ if data.empty:
     st.error("Não foram encontrados dados no banco de dados.")
     st.stop()
 
-teams = set(data['home'].unique()).union(set(data['away'].unique()))
-teams_lower = {team.lower() for team in teams if isinstance(team, str)}
-team_map = {team.lower(): team for team in teams if isinstance(team, str)}
+team_map = indice.por_minusculo
+# Nomes normalizados, apelidos e índice de trigramas (em cache por versão)
+resolvedor = obter_resolvedor_times(COLUNAS_MERCADOS, versao)
 
 # =============================
 # 4) Título e Introdução
@@ -95,9 +80,12 @@ with col_input2:
     market_odd_both = st.text_input("Odd Real do Mercado para Ambas Marcam", value="")
 
 # Função para buscar times similares (usando cutoff=0.4)
-def find_similar_team(input_team, teams_set, cutoff=0.4):
-    matches = difflib.get_close_matches(input_team.lower(), teams_set, n=5, cutoff=cutoff)
-    return [team_map.get(match, match) for match in matches]
+def find_similar_team(input_team, cutoff=0.4):
+    return [team for team, _ in resolvedor.candidatos(input_team, n=5, corte=cutoff)]
+
+# Nome exato, grafia normalizada (acentos, FC/EC...) ou apelido conhecido
+def find_exact_team(input_team):
+    return team_map.get(input_team.lower()) or resolvedor.canonico(input_team)
 
 # =============================
 # 6) Botão de Análise
@@ -107,13 +95,10 @@ if st.button("Analisar Partida"):
         st.error("Por favor, insira os nomes dos dois times.")
         st.stop()
 
-    # Ajusta para minúsculo
-    input_home_lower = input_home.lower()
-    input_away_lower = input_away.lower()
-    
     # Verifica time da casa
-    if input_home_lower not in teams_lower:
-        similar_home = find_similar_team(input_home, teams_lower)
+    home_team = find_exact_team(input_home)
+    if home_team is None:
+        similar_home = find_similar_team(input_home)
         if similar_home:
             if len(similar_home) == 1:
                 home_team = similar_home[0]
@@ -124,12 +109,11 @@ if st.button("Analisar Partida"):
         else:
             st.error("Time da Casa não encontrado e nenhuma sugestão foi encontrada.")
             st.stop()
-    else:
-        home_team = team_map[input_home_lower]
     
     # Verifica time visitante
-    if input_away_lower not in teams_lower:
-        similar_away = find_similar_team(input_away, teams_lower)
+    away_team = find_exact_team(input_away)
+    if away_team is None:
+        similar_away = find_similar_team(input_away)
         if similar_away:
             if len(similar_away) == 1:
                 away_team = similar_away[0]
@@ -140,24 +124,30 @@ if st.button("Analisar Partida"):
         else:
             st.error("Time Visitante não encontrado e nenhuma sugestão foi encontrada.")
             st.stop()
-    else:
-        away_team = team_map[input_away_lower]
     
     # Filtra dados de cada time
-    home_matches = data[data['home'] == home_team]
-    away_matches = data[data['away'] == away_team]
+    home_matches = indice.jogos(home_team, 'casa')
+    away_matches = indice.jogos(away_team, 'fora')
     
     if home_matches.empty or away_matches.empty:
         st.error("Não foram encontrados dados suficientes para um ou ambos os times. Verifique a disponibilidade dos dados.")
         st.stop()
 
+    # Só jogos com placar entram nas médias (jogos futuros têm gols nulos,
+    # e a média de uma coluna Int8 só com nulos é pd.NA, não NaN)
+    home_played = home_matches.dropna(subset=['goals_h_ft', 'goals_a_ft'])
+    away_played = away_matches.dropna(subset=['goals_h_ft', 'goals_a_ft'])
+    if home_played.empty or away_played.empty:
+        st.error("Um ou ambos os times ainda não têm jogos com placar no mando selecionado. Não é possível precificar a partida.")
+        st.stop()
+
     # =============================
     # 7) Cálculo de Estatísticas
     # =============================
-    home_avg_goals_scored = home_matches['goals_h_ft'].mean()
-    home_avg_goals_conceded = home_matches['goals_a_ft'].mean()
-    away_avg_goals_scored = away_matches['goals_a_ft'].mean()
-    away_avg_goals_conceded = away_matches['goals_h_ft'].mean()
+    home_avg_goals_scored = home_played['goals_h_ft'].astype(float).mean()
+    home_avg_goals_conceded = home_played['goals_a_ft'].astype(float).mean()
+    away_avg_goals_scored = away_played['goals_a_ft'].astype(float).mean()
+    away_avg_goals_conceded = away_played['goals_h_ft'].astype(float).mean()
     
     # Exibição das estatísticas básicas
     st.markdown("### 📊 Estatísticas Básicas dos Times")
@@ -169,23 +159,32 @@ if st.button("Analisar Partida"):
     st.write(f"- Média de Gols Marcados: {away_avg_goals_scored:.2f}")
     st.write(f"- Média de Gols Sofridos: {away_avg_goals_conceded:.2f}")
 
-    # Cálculo de gols esperados
-    expected_home_goals = home_avg_goals_scored
-    expected_away_goals = away_avg_goals_scored
+    # Cálculo de gols esperados: ratings com decaimento no tempo mantidos pelo
+    # ETL, na liga do último jogo do mandante em casa (times homônimos de
+    # ligas diferentes têm o mesmo nome); sem ratings, as médias simples acima
+    liga_jogo = str(home_matches['league'].iloc[-1])
+    lambda_home, lambda_away = lambdas(carregar_ratings(versao), [home_team], [away_team], [liga_jogo])
+    if pd.notna(lambda_home[0]) and pd.notna(lambda_away[0]):
+        expected_home_goals = lambda_home[0]
+        expected_away_goals = lambda_away[0]
+        st.caption("Gols esperados calculados pelos ratings de ataque e defesa (ponderados pela data dos jogos).")
+    else:
+        expected_home_goals = home_avg_goals_scored
+        expected_away_goals = away_avg_goals_scored
+        st.caption("Ratings indisponíveis para estes times: usando as médias simples de gols.")
     lambda_total = expected_home_goals + expected_away_goals
     
     st.markdown("### ⚽ Previsão de Gols (Modelo Poisson)")
     st.write(f"Gols esperados na partida (total): **{lambda_total:.2f}**")
 
+    # Matriz de placares do confronto: todos os mercados abaixo saem dela
+    matriz = matriz_placar(float(expected_home_goals), float(expected_away_goals))
+
     # =============================
     # 8) Over 2.5 - Cálculo e Valor
     # =============================
     st.markdown("### 🔍 Over 2.5 Gols - Odd Justa")
-    p0 = math.exp(-lambda_total)
-    p1 = lambda_total * math.exp(-lambda_total)
-    p2 = (lambda_total**2 / 2) * math.exp(-lambda_total)
-    prob_under_2_5 = p0 + p1 + p2
-    prob_over_2_5 = 1 - prob_under_2_5
+    prob_over_2_5 = matriz.over(2.5)
     fair_odd_over25 = 1 / prob_over_2_5 if prob_over_2_5 > 0 else None
     
     st.write(f"**Probabilidade de over 2.5 gols:** {prob_over_2_5*100:.2f}%")
@@ -211,25 +210,8 @@ if st.button("Analisar Partida"):
     # 9) Back Favorito & Lay Zebra
     # =============================
     st.markdown("### ⚖️ Back Favorito e Lay Zebra - Odds Justas")
-    def poisson_probability(k, lambd):
-        return (lambd**k) * math.exp(-lambd) / math.factorial(k)
-    
-    def compute_match_probabilities(lambda_home, lambda_away, max_goals=10):
-        home_win = 0
-        draw = 0
-        away_win = 0
-        for x in range(max_goals+1):
-            for y in range(max_goals+1):
-                p = poisson_probability(x, lambda_home) * poisson_probability(y, lambda_away)
-                if x > y:
-                    home_win += p
-                elif x == y:
-                    draw += p
-                else:
-                    away_win += p
-        return {'home_win': home_win, 'draw': draw, 'away_win': away_win}
-
-    probs = compute_match_probabilities(expected_home_goals, expected_away_goals)
+    prob_home_win, prob_draw, prob_away_win = matriz.resultado()
+    probs = {'home_win': prob_home_win, 'draw': prob_draw, 'away_win': prob_away_win}
     
     # Determina favorito e azarão
     if expected_home_goals > expected_away_goals:
@@ -295,7 +277,7 @@ if st.button("Analisar Partida"):
     # 10) Ambas Marcam (BTTS)
     # =============================
     st.markdown("### 🔍 Ambas Marcam (BTTS) - Odd Justa")
-    prob_both = (1 - math.exp(-expected_home_goals)) * (1 - math.exp(-expected_away_goals))
+    prob_both = matriz.ambas_marcam()
     fair_odd_both = 1 / prob_both if prob_both > 0 else None
     
     st.write(f"**Probabilidade de ambas marcarem:** {prob_both*100:.2f}%")
@@ -317,6 +299,117 @@ if st.button("Analisar Partida"):
     except ValueError:
         st.error("Por favor, insira uma odd real válida para Ambas Marcam.")
 
+    # =============================
+    # 11) Outros Mercados
+    # =============================
+    with st.expander("📋 Outros Mercados (Odds Justas)"):
+        dc_1x, dc_12, dc_x2 = matriz.dupla_chance()
+        linhas_gols = [0.5, 1.5, 2.5, 3.5, 4.5]
+        mercados = pd.DataFrame(
+            [("Dupla Chance 1X", dc_1x), ("Dupla Chance 12", dc_12), ("Dupla Chance X2", dc_x2)] +
+            [(f"Over {linha}", matriz.over(linha)) for linha in linhas_gols] +
+            [(f"Under {linha}", matriz.under(linha)) for linha in linhas_gols],
+            columns=["Mercado", "Probabilidade"]
+        )
+        mercados["Odd Justa"] = 1 / mercados["Probabilidade"]
+        mercados["Probabilidade"] = mercados["Probabilidade"] * 100
+
+        linhas_handicap = [-1.5, -1, -0.75, -0.5, -0.25, 0, 0.25, 0.5, 0.75, 1, 1.5]
+        handicaps = pd.DataFrame({
+            "Handicap Casa": linhas_handicap,
+            "Odd Justa": [matriz.handicap_asiatico(linha) for linha in linhas_handicap]
+        })
+
+        placares = pd.DataFrame(
+            [(f"{i} x {j}", matriz.placar_exato(i, j) * 100) for i in range(5) for j in range(5)],
+            columns=["Placar", "Probabilidade"]
+        ).sort_values("Probabilidade", ascending=False).head(10)
+
+        col_m1, col_m2, col_m3 = st.columns(3)
+        col_m1.dataframe(mercados.style.format({"Probabilidade": "{:.2f}%", "Odd Justa": "{:.2f}"}))
+        col_m2.dataframe(handicaps.style.format({"Handicap Casa": "{:+.2f}", "Odd Justa": "{:.2f}"}))
+        col_m3.dataframe(placares.style.format({"Probabilidade": "{:.2f}%"}))
+
+    # =============================
+    # 12) Modelo Dixon-Coles
+    # =============================
+    # Ajustado por liga pelo ETL (vantagem de mando, decaimento no tempo e
+    # correção dos placares baixos); só vale para times da mesma liga
+    modelos = obter_modelos_dixon_coles(versao)
+    modelo_liga = next(
+        ((liga, modelo) for liga, modelo in modelos.items() if home_team in modelo and away_team in modelo),
+        None
+    )
+    with st.expander("📐 Modelo Dixon-Coles (por liga)"):
+        if modelo_liga is None:
+            st.info("Não há modelo Dixon-Coles ajustado com os dois times na mesma liga.")
+        else:
+            liga, modelo = modelo_liga
+            matriz_dc = modelo.matriz(home_team, away_team)
+            casa_dc, empate_dc, fora_dc = matriz_dc.resultado()
+            st.write(
+                f"**Liga:** {liga} • ajuste com {modelo.n_jogos} jogos até {modelo.referencia} "
+                f"• ρ = {modelo.rho:.3f} • vantagem de mando = {modelo.vantagem_casa:.3f}"
+            )
+            st.write(
+                f"**Gols esperados:** {matriz_dc.lambda_home[0]:.2f} x {matriz_dc.lambda_away[0]:.2f}"
+            )
+            mercados_dc = pd.DataFrame(
+                [("Casa", casa_dc), ("Empate", empate_dc), ("Fora", fora_dc),
+                 ("Over 2.5", matriz_dc.over(2.5)), ("Ambas Marcam", matriz_dc.ambas_marcam())],
+                columns=["Mercado", "Probabilidade"]
+            )
+            mercados_dc["Odd Justa"] = 1 / mercados_dc["Probabilidade"]
+            mercados_dc["Probabilidade"] = mercados_dc["Probabilidade"] * 100
+            st.dataframe(mercados_dc.style.format({"Probabilidade": "{:.2f}%", "Odd Justa": "{:.2f}"}))
+
+    # =============================
+    # 13) Ao Vivo
+    # =============================
+    # Mesmos gols esperados, distribuídos pelos minutos conforme as curvas
+    # de gols por minuto do histórico
+    modelo_ao_vivo = obter_modelo_ao_vivo(versao)
+    with st.expander("⏱️ Ao Vivo (placar 0x0)"):
+        linhas_ao_vivo = []
+        for minuto in (0, 15, 30, 45, 60, 75, 85):
+            precos = modelo_ao_vivo.precificar(float(expected_home_goals), float(expected_away_goals), minuto)
+            linhas_ao_vivo.append({
+                "Minuto": minuto,
+                "Casa": precos["casa"] * 100,
+                "Empate": precos["empate"] * 100,
+                "Fora": precos["fora"] * 100,
+                "Mais 0.5 Gols": precos["over"][0.5] * 100,
+                "Mais 1.5 Gols": precos["over"][1.5] * 100,
+                "Próximo Gol Casa": precos["proximo_casa"] * 100,
+                "Próximo Gol Fora": precos["proximo_fora"] * 100,
+            })
+        st.caption(f"Curvas de gols por minuto de {modelo_ao_vivo.n_jogos} jogos; probabilidades em %.")
+        st.dataframe(pd.DataFrame(linhas_ao_vivo).set_index("Minuto").style.format("{:.1f}"))
+
+    # =============================
+    # 14) Primeiro Tempo e Intervalo/Final
+    # =============================
+    # Fração dos gols no 1º tempo pelos placares do intervalo do histórico
+    fracao_ht = obter_fracao_primeiro_tempo(versao)
+    primeiro, segundo = matrizes_tempos([expected_home_goals], [expected_away_goals], fracao_ht)
+    with st.expander("🕐 Primeiro Tempo e Intervalo/Final"):
+        ht_casa, ht_empate, ht_fora = primeiro.resultado()
+        mercados_ht = pd.DataFrame(
+            [("Casa HT", ht_casa[0]), ("Empate HT", ht_empate[0]), ("Fora HT", ht_fora[0])] +
+            [(f"Over {linha} HT", primeiro.over(linha)[0]) for linha in (0.5, 1.5, 2.5)] +
+            [(f"Under {linha} HT", primeiro.under(linha)[0]) for linha in (0.5, 1.5, 2.5)],
+            columns=["Mercado", "Probabilidade"]
+        )
+        mercados_ht["Odd Justa"] = 1 / mercados_ht["Probabilidade"]
+        mercados_ht["Probabilidade"] = mercados_ht["Probabilidade"] * 100
+        htft = pd.DataFrame(
+            intervalo_final(primeiro, segundo)[0] * 100,
+            index=[f"Intervalo: {r}" for r in RESULTADOS], columns=[f"Final: {r}" for r in RESULTADOS]
+        )
+        col_ht1, col_ht2 = st.columns(2)
+        col_ht1.dataframe(mercados_ht.style.format({"Probabilidade": "{:.2f}%", "Odd Justa": "{:.2f}"}))
+        col_ht2.dataframe(htft.style.format("{:.2f}%"))
+
 # =============================
 # RODAPÉ
 # =============================
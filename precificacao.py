@@ -0,0 +1,350 @@
+import functools
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from scipy.stats import poisson
+
+# =============================================
+# PRECIFICAÇÃO PELA MATRIZ DE PLACARES (POISSON)
+# =============================================
+# A MatrizPlacar guarda a distribuição conjunta dos placares de um ou mais
+# jogos. Todos os mercados (1X2, dupla chance, Over/Under, BTTS, placar
+# exato e handicap asiático) são reduções baratas dessa matriz, que é
+# calculada uma única vez por par de médias de gols.
+
+MAX_GOLS_PADRAO = 10
+
+# As médias de gols são arredondadas antes de consultar o cache, para que
+# valores praticamente iguais reaproveitem a mesma matriz
+CASAS_QUANTIZACAO = 2
+TAMANHO_CACHE = int(os.getenv("TAMANHO_CACHE_PRECIFICACAO", "4096"))
+
+
+class MatrizPlacar:
+    """
+    Matriz de probabilidades dos placares (gols da casa nas linhas, gols do
+    visitante nas colunas) para gols independentes com distribuição de Poisson.
+
+    Aceita médias escalares (um jogo) ou arrays (um elemento por jogo); os
+    métodos retornam float ou array conforme a entrada.
+
+    A matriz é truncada em 'max_gols'. Com 'acumular_cauda=True' a última
+    linha/coluna recebe toda a probabilidade de 'max_gols' ou mais gols, de
+    modo que a matriz soma 1 e as linhas de gols abaixo de 'max_gols' são
+    exatas. Em qualquer caso, 'massa_cauda' informa a probabilidade dos
+    placares fora da grade exata.
+    """
+
+    def __init__(self, lambda_home, lambda_away, max_gols: int = MAX_GOLS_PADRAO,
+                 acumular_cauda: bool = True):
+        lambda_home = np.asarray(lambda_home, dtype=float)
+        lambda_away = np.asarray(lambda_away, dtype=float)
+        escalar = lambda_home.ndim == 0 and lambda_away.ndim == 0
+        lambda_home, lambda_away = np.broadcast_arrays(
+            np.atleast_1d(lambda_home), np.atleast_1d(lambda_away)
+        )
+
+        gols = np.arange(max_gols + 1)
+        marginal_home = poisson.pmf(gols[None, :], lambda_home[:, None])
+        marginal_away = poisson.pmf(gols[None, :], lambda_away[:, None])
+        massa_cauda = 1 - marginal_home.sum(axis=1) * marginal_away.sum(axis=1)
+        if acumular_cauda:
+            marginal_home[:, -1] += poisson.sf(max_gols, lambda_home)
+            marginal_away[:, -1] += poisson.sf(max_gols, lambda_away)
+
+        self._inicializar(lambda_home, lambda_away, marginal_home, marginal_away,
+                          massa_cauda, max_gols, acumular_cauda, escalar)
+
+    def _inicializar(self, lambda_home, lambda_away, marginal_home, marginal_away,
+                     massa_cauda, max_gols, acumular_cauda, escalar):
+        self.escalar = escalar
+        self.lambda_home = lambda_home
+        self.lambda_away = lambda_away
+        self.max_gols = max_gols
+        self.acumular_cauda = acumular_cauda
+        self.marginal_home = marginal_home
+        self.marginal_away = marginal_away
+        self._massa_cauda = massa_cauda
+        self.p = marginal_home[:, :, None] * marginal_away[:, None, :]
+        for array in (self.marginal_home, self.marginal_away, self.p):
+            array.flags.writeable = False
+
+    def _fatia(self, indices, escalar: bool = False) -> "MatrizPlacar":
+        """Nova MatrizPlacar com os jogos das posições 'indices', sem recalcular."""
+        matriz = MatrizPlacar.__new__(MatrizPlacar)
+        matriz._inicializar(
+            self.lambda_home[indices], self.lambda_away[indices],
+            self.marginal_home[indices], self.marginal_away[indices],
+            self._massa_cauda[indices], self.max_gols, self.acumular_cauda, escalar
+        )
+        return matriz
+
+    @classmethod
+    def _combinar(cls, matrizes: list) -> "MatrizPlacar":
+        """Junta matrizes de um jogo (mesma truncagem) em uma única matriz em lote."""
+        primeira = matrizes[0]
+        matriz = cls.__new__(cls)
+        matriz._inicializar(
+            np.concatenate([m.lambda_home for m in matrizes]),
+            np.concatenate([m.lambda_away for m in matrizes]),
+            np.concatenate([m.marginal_home for m in matrizes]),
+            np.concatenate([m.marginal_away for m in matrizes]),
+            np.concatenate([m._massa_cauda for m in matrizes]),
+            primeira.max_gols, primeira.acumular_cauda, False
+        )
+        return matriz
+
+    @property
+    def massa_cauda(self):
+        """Probabilidade dos placares fora da grade exata (acima de 'max_gols')."""
+        return self._saida(self._massa_cauda)
+
+    def _saida(self, valores):
+        return float(valores[0]) if self.escalar else valores
+
+    def _soma_onde(self, mascara: np.ndarray):
+        return self.p[:, mascara].sum(axis=1)
+
+    @functools.cached_property
+    def _total_gols(self) -> np.ndarray:
+        gols = np.arange(self.max_gols + 1)
+        return gols[:, None] + gols[None, :]
+
+    @functools.cached_property
+    def _resultado(self) -> tuple:
+        return (
+            np.tril(self.p, k=-1).sum(axis=(1, 2)),
+            np.trace(self.p, axis1=1, axis2=2),
+            np.triu(self.p, k=1).sum(axis=(1, 2))
+        )
+
+    @functools.cached_property
+    def distribuicao_diferenca(self) -> np.ndarray:
+        """
+        Probabilidade de cada saldo (gols da casa - gols do visitante), de
+        -max_gols a +max_gols. Forma (n_jogos, 2 * max_gols + 1).
+        """
+        saldos = range(-self.max_gols, self.max_gols + 1)
+        return np.stack(
+            [np.trace(self.p, offset=-saldo, axis1=1, axis2=2) for saldo in saldos], axis=1
+        )
+
+    # -----------------------------
+    # Mercados
+    # -----------------------------
+    def resultado(self) -> tuple:
+        """Probabilidades de vitória da casa, empate e vitória do visitante."""
+        return tuple(self._saida(v) for v in self._resultado)
+
+    def dupla_chance(self) -> tuple:
+        """Probabilidades de 1X, 12 e X2."""
+        casa, empate, fora = self._resultado
+        return self._saida(casa + empate), self._saida(casa + fora), self._saida(empate + fora)
+
+    def under(self, linha: float):
+        """Probabilidade de o total de gols ficar abaixo da linha (ex.: 2.5)."""
+        return self._saida(self._soma_onde(self._total_gols < linha))
+
+    def over(self, linha: float):
+        """Probabilidade de o total de gols superar a linha (ex.: 2.5)."""
+        return self._saida(1 - self._soma_onde(self._total_gols < linha))
+
+    def ambas_marcam(self):
+        """Probabilidade de os dois times marcarem (BTTS)."""
+        return self._saida((1 - self.marginal_home[:, 0]) * (1 - self.marginal_away[:, 0]))
+
+    def placar_exato(self, gols_home: int, gols_away: int):
+        """Probabilidade de um placar exato."""
+        return self._saida(self.p[:, gols_home, gols_away])
+
+    def handicap_asiatico(self, linha: float):
+        """
+        Odd justa do handicap asiático para o time da casa com a linha dada
+        (ex.: -0.5, -0.25, +1). Linhas de quarto são divididas em duas apostas
+        de meia unidade; linhas inteiras devolvem a aposta no empate.
+        """
+        saldos = np.arange(-self.max_gols, self.max_gols + 1)
+        if (linha * 4) % 2 == 1:
+            componentes = (linha - 0.25, linha + 0.25)
+        else:
+            componentes = (linha,)
+
+        ganho = np.zeros(len(self.lambda_home))
+        perda = np.zeros(len(self.lambda_home))
+        for componente in componentes:
+            margem = saldos + componente
+            ganho += self.distribuicao_diferenca[:, margem > 0].sum(axis=1) / len(componentes)
+            perda += self.distribuicao_diferenca[:, margem < 0].sum(axis=1) / len(componentes)
+        # Valor esperado nulo: ganho * (odd - 1) = perda
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._saida(np.where(ganho > 0, 1 + perda / ganho, np.nan))
+
+
+# =============================================
+# CACHE LRU DAS MATRIZES
+# =============================================
+class CacheLRU:
+    """
+    Cache LRU com tamanho máximo e contadores de acertos, falhas e remoções.
+    Seguro para uso pelas várias sessões (threads) do Streamlit.
+    """
+
+    def __init__(self, tamanho_maximo: int):
+        self.tamanho_maximo = tamanho_maximo
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+
+    def obter(self, chave):
+        with self._lock:
+            valor = self._itens.get(chave)
+            if valor is None:
+                self.falhas += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return valor
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho_maximo:
+                self._itens.popitem(last=False)
+                self.remocoes += 1
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self.acertos = self.falhas = self.remocoes = 0
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "remocoes": self.remocoes,
+                "tamanho": len(self._itens),
+                "tamanho_maximo": self.tamanho_maximo,
+                "taxa_acerto": self.acertos / consultas if consultas else 0.0
+            }
+
+
+_cache_matrizes = CacheLRU(TAMANHO_CACHE)
+
+
+def _quantizar(valores):
+    return np.round(np.asarray(valores, dtype=float), CASAS_QUANTIZACAO)
+
+
+def matriz_placar(lambda_home: float, lambda_away: float, max_gols: int = MAX_GOLS_PADRAO,
+                  acumular_cauda: bool = True) -> MatrizPlacar:
+    """
+    MatrizPlacar de um único jogo, com as médias arredondadas para
+    CASAS_QUANTIZACAO casas e reaproveitada pelo cache LRU.
+    """
+    lambda_home, lambda_away = float(_quantizar(lambda_home)), float(_quantizar(lambda_away))
+    chave = (lambda_home, lambda_away, max_gols, acumular_cauda)
+    matriz = _cache_matrizes.obter(chave)
+    if matriz is None:
+        matriz = MatrizPlacar(lambda_home, lambda_away, max_gols, acumular_cauda)
+        if np.isfinite(lambda_home) and np.isfinite(lambda_away):
+            _cache_matrizes.guardar(chave, matriz)
+    return matriz
+
+
+def matriz_lote(lambda_home, lambda_away, max_gols: int = MAX_GOLS_PADRAO,
+                acumular_cauda: bool = True) -> MatrizPlacar:
+    """
+    MatrizPlacar em lote (um elemento por jogo) usando o cache LRU: cada par
+    distinto de médias arredondadas é consultado uma vez, e os pares ausentes
+    do cache são calculados juntos, em uma única operação vetorizada.
+    """
+    lambda_home, lambda_away = np.broadcast_arrays(
+        np.atleast_1d(_quantizar(lambda_home)), np.atleast_1d(_quantizar(lambda_away))
+    )
+    if lambda_home.size == 0:
+        return MatrizPlacar(lambda_home, lambda_away, max_gols, acumular_cauda)
+    pares, inverso = np.unique(np.column_stack([lambda_home, lambda_away]), axis=0, return_inverse=True)
+
+    matrizes = [None] * len(pares)
+    faltantes = []
+    for posicao, (media_home, media_away) in enumerate(pares):
+        chave = (float(media_home), float(media_away), max_gols, acumular_cauda)
+        matrizes[posicao] = _cache_matrizes.obter(chave)
+        if matrizes[posicao] is None:
+            faltantes.append(posicao)
+
+    if faltantes:
+        novas = MatrizPlacar(pares[faltantes, 0], pares[faltantes, 1], max_gols, acumular_cauda)
+        for indice, posicao in enumerate(faltantes):
+            matrizes[posicao] = novas._fatia([indice], escalar=True)
+            if np.isfinite(pares[posicao]).all():
+                _cache_matrizes.guardar(
+                    (float(pares[posicao, 0]), float(pares[posicao, 1]), max_gols, acumular_cauda),
+                    matrizes[posicao]
+                )
+
+    return MatrizPlacar._combinar(matrizes)._fatia(np.ravel(inverso))
+
+
+def estatisticas_cache() -> dict:
+    """Acertos, falhas, remoções e ocupação do cache de matrizes."""
+    return _cache_matrizes.estatisticas()
+
+
+def odds_justas(prob):
+    """Odds justas (inverso das probabilidades), arredondadas; NaN quando a probabilidade é zero."""
+    prob = np.asarray(prob, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(prob > 0, np.round(1 / prob, 2), np.nan)
+
+
+# =============================================
+# PRIMEIRO TEMPO E INTERVALO/FINAL
+# =============================================
+# Os gols de cada tempo são Poisson independentes, com a média do jogo
+# dividida pela fração dos gols que sai no 1º tempo. A matriz do 1º tempo
+# dá os mercados HT; a combinação dos saldos dos dois tempos dá o
+# resultado duplo intervalo/final.
+
+# Fração usada quando não há placares do intervalo (ver dados.obter_fracao_primeiro_tempo)
+FRACAO_PRIMEIRO_TEMPO = 0.45
+RESULTADOS = ("Casa", "Empate", "Fora")
+
+
+def matrizes_tempos(lambda_home, lambda_away, fracao=FRACAO_PRIMEIRO_TEMPO, max_gols: int = MAX_GOLS_PADRAO,
+                    acumular_cauda: bool = True) -> tuple:
+    """
+    MatrizPlacar do 1º e do 2º tempo, em lote e pelo cache. 'fracao' é a
+    fração dos gols no 1º tempo, única ou um par (casa, fora).
+    """
+    fracao_home, fracao_away = (fracao, fracao) if np.ndim(fracao) == 0 else fracao
+    lambda_home = np.asarray(lambda_home, dtype=float)
+    lambda_away = np.asarray(lambda_away, dtype=float)
+    primeiro = matriz_lote(lambda_home * fracao_home, lambda_away * fracao_away, max_gols, acumular_cauda)
+    segundo = matriz_lote(lambda_home * (1 - fracao_home), lambda_away * (1 - fracao_away), max_gols, acumular_cauda)
+    return primeiro, segundo
+
+
+def intervalo_final(primeiro: MatrizPlacar, segundo: MatrizPlacar) -> np.ndarray:
+    """
+    Probabilidades do resultado duplo intervalo/final, forma (n_jogos, 3, 3):
+    [:, i, j] = resultado i no intervalo e j no final, na ordem de RESULTADOS.
+    """
+    saldo_primeiro = np.arange(-primeiro.max_gols, primeiro.max_gols + 1)
+    saldo_segundo = np.arange(-segundo.max_gols, segundo.max_gols + 1)
+    sinal_intervalo = np.sign(saldo_primeiro)[:, None]
+    sinal_final = np.sign(saldo_primeiro[:, None] + saldo_segundo[None, :])
+    ordem = (1, 0, -1)
+    mascaras = np.array(
+        [[(sinal_intervalo == i) & (sinal_final == j) for j in ordem] for i in ordem], dtype=float
+    )
+    return np.einsum(
+        "na,nb,ijab->nij", primeiro.distribuicao_diferenca, segundo.distribuicao_diferenca, mascaras
+    )
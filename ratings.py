@@ -0,0 +1,280 @@
+import math
+import os
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+
+# =============================
+# RATINGS DE ATAQUE E DEFESA
+# =============================
+# Força de ataque e de defesa de cada time, em casa e fora, por liga, com
+# decaimento exponencial no tempo (jogos antigos pesam menos). O estado de
+# cada liga são somas ponderadas de gols e de jogos em uma data de
+# referência; como o decaimento é exponencial, avançar a referência é só
+# multiplicar as somas por um fator, e o ETL atualiza os ratings somando
+# apenas os jogos novos ou alterados desde a última execução.
+#
+# Com as forças, os gols esperados de uma partida são:
+#   λ casa = média de gols do mandante na liga × ataque_casa(mandante) × defesa_fora(visitante)
+#   λ fora = média de gols do visitante na liga × ataque_fora(visitante) × defesa_casa(mandante)
+
+# Meia-vida do peso de um jogo, em dias
+MEIA_VIDA_DIAS = float(os.getenv("RATINGS_MEIA_VIDA_DIAS", "180"))
+# Jogos fictícios na média da liga somados a cada time, para estabilizar
+# as forças de times com poucos jogos
+PSEUDO_JOGOS = float(os.getenv("RATINGS_PSEUDO_JOGOS", "3"))
+
+TAXA_DECAIMENTO = math.log(2) / MEIA_VIDA_DIAS
+
+COLUNAS_SOMAS = ["peso_casa", "marcados_casa", "sofridos_casa", "peso_fora", "marcados_fora", "sofridos_fora"]
+COLUNAS_FORCAS = ["ataque_casa", "defesa_casa", "ataque_fora", "defesa_fora"]
+
+
+def criar_tabelas_ratings(cur):
+    """Cria as tabelas de estado dos ratings (por liga, por time e jogos já somados)."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS ratings_ligas (
+            league_id       INTEGER PRIMARY KEY REFERENCES leagues (id),
+            referencia      DATE NOT NULL,
+            processado_ate  TIMESTAMPTZ,
+            peso            DOUBLE PRECISION NOT NULL,
+            gols_casa       DOUBLE PRECISION NOT NULL,
+            gols_fora       DOUBLE PRECISION NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS ratings_times (
+            league_id       INTEGER NOT NULL REFERENCES leagues (id),
+            team_id         INTEGER NOT NULL REFERENCES teams (id),
+            peso_casa       DOUBLE PRECISION NOT NULL,
+            marcados_casa   DOUBLE PRECISION NOT NULL,
+            sofridos_casa   DOUBLE PRECISION NOT NULL,
+            peso_fora       DOUBLE PRECISION NOT NULL,
+            marcados_fora   DOUBLE PRECISION NOT NULL,
+            sofridos_fora   DOUBLE PRECISION NOT NULL,
+            ataque_casa     DOUBLE PRECISION NOT NULL,
+            defesa_casa     DOUBLE PRECISION NOT NULL,
+            ataque_fora     DOUBLE PRECISION NOT NULL,
+            defesa_fora     DOUBLE PRECISION NOT NULL,
+            ultimo_jogo     DATE,
+            PRIMARY KEY (league_id, team_id)
+        );
+        CREATE TABLE IF NOT EXISTS ratings_jogos (
+            numero          INTEGER PRIMARY KEY,
+            league_id       INTEGER NOT NULL,
+            home_id         INTEGER NOT NULL,
+            away_id         INTEGER NOT NULL,
+            match_date      DATE NOT NULL,
+            goals_h         INTEGER NOT NULL,
+            goals_a         INTEGER NOT NULL
+        );
+    """)
+
+
+def _pesos(datas: pd.Series, referencia) -> np.ndarray:
+    """Peso de cada jogo na data de referência: exp(-taxa × dias)."""
+    dias = (pd.Timestamp(referencia) - pd.to_datetime(datas)).dt.days.to_numpy(dtype=float)
+    return np.exp(-TAXA_DECAIMENTO * dias)
+
+
+def contribuicoes(jogos: pd.DataFrame, referencia, sinal: float = 1.0) -> tuple:
+    """
+    Somas ponderadas que os 'jogos' acrescentam (sinal=1) ou retiram
+    (sinal=-1) do estado. Retorna (somas por time, somas da liga).
+    """
+    peso = sinal * _pesos(jogos["match_date"], referencia)
+    gols_casa = jogos["goals_h"].to_numpy(dtype=float)
+    gols_fora = jogos["goals_a"].to_numpy(dtype=float)
+    zeros = np.zeros(len(jogos))
+    mandantes = pd.DataFrame({
+        "team_id": jogos["home_id"].to_numpy(),
+        "peso_casa": peso, "marcados_casa": peso * gols_casa, "sofridos_casa": peso * gols_fora,
+        "peso_fora": zeros, "marcados_fora": zeros, "sofridos_fora": zeros
+    })
+    visitantes = pd.DataFrame({
+        "team_id": jogos["away_id"].to_numpy(),
+        "peso_casa": zeros, "marcados_casa": zeros, "sofridos_casa": zeros,
+        "peso_fora": peso, "marcados_fora": peso * gols_fora, "sofridos_fora": peso * gols_casa
+    })
+    por_time = pd.concat([mandantes, visitantes]).groupby("team_id").sum()
+    liga = {"peso": peso.sum(), "gols_casa": (peso * gols_casa).sum(), "gols_fora": (peso * gols_fora).sum()}
+    return por_time, liga
+
+
+def calcular_forcas(times: pd.DataFrame, liga: dict) -> pd.DataFrame:
+    """
+    Forças relativas à média da liga (1.0 = time médio), com PSEUDO_JOGOS
+    jogos na média da liga somados a cada time.
+    """
+    peso_liga = max(liga["peso"], 1e-12)
+    media_casa = max(liga["gols_casa"] / peso_liga, 1e-6)
+    media_fora = max(liga["gols_fora"] / peso_liga, 1e-6)
+    forcas = times.copy()
+    forcas["ataque_casa"] = (times["marcados_casa"] / media_casa + PSEUDO_JOGOS) / (times["peso_casa"] + PSEUDO_JOGOS)
+    forcas["defesa_casa"] = (times["sofridos_casa"] / media_fora + PSEUDO_JOGOS) / (times["peso_casa"] + PSEUDO_JOGOS)
+    forcas["ataque_fora"] = (times["marcados_fora"] / media_fora + PSEUDO_JOGOS) / (times["peso_fora"] + PSEUDO_JOGOS)
+    forcas["defesa_fora"] = (times["sofridos_fora"] / media_casa + PSEUDO_JOGOS) / (times["peso_fora"] + PSEUDO_JOGOS)
+    return forcas
+
+
+def atualizar_liga(cur, league_id: int) -> int:
+    """
+    Atualiza os ratings de uma liga com os jogos gravados ou alterados desde
+    a última execução. Retorna quantos jogos foram considerados.
+    """
+    cur.execute(
+        "SELECT referencia, processado_ate, peso, gols_casa, gols_fora FROM ratings_ligas WHERE league_id = %s;",
+        (league_id,)
+    )
+    linha = cur.fetchone()
+    referencia, processado_ate = (linha[0], linha[1]) if linha else (None, None)
+    liga = dict(zip(["peso", "gols_casa", "gols_fora"], linha[2:])) if linha else \
+        {"peso": 0.0, "gols_casa": 0.0, "gols_fora": 0.0}
+
+    cur.execute(
+        """
+        SELECT numero, home_id, away_id, match_date, goals_h_ft AS goals_h, goals_a_ft AS goals_a, atualizado_em
+        FROM tabela_ligas
+        WHERE league_id = %s AND atualizado_em > COALESCE(%s, '-infinity'::timestamptz)
+          AND home_id IS NOT NULL AND away_id IS NOT NULL AND match_date IS NOT NULL;
+        """,
+        (league_id, processado_ate)
+    )
+    alterados = pd.DataFrame(
+        cur.fetchall(),
+        columns=["numero", "home_id", "away_id", "match_date", "goals_h", "goals_a", "atualizado_em"]
+    )
+    if alterados.empty:
+        return 0
+    # Jogos já somados em execuções anteriores saem do estado antes de entrar de novo
+    cur.execute(
+        """
+        SELECT numero, home_id, away_id, match_date, goals_h, goals_a
+        FROM ratings_jogos WHERE numero = ANY(%s);
+        """,
+        (alterados["numero"].tolist(),)
+    )
+    antigos = pd.DataFrame(cur.fetchall(), columns=["numero", "home_id", "away_id", "match_date", "goals_h", "goals_a"])
+    novos = alterados.dropna(subset=["goals_h", "goals_a"])
+
+    cur.execute(
+        f"SELECT team_id, {', '.join(COLUNAS_SOMAS)}, ultimo_jogo FROM ratings_times WHERE league_id = %s;",
+        (league_id,)
+    )
+    times = pd.DataFrame(cur.fetchall(), columns=["team_id"] + COLUNAS_SOMAS + ["ultimo_jogo"]).set_index("team_id")
+
+    # Avança a referência até o jogo mais recente: todas as somas decaem juntas
+    nova_referencia = max(filter(None, [referencia, novos["match_date"].max() if not novos.empty else None]),
+                          default=None)
+    if nova_referencia is None:
+        return 0
+    if referencia is not None and nova_referencia > referencia:
+        fator = math.exp(-TAXA_DECAIMENTO * (nova_referencia - referencia).days)
+        times[COLUNAS_SOMAS] *= fator
+        liga = {chave: valor * fator for chave, valor in liga.items()}
+
+    for jogos, sinal in ((antigos, -1.0), (novos, 1.0)):
+        if jogos.empty:
+            continue
+        por_time, somas_liga = contribuicoes(jogos, nova_referencia, sinal)
+        times = times[COLUNAS_SOMAS].add(por_time, fill_value=0.0).join(times[["ultimo_jogo"]])
+        liga = {chave: liga[chave] + somas_liga[chave] for chave in liga}
+
+    ultimos = pd.concat([
+        novos[["home_id", "match_date"]].set_axis(["team_id", "match_date"], axis=1),
+        novos[["away_id", "match_date"]].set_axis(["team_id", "match_date"], axis=1)
+    ]).groupby("team_id")["match_date"].max()
+    times["ultimo_jogo"] = pd.concat(
+        [pd.to_datetime(times["ultimo_jogo"]), pd.to_datetime(ultimos)], axis=1
+    ).max(axis=1).dt.date
+    # Resíduos de ponto flutuante das subtrações não podem ficar negativos
+    times[COLUNAS_SOMAS] = times[COLUNAS_SOMAS].clip(lower=0.0)
+    forcas = calcular_forcas(times, liga)
+
+    execute_values(cur, f"""
+        INSERT INTO ratings_times (league_id, team_id, {', '.join(COLUNAS_SOMAS + COLUNAS_FORCAS)}, ultimo_jogo)
+        VALUES %s
+        ON CONFLICT (league_id, team_id) DO UPDATE SET
+        {', '.join(f'{c} = EXCLUDED.{c}' for c in COLUNAS_SOMAS + COLUNAS_FORCAS + ['ultimo_jogo'])};
+    """, [
+        (league_id, int(team_id), *map(float, linha[COLUNAS_SOMAS + COLUNAS_FORCAS]),
+         None if pd.isna(linha["ultimo_jogo"]) else linha["ultimo_jogo"])
+        for team_id, linha in forcas.iterrows()
+    ])
+
+    cur.execute("DELETE FROM ratings_jogos WHERE numero = ANY(%s);", (alterados["numero"].tolist(),))
+    if not novos.empty:
+        execute_values(
+            cur,
+            "INSERT INTO ratings_jogos (numero, league_id, home_id, away_id, match_date, goals_h, goals_a) VALUES %s;",
+            [(int(j.numero), league_id, int(j.home_id), int(j.away_id), j.match_date, int(j.goals_h), int(j.goals_a))
+             for j in novos.itertuples()]
+        )
+    cur.execute(
+        """
+        INSERT INTO ratings_ligas (league_id, referencia, processado_ate, peso, gols_casa, gols_fora)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON CONFLICT (league_id) DO UPDATE SET
+            referencia = EXCLUDED.referencia, processado_ate = EXCLUDED.processado_ate,
+            peso = EXCLUDED.peso, gols_casa = EXCLUDED.gols_casa, gols_fora = EXCLUDED.gols_fora;
+        """,
+        (league_id, nova_referencia, alterados["atualizado_em"].max(),
+         float(liga["peso"]), float(liga["gols_casa"]), float(liga["gols_fora"]))
+    )
+    return len(novos)
+
+
+def atualizar_ratings(cur, ligas=None) -> int:
+    """
+    Atualiza os ratings das ligas informadas (nomes) ou de todas. Na primeira
+    execução de uma liga todo o histórico é considerado.
+    """
+    if ligas is None:
+        cur.execute("SELECT id FROM leagues;")
+    else:
+        cur.execute("SELECT id FROM leagues WHERE nome = ANY(%s);", (list(ligas),))
+    return sum(atualizar_liga(cur, league_id) for (league_id,) in cur.fetchall())
+
+
+# =============================
+# GOLS ESPERADOS A PARTIR DOS RATINGS
+# =============================
+def ratings_dos_times(ratings: pd.DataFrame, times, ligas=None) -> pd.DataFrame:
+    """
+    Uma linha de 'ratings' por time informado (NaN para times sem rating).
+    Com 'ligas' (a liga de cada posição), usa o rating do time nessa liga;
+    sem a liga, ou sem rating do time nela, o da liga em que jogou por último.
+    """
+    times = list(times)
+    ultimos = (
+        ratings.sort_values("ultimo_jogo", kind="stable", na_position="first")
+        .drop_duplicates("time", keep="last").set_index("time")
+        .reindex(pd.Index(times)).reset_index(drop=True)
+    )
+    if ligas is None:
+        return ultimos
+    na_liga = (
+        ratings.set_index(["league", "time"])
+        .reindex(pd.MultiIndex.from_arrays([list(ligas), times])).reset_index(drop=True)
+    )
+    encontrados = na_liga["ataque_casa"].notna().to_numpy()
+    ultimos.loc[encontrados, na_liga.columns] = na_liga.loc[encontrados]
+    return ultimos
+
+
+def lambdas(ratings: pd.DataFrame, mandantes, visitantes, ligas=None) -> tuple:
+    """
+    Gols esperados (λ casa, λ fora) para cada par mandante/visitante.
+    'ratings' tem uma linha por liga e time (colunas league e time), com as
+    forças e as médias da liga (media_casa, media_fora). Com 'ligas' (a liga
+    de cada jogo), cada time usa o rating dessa liga, quando existir (times
+    homônimos de ligas diferentes compartilham o nome); senão, o da liga em
+    que jogou por último. Times sem rating resultam em NaN.
+    """
+    if ratings.empty:
+        vazio = np.full(len(mandantes), np.nan)
+        return vazio, vazio.copy()
+    casa = ratings_dos_times(ratings, mandantes, ligas)
+    fora = ratings_dos_times(ratings, visitantes, ligas)
+    lambda_casa = casa["media_casa"].to_numpy() * casa["ataque_casa"].to_numpy() * fora["defesa_fora"].to_numpy()
+    lambda_fora = casa["media_fora"].to_numpy() * fora["ataque_fora"].to_numpy() * casa["defesa_casa"].to_numpy()
+    return lambda_casa, lambda_fora
@@ -0,0 +1,216 @@
+import contextlib
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import db
+
+# =============================
+# SIMULAÇÃO DE MONTE CARLO DA TEMPORADA
+# =============================
+# Parte da classificação atual de uma liga (jogos com placar na temporada)
+# e simula os jogos restantes (jogos sem placar) muitas vezes, com gols de
+# Poisson pelas médias de cada jogo. Cada bloco de iterações sorteia todos
+# os jogos x todas as iterações de uma vez; pontos, saldo e gols pró saem de
+# produtos com as matrizes de incidência jogo -> time. Os blocos têm
+# sementes derivadas de uma única semente (SeedSequence.spawn), então o
+# resultado é o mesmo com qualquer número de processos.
+
+ITERACOES = int(os.getenv("SIMULACAO_ITERACOES", "100000"))
+# Iterações sorteadas de uma vez (limita a memória: bloco x jogos restantes)
+BLOCO = int(os.getenv("SIMULACAO_BLOCO", "10000"))
+WORKERS = int(os.getenv("SIMULACAO_WORKERS", str(os.cpu_count() or 1)))
+SEMENTE = int(os.getenv("SIMULACAO_SEMENTE", "2024"))
+REBAIXADOS = int(os.getenv("SIMULACAO_REBAIXADOS", "4"))
+
+COLUNAS_TEMPORADA = ["home", "away", "match_date", "goals_h_ft", "goals_a_ft", "ppg_home_pre", "ppg_away_pre"]
+
+
+class Temporada:
+    """
+    Situação de uma liga/temporada: classificação atual ('tabela', uma linha
+    por time com pontos, saldo e gols pró) e jogos restantes com as médias de
+    gols de cada jogo ('lambda_casa', 'lambda_fora').
+    """
+
+    def __init__(self, times, tabela: pd.DataFrame, restantes: pd.DataFrame):
+        self.times = list(times)
+        self.tabela = tabela
+        self.restantes = restantes.reset_index(drop=True)
+        posicao = {time: i for i, time in enumerate(self.times)}
+        self.casa = self.restantes["home"].map(posicao).to_numpy()
+        self.fora = self.restantes["away"].map(posicao).to_numpy()
+
+    @classmethod
+    def de_partidas(cls, partidas: pd.DataFrame, modelo=None) -> "Temporada":
+        """
+        Monta a temporada a partir dos jogos de uma liga/temporada. As médias
+        dos jogos restantes vêm do 'modelo' (qualquer objeto com
+        lambdas(mandantes, visitantes), como ModeloDixonColes) quando
+        informado; senão do PPG pré-jogo (mesmo critério da página
+        principal) e, na falta dele, das médias de gols da liga como mandante
+        e visitante.
+        """
+        partidas = partidas.dropna(subset=["home", "away"])
+        jogados = partidas.dropna(subset=["goals_h_ft", "goals_a_ft"])
+        restantes = partidas[partidas["goals_h_ft"].isna() | partidas["goals_a_ft"].isna()]
+        times = sorted(set(partidas["home"]) | set(partidas["away"]))
+
+        gols_casa = jogados["goals_h_ft"].astype(float)
+        gols_fora = jogados["goals_a_ft"].astype(float)
+        pontos_casa = np.select([gols_casa > gols_fora, gols_casa == gols_fora], [3, 1], 0)
+        pontos_fora = np.select([gols_fora > gols_casa, gols_casa == gols_fora], [3, 1], 0)
+        linhas = pd.concat([
+            pd.DataFrame({"time": jogados["home"].to_numpy(), "pontos": pontos_casa,
+                          "saldo": (gols_casa - gols_fora).to_numpy(), "gols_pro": gols_casa.to_numpy()}),
+            pd.DataFrame({"time": jogados["away"].to_numpy(), "pontos": pontos_fora,
+                          "saldo": (gols_fora - gols_casa).to_numpy(), "gols_pro": gols_fora.to_numpy()}),
+        ])
+        tabela = (
+            linhas.groupby("time").agg(jogos=("pontos", "size"), pontos=("pontos", "sum"),
+                                       saldo=("saldo", "sum"), gols_pro=("gols_pro", "sum"))
+            .reindex(times, fill_value=0)
+        )
+
+        if modelo is not None:
+            lambda_casa, lambda_fora = modelo.lambdas(restantes["home"].to_numpy(), restantes["away"].to_numpy())
+        else:
+            lambda_casa = restantes["ppg_home_pre"].to_numpy(dtype=float, na_value=np.nan)
+            lambda_fora = restantes["ppg_away_pre"].to_numpy(dtype=float, na_value=np.nan)
+        media_casa = gols_casa.mean() if len(jogados) else 1.4
+        media_fora = gols_fora.mean() if len(jogados) else 1.1
+        restantes = restantes.assign(
+            lambda_casa=np.where(np.isfinite(lambda_casa), lambda_casa, media_casa),
+            lambda_fora=np.where(np.isfinite(lambda_fora), lambda_fora, media_fora),
+        )
+        return cls(times, tabela, restantes)
+
+
+def _simular_bloco(temporada: Temporada, iteracoes: int, semente) -> tuple:
+    """
+    Simula 'iteracoes' vezes os jogos restantes. Retorna a contagem de
+    posições finais (times x posições) e a soma dos pontos finais de cada time.
+    """
+    rng = np.random.default_rng(semente)
+    n_times, n_jogos = len(temporada.times), len(temporada.restantes)
+    gols_casa = rng.poisson(temporada.restantes["lambda_casa"].to_numpy(), size=(iteracoes, n_jogos))
+    gols_fora = rng.poisson(temporada.restantes["lambda_fora"].to_numpy(), size=(iteracoes, n_jogos))
+
+    # Matrizes de incidência jogo -> time (mandante e visitante). Os produtos
+    # são feitos em float64, que usa o BLAS (com int32 o numpy não usa) e é
+    # exato para estas contagens
+    incidencia_casa = np.zeros((n_jogos, n_times))
+    incidencia_fora = np.zeros((n_jogos, n_times))
+    incidencia_casa[np.arange(n_jogos), temporada.casa] = 1
+    incidencia_fora[np.arange(n_jogos), temporada.fora] = 1
+
+    vitoria_casa, empate = gols_casa > gols_fora, gols_casa == gols_fora
+    pontos_casa = (3 * vitoria_casa + empate).astype(float)
+    pontos_fora = (3 * (gols_casa < gols_fora) + empate).astype(float)
+    saldo = (gols_casa - gols_fora).astype(float)
+
+    tabela = temporada.tabela
+    pontos = tabela["pontos"].to_numpy() + pontos_casa @ incidencia_casa + pontos_fora @ incidencia_fora
+    saldos = tabela["saldo"].to_numpy() + saldo @ incidencia_casa - saldo @ incidencia_fora
+    gols_pro = (tabela["gols_pro"].to_numpy()
+                + gols_casa.astype(float) @ incidencia_casa + gols_fora.astype(float) @ incidencia_fora)
+
+    # Critérios: pontos, saldo, gols pró e, persistindo o empate, sorteio
+    chave = np.lexsort((rng.random((iteracoes, n_times)), -gols_pro, -saldos, -pontos), axis=-1)
+    posicoes = np.empty_like(chave)
+    np.put_along_axis(posicoes, chave, np.arange(n_times)[None, :], axis=1)
+    contagem = np.bincount(
+        (np.arange(n_times)[None, :] * n_times + posicoes).ravel(), minlength=n_times * n_times
+    ).reshape(n_times, n_times)
+    return contagem, pontos.sum(axis=0)
+
+
+def _blocos(iteracoes: int, bloco: int, semente: int) -> list:
+    """Tamanhos e sementes independentes dos blocos, fixos para a semente dada."""
+    tamanhos = [bloco] * (iteracoes // bloco) + ([iteracoes % bloco] if iteracoes % bloco else [])
+    return list(zip(tamanhos, np.random.SeedSequence(semente).spawn(len(tamanhos))))
+
+
+def simular(temporada: Temporada, iteracoes: int = ITERACOES, workers: int = 1, semente: int = SEMENTE,
+            rebaixados: int = REBAIXADOS, bloco: int = BLOCO) -> pd.DataFrame:
+    """
+    Probabilidades de título, rebaixamento e de cada posição final, e pontos
+    esperados, por time. Com workers > 1 os blocos de iterações são
+    divididos entre processos (mesmo resultado que com um processo).
+    """
+    n_times = len(temporada.times)
+    blocos = _blocos(iteracoes, bloco, semente)
+    if workers <= 1 or len(blocos) <= 1:
+        resultados = [_simular_bloco(temporada, tamanho, semente_bloco) for tamanho, semente_bloco in blocos]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futuros = [executor.submit(_simular_bloco, temporada, tamanho, semente_bloco)
+                       for tamanho, semente_bloco in blocos]
+            resultados = [futuro.result() for futuro in futuros]
+
+    contagem = sum(r[0] for r in resultados)
+    pontos = sum(r[1] for r in resultados)
+    probabilidades = pd.DataFrame(
+        contagem / iteracoes, index=pd.Index(temporada.times, name="time"),
+        columns=[f"pos_{i}" for i in range(1, n_times + 1)]
+    )
+    resumo = pd.DataFrame({
+        "pontos_atuais": temporada.tabela["pontos"],
+        "pontos_esperados": pontos / iteracoes,
+        "titulo": probabilidades["pos_1"],
+        "rebaixamento": probabilidades.iloc[:, n_times - rebaixados:].sum(axis=1) if rebaixados else 0.0,
+        "posicao_media": (contagem * np.arange(1, n_times + 1)).sum(axis=1) / iteracoes,
+    }, index=probabilidades.index)
+    return resumo.join(probabilidades).sort_values("posicao_media")
+
+
+def carregar_temporada(cur, liga: str, season: str = None) -> pd.DataFrame:
+    """Jogos de uma liga na temporada informada (padrão: a mais recente)."""
+    cur.execute(
+        f"""
+        SELECT {", ".join(COLUNAS_TEMPORADA)}
+        FROM vw_tabela_ligas
+        WHERE league = %s
+          AND season = COALESCE(%s, (SELECT max(season) FROM vw_tabela_ligas WHERE league = %s))
+        ORDER BY match_date;
+        """,
+        (liga, season, liga)
+    )
+    return pd.DataFrame(cur.fetchall(), columns=COLUNAS_TEMPORADA)
+
+
+# =============================
+# EXECUÇÃO PELA LINHA DE COMANDO
+# =============================
+if __name__ == "__main__":
+    import sys
+
+    import dixon_coles
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    pd.set_option("display.width", 200)
+    if len(sys.argv) < 2:
+        sys.exit("Uso: python simulacao.py <liga> [temporada]")
+    liga = sys.argv[1]
+    season = sys.argv[2] if len(sys.argv) > 2 else None
+
+    with contextlib.closing(db.conectar()) as conn, conn.cursor() as cur:
+        partidas = carregar_temporada(cur, liga, season)
+        try:
+            modelo = dixon_coles.carregar_modelos(cur, [liga]).get(liga)
+        except Exception as e:
+            logging.warning("Modelo Dixon-Coles indisponível (%s); usando o PPG pré-jogo.", e)
+            modelo = None
+
+    temporada = Temporada.de_partidas(partidas, modelo)
+    inicio = time.perf_counter()
+    resultado = simular(temporada, workers=WORKERS)
+    logging.info(
+        f"{liga}: {len(temporada.restantes)} jogos restantes, {ITERACOES} simulações "
+        f"em {time.perf_counter() - inicio:.1f} s ({WORKERS} processos)."
+    )
+    print(resultado[["pontos_atuais", "pontos_esperados", "titulo", "rebaixamento", "posicao_media"]].to_string())
@@ -0,0 +1,99 @@
+import glob
+import os
+from urllib.parse import quote, unquote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from esquema import MAPEAMENTO_COLUNAS, COLUNAS_INTEIRAS, COLUNAS_NUMERICAS, COLUNAS_DATA, COLUNAS_TEXTO
+
+# =============================
+# ÁREA DE STAGING EM PARQUET
+# =============================
+# Cada planilha é convertida uma única vez em arquivos Parquet tipados,
+# particionados por liga e temporada:
+#   staging/league=<liga>/season=<temporada>/dados.parquet
+# O ETL carrega o PostgreSQL a partir desses arquivos e as páginas do
+# Streamlit podem lê-los quando o banco estiver indisponível.
+
+DIRETORIO_STAGING = os.getenv("STAGING_DIR", "staging")
+
+
+def _tipo_arrow(coluna: str) -> pa.DataType:
+    """Tipo Arrow equivalente ao tipo da coluna na tabela_ligas."""
+    if coluna in COLUNAS_INTEIRAS:
+        return pa.int32()    # INTEGER
+    if coluna in COLUNAS_NUMERICAS:
+        return pa.float64()  # NUMERIC(10,2), já arredondado para 2 casas
+    if coluna in COLUNAS_DATA:
+        return pa.date32()   # DATE
+    return pa.string()       # TEXT
+
+
+ESQUEMA_ARROW = pa.schema(
+    [(coluna, _tipo_arrow(coluna)) for coluna in MAPEAMENTO_COLUNAS.values()] +
+    [("chave_jogo", pa.string()), ("hash_linha", pa.int64())]
+)
+
+
+def caminho_particao(league, season, diretorio: str = DIRETORIO_STAGING) -> str:
+    """Caminho do arquivo de uma liga/temporada (nomes codificados para uso em pastas)."""
+    return os.path.join(
+        diretorio,
+        f"league={quote(str(league), safe='')}",
+        f"season={quote(str(season), safe='')}",
+        "dados.parquet"
+    )
+
+
+def gravar_staging(tabela: pd.DataFrame, diretorio: str = DIRETORIO_STAGING) -> list:
+    """
+    Grava a tabela já preparada (layout da tabela_ligas) em um arquivo por
+    liga/temporada, substituindo o anterior. Retorna os caminhos gravados.
+    """
+    tabela = tabela.astype({coluna: "string" for coluna in COLUNAS_TEXTO})
+    for coluna in COLUNAS_DATA:
+        tabela[coluna] = pd.to_datetime(tabela[coluna], errors="coerce").dt.date
+
+    caminhos = []
+    for (league, season), grupo in tabela.groupby(["league", "season"], dropna=False, sort=False):
+        caminho = caminho_particao(league, season, diretorio)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        tabela_arrow = pa.Table.from_pandas(
+            grupo[ESQUEMA_ARROW.names], schema=ESQUEMA_ARROW, preserve_index=False
+        )
+        # Grava em arquivo temporário e troca, para leitores nunca verem um arquivo parcial
+        temporario = caminho + ".tmp"
+        pq.write_table(tabela_arrow, temporario)
+        os.replace(temporario, caminho)
+        caminhos.append(caminho)
+    return caminhos
+
+
+def listar_particoes(diretorio: str = DIRETORIO_STAGING, ligas: list = None) -> list:
+    """Caminhos dos arquivos de staging, opcionalmente só das ligas informadas."""
+    caminhos = sorted(glob.glob(os.path.join(diretorio, "league=*", "season=*", "dados.parquet")))
+    if ligas is not None:
+        ligas = set(ligas)
+        caminhos = [
+            c for c in caminhos
+            if unquote(os.path.basename(os.path.dirname(os.path.dirname(c)))[len("league="):]) in ligas
+        ]
+    return caminhos
+
+
+def ler_staging(diretorio: str = DIRETORIO_STAGING, ligas: list = None, caminhos: list = None) -> pd.DataFrame:
+    """
+    Lê os arquivos de staging (todos, os das ligas informadas ou a lista de
+    'caminhos') em um único DataFrame com as colunas da tabela_ligas.
+    """
+    if caminhos is None:
+        caminhos = listar_particoes(diretorio, ligas)
+    if not caminhos:
+        return pd.DataFrame(columns=ESQUEMA_ARROW.names)
+    tabela_arrow = pa.concat_tables([pq.read_table(c, schema=ESQUEMA_ARROW) for c in caminhos])
+    # Inteiros com nulos voltariam como float; Int64 mantém o tipo para o COPY
+    return tabela_arrow.to_pandas(date_as_object=False).astype(
+        {coluna: "Int64" for coluna in COLUNAS_INTEIRAS}
+    )
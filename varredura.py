@@ -0,0 +1,229 @@
+import itertools
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from backtest import MERCADOS, Historico, ler_partidas, regra_oportunidades
+
+# =============================
+# VARREDURA DOS LIMIARES DE OPORTUNIDADE
+# =============================
+# Avalia no histórico uma grade de critérios de oportunidade: margem sobre a
+# odd justa, cortes de Over 2.5 e de ambas marcam, e subconjuntos de ligas.
+# A grade é dividida entre processos. Os arrays do Historico são gravados
+# uma vez em arquivos .npy e abertos por cada processo com memory map
+# (somente leitura), de modo que os workers compartilham as páginas do
+# sistema operacional em vez de receber cada um a sua cópia.
+# Apostas de valor fixo (1 unidade).
+
+MARGENS = (0.0, 0.02, 0.05, 0.10, 0.15)
+CORTES_OVER = (0.0, 0.50, 0.55, 0.60, 0.65, 0.70)
+CORTES_BTTS = (0.0, 0.50, 0.55, 0.60)
+
+WORKERS = int(os.getenv("VARREDURA_WORKERS", str(os.cpu_count() or 1)))
+ARQUIVO_RESULTADOS = os.getenv("VARREDURA_ARQUIVO", "varredura.parquet")
+# Combinações com menos apostas não entram no ranking
+MIN_APOSTAS = int(os.getenv("VARREDURA_MIN_APOSTAS", "50"))
+# Quantil da normal para o intervalo de confiança de 95% do ROI
+Z_95 = 1.959964
+
+CAMPOS_HISTORICO = ("ligas", "datas", "prob", "odds", "acertou", "fechamento")
+
+
+def gravar_arrays(historico: Historico, diretorio: str) -> dict:
+    """Grava os arrays do histórico em .npy; retorna o que os workers precisam para abri-los."""
+    caminhos = {}
+    for campo in CAMPOS_HISTORICO:
+        array = getattr(historico, campo)
+        if array.dtype == object:
+            # np.save grava objetos com pickle, e np.load não os mapeia em memória
+            array = array.astype(str)
+        caminhos[campo] = os.path.join(diretorio, f"{campo}.npy")
+        np.save(caminhos[campo], array, allow_pickle=False)
+    return {"mercados": historico.mercados, "caminhos": caminhos}
+
+
+def abrir_arrays(descricao: dict) -> Historico:
+    """Historico sobre os arquivos .npy mapeados em memória, sem copiar os dados."""
+    arrays = {campo: np.load(caminho, mmap_mode="r") for campo, caminho in descricao["caminhos"].items()}
+    return Historico(mercados=descricao["mercados"], **arrays)
+
+
+def grade(margens=MARGENS, cortes_over=CORTES_OVER, cortes_btts=CORTES_BTTS, subconjuntos=(None,)) -> list:
+    """
+    Todas as combinações de critérios. Cada subconjunto é uma tupla de ligas
+    (None = todas as ligas).
+    """
+    return [
+        {"margem": margem, "over_minimo": over, "btts_minimo": btts, "ligas": ligas}
+        for ligas, margem, over, btts in itertools.product(subconjuntos, margens, cortes_over, cortes_btts)
+    ]
+
+
+def avaliar(historico: Historico, margem: float, over_minimo: float, btts_minimo: float,
+            ligas: tuple = None, linhas_ligas: np.ndarray = None) -> dict:
+    """
+    ROI (com intervalo de confiança de 95% pela aproximação normal do retorno
+    médio por aposta), taxa de acerto, drawdown máximo e CLV de uma combinação.
+    """
+    regra = regra_oportunidades(over_minimo, margem, btts_minimo)
+    with np.errstate(invalid="ignore"):
+        mascara = regra(historico) & (historico.odds > 1) & np.isfinite(historico.prob)
+    if linhas_ligas is not None:
+        mascara &= linhas_ligas[:, None]
+    jogos, colunas = np.nonzero(mascara)
+    odds = historico.odds[jogos, colunas]
+    acertou = historico.acertou[jogos, colunas]
+    retorno = np.where(acertou, odds - 1, -1.0)
+
+    n = len(retorno)
+    roi = retorno.mean() if n else np.nan
+    erro = retorno.std(ddof=1) / np.sqrt(n) if n > 1 else np.nan
+    acumulado = np.cumsum(retorno)
+    pico = np.maximum(np.maximum.accumulate(acumulado), 0) if n else acumulado
+    with np.errstate(divide="ignore", invalid="ignore"):
+        clv = odds / historico.fechamento[jogos, colunas] - 1
+    return {
+        "ligas": "Todas" if ligas is None else " + ".join(ligas),
+        "margem": margem,
+        "over_minimo": over_minimo,
+        "btts_minimo": btts_minimo,
+        "apostas": n,
+        "taxa_acerto": acertou.mean() if n else np.nan,
+        "lucro": acumulado[-1] if n else 0.0,
+        "roi": roi,
+        "roi_ic_inf": roi - Z_95 * erro,
+        "roi_ic_sup": roi + Z_95 * erro,
+        "max_drawdown": (pico - acumulado).max() if n else 0.0,
+        "clv": np.nanmean(clv) if np.isfinite(clv).any() else np.nan,
+    }
+
+
+# Estado de cada processo do pool: o histórico mapeado e as máscaras de
+# linhas por subconjunto de ligas (calculadas uma vez por processo)
+_historico = None
+_linhas_por_subconjunto = {}
+
+
+def _iniciar_worker(descricao: dict):
+    global _historico
+    _historico = abrir_arrays(descricao)
+    _linhas_por_subconjunto.clear()
+
+
+def _avaliar_lote(combinacoes: list) -> list:
+    resultados = []
+    for combinacao in combinacoes:
+        ligas = combinacao["ligas"]
+        if ligas is not None and ligas not in _linhas_por_subconjunto:
+            _linhas_por_subconjunto[ligas] = np.isin(_historico.ligas, list(ligas))
+        resultados.append(avaliar(_historico, linhas_ligas=_linhas_por_subconjunto.get(ligas), **combinacao))
+    return resultados
+
+
+def _lotes(itens: list, quantidade: int) -> list:
+    """Divide a grade em lotes contíguos (combinações de um mesmo subconjunto ficam juntas)."""
+    tamanho = max(1, -(-len(itens) // quantidade))
+    return [itens[i:i + tamanho] for i in range(0, len(itens), tamanho)]
+
+
+def executar_varredura(historico: Historico, combinacoes: list, workers: int = WORKERS,
+                       arquivo: str = ARQUIVO_RESULTADOS, min_apostas: int = MIN_APOSTAS) -> pd.DataFrame:
+    """
+    Avalia as combinações em paralelo e grava em 'arquivo' (Parquet) as que
+    têm ao menos 'min_apostas' apostas, ordenadas pelo ROI. Retorna a tabela gravada.
+    """
+    with tempfile.TemporaryDirectory(prefix="varredura_") as diretorio:
+        descricao = gravar_arrays(historico, diretorio)
+        lotes = _lotes(combinacoes, max(1, workers) * 4)
+        if workers <= 1:
+            _iniciar_worker(descricao)
+            resultados = [linha for lote in lotes for linha in _avaliar_lote(lote)]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker,
+                                     initargs=(descricao,)) as executor:
+                resultados = [linha for lote in executor.map(_avaliar_lote, lotes) for linha in lote]
+
+    tabela = pd.DataFrame(resultados)
+    tabela = tabela[tabela["apostas"] >= min_apostas]
+    tabela = tabela.sort_values(["roi", "roi_ic_inf"], ascending=False, ignore_index=True)
+    # Arquivo compacto: ligas como categoria e métricas em float32
+    tabela = tabela.astype({"ligas": "category", "apostas": "int32"})
+    colunas_float = tabela.columns.difference(["ligas", "apostas"])
+    tabela[colunas_float] = tabela[colunas_float].astype("float32")
+    tabela.to_parquet(arquivo, index=False)
+    return tabela
+
+
+# =============================
+# VERIFICAÇÃO COM DADOS SINTÉTICOS
+# =============================
+def partidas_sinteticas(n_jogos: int = 2000, semente: int = 0) -> pd.DataFrame:
+    """Partidas aleatórias no layout da tabela_ligas, com as colunas usadas pelo backtest."""
+    rng = np.random.default_rng(semente)
+    ppg_home, ppg_away = rng.uniform(0.5, 2.5, n_jogos), rng.uniform(0.3, 2.0, n_jogos)
+    partidas = pd.DataFrame({
+        "league": rng.choice(["Liga A", "Liga B", "Liga C"], n_jogos),
+        "season": "2024",
+        "match_date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, n_jogos), unit="D"),
+        "home": rng.choice([f"Time {i}" for i in range(20)], n_jogos),
+        "away": rng.choice([f"Time {i}" for i in range(20, 40)], n_jogos),
+        "goals_h_ft": rng.poisson(ppg_home),
+        "goals_a_ft": rng.poisson(ppg_away),
+        "ppg_home_pre": ppg_home.round(2),
+        "ppg_away_pre": ppg_away.round(2),
+        "xg_home_pre": ppg_home.round(2),
+        "xg_away_pre": ppg_away.round(2),
+    })
+    for coluna in MERCADOS.values():
+        partidas[coluna] = rng.uniform(1.3, 4.5, n_jogos).round(2)
+    return partidas
+
+
+def verificar(workers: int = 2) -> pd.DataFrame:
+    """
+    Roda a varredura sobre um Historico.de_partidas sintético, com um e com
+    'workers' processos, e confere que os resultados coincidem.
+    """
+    historico = Historico.de_partidas(partidas_sinteticas())
+    combinacoes = grade(margens=(0.0, 0.05), cortes_over=(0.0, 0.5), cortes_btts=(0.0,),
+                        subconjuntos=[None, ("Liga A",), ("Liga B", "Liga C")])
+    with tempfile.TemporaryDirectory(prefix="verificacao_") as diretorio:
+        serial = executar_varredura(historico, combinacoes, workers=1, min_apostas=0,
+                                    arquivo=os.path.join(diretorio, "serial.parquet"))
+        paralelo = executar_varredura(historico, combinacoes, workers=workers, min_apostas=0,
+                                      arquivo=os.path.join(diretorio, "paralelo.parquet"))
+    assert len(serial) == len(combinacoes), "combinações faltando no resultado"
+    pd.testing.assert_frame_equal(serial, paralelo)
+    return serial
+
+
+# =============================
+# EXECUÇÃO PELA LINHA DE COMANDO
+# =============================
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    pd.set_option("display.width", 200)
+
+    if "--verificar" in sys.argv:
+        print(verificar().to_string())
+        sys.exit()
+
+    historico = Historico.de_partidas(ler_partidas())
+    # Todas as ligas e cada liga separadamente
+    subconjuntos = [None] + [(liga,) for liga in np.unique(historico.ligas)]
+    combinacoes = grade(subconjuntos=subconjuntos)
+
+    inicio = time.perf_counter()
+    tabela = executar_varredura(historico, combinacoes)
+    logging.info(
+        f"{len(combinacoes)} combinações avaliadas em {time.perf_counter() - inicio:.1f} s "
+        f"({WORKERS} processos); {len(tabela)} gravadas em {ARQUIVO_RESULTADOS}."
+    )
+    print(tabela.head(20).to_string())